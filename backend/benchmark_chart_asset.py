@@ -0,0 +1,70 @@
+"""Compare the forecast plot assets: standalone bokeh pages (built per
+request, or from the cached template) against chart+json specs. Measures the
+Python render time, the bytes of the send_asset event and what the BFF
+writes to disk for it. Run from the repository root:
+
+    python backend/benchmark_chart_asset.py [repeats]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+import config as cfg
+from benchmark_plot_rendering import PLOTS, _data, legacy_render
+from modules import plot_rendering
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+
+def _bff_write(directory, type, asset):
+    """Bytes the BFF writes to outfiles for the asset, as Executor.recieve
+    does: chart+json assets are sent inline."""
+    if type == "chart+json":
+        return 0
+    filename = os.path.join(directory, f"{uuid.uuid4()}.{type}")
+    with open(filename, "w") as f:
+        f.write(asset)
+    return os.path.getsize(filename)
+
+
+def _measure(render, type, directory):
+    renderTime = eventBytes = diskBytes = 0
+    for seed in range(REPEATS):
+        start = time.perf_counter()
+        asset = render(seed)
+        renderTime += time.perf_counter() - start
+        event = {"id": str(uuid.uuid4()), "type": type, "asset": asset}
+        eventBytes += len(json.dumps(event).encode("utf-8"))
+        diskBytes += _bff_write(directory, type, asset)
+    return renderTime / REPEATS * 1000, eventBytes / REPEATS, diskBytes / REPEATS
+
+
+def main():
+    # Every rendering is a cache miss
+    cfg.plot_cache_max_mb = 0
+    directory = tempfile.mkdtemp()
+    for plot_type, (build, column, n_past, n_forecast, freq, layout) in PLOTS.items():
+        data = lambda seed: _data(column, n_past, n_forecast, freq, seed)
+        # Templates are built once per process, not per request
+        plot_rendering.render(plot_type, data(REPEATS), **layout)
+
+        variants = {
+            "html, figure + file_html": (lambda seed: legacy_render(build, data(seed), layout), "html"),
+            "html, templated": (lambda seed: plot_rendering.render(plot_type, data(seed), **layout), "html"),
+            "chart+json": (
+                lambda seed: json.dumps(plot_rendering.chart(plot_type, data(seed), **layout), separators=(",", ":")),
+                "chart+json",
+            ),
+        }
+        print(plot_type)
+        print(f"  {'asset':26s} {'render':>10s} {'event':>10s} {'disk':>10s}")
+        for name, (render, type) in variants.items():
+            ms, eventBytes, diskBytes = _measure(render, type, directory)
+            print(f"  {name:26s} {ms:8.3f}ms {eventBytes / 1024:8.1f}KB {diskBytes / 1024:8.1f}KB")
+
+
+if __name__ == "__main__":
+    main()
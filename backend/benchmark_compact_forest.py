@@ -0,0 +1,96 @@
+"""Compare the compact forest format with pickled RandomForestRegressor
+models: file size, load time, per-prediction latency, and that predictions
+are identical. Run from the repository root:
+
+    python backend/benchmark_compact_forest.py [model.pkl ...]
+
+Without arguments a forest the size of the largest energy models is trained
+on generated data.
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from modules.compact_forest import CompactForest, export
+
+REPEATS = 50
+# Largest n_estimators of the energy random search
+SYNTHETIC_TREES = 195
+
+
+def _size(path: Path) -> int:
+    if path.is_dir():
+        return sum(child.stat().st_size for child in path.iterdir())
+    return path.stat().st_size
+
+
+def _timed(fn, repeats=1):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeats
+
+
+def _synthetic_forest():
+    rng = np.random.default_rng(42)
+    X = rng.normal(size=(30000, 58))
+    y = X[:, :5].sum(axis=1) + rng.normal(size=30000)
+    forest = RandomForestRegressor(n_estimators=SYNTHETIC_TREES, max_depth=30, max_samples=0.9, n_jobs=-1, random_state=42)
+    return forest.fit(X, y)
+
+
+def compare(forest: RandomForestRegressor, name: str, directory: Path) -> None:
+    # Parallel prediction sums the trees in completion order
+    forest.set_params(n_jobs=None)
+    pickle_path = directory / f"{name}.pkl"
+    with open(pickle_path, "wb") as f:
+        pickle.dump(forest, f)
+    compact_path = directory / f"{name}_compact"
+    export(forest, compact_path)
+    # Load from disk rather than the page cache where possible
+    os.sync()
+
+    def load_pickle():
+        with open(pickle_path, "rb") as f:
+            return pickle.load(f)
+
+    loaded, pickle_load = _timed(load_pickle, 3)
+    compact, compact_load = _timed(lambda: CompactForest.load(compact_path), 3)
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(1000, forest.n_features_in_))
+    assert np.array_equal(loaded.predict(X), compact.predict(X)), "predictions differ"
+
+    row = X[:1]
+    _, pickle_row = _timed(lambda: loaded.predict(row), REPEATS)
+    _, compact_row = _timed(lambda: compact.predict(row), REPEATS)
+    _, pickle_batch = _timed(lambda: loaded.predict(X), 5)
+    _, compact_batch = _timed(lambda: compact.predict(X), 5)
+
+    print(f"{name}: {forest.n_estimators} trees, "
+          f"{sum(e.tree_.node_count for e in forest.estimators_)} nodes, predictions identical")
+    print(f"  {'':8} {'size':>10} {'load':>10} {'1 row':>10} {'1000 rows':>10}")
+    print(f"  {'pickle':8} {_size(pickle_path) / 2**20:8.1f}MB {pickle_load * 1000:8.1f}ms "
+          f"{pickle_row * 1000:8.2f}ms {pickle_batch * 1000:8.1f}ms")
+    print(f"  {'compact':8} {_size(compact_path) / 2**20:8.1f}MB {compact_load * 1000:8.1f}ms "
+          f"{compact_row * 1000:8.2f}ms {compact_batch * 1000:8.1f}ms")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        if len(sys.argv) > 1:
+            for path in sys.argv[1:]:
+                with open(path, "rb") as f:
+                    compare(pickle.load(f), Path(path).stem, Path(directory))
+        else:
+            compare(_synthetic_forest(), "synthetic", Path(directory))
+
+
+if __name__ == "__main__":
+    main()
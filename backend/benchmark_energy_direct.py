@@ -0,0 +1,82 @@
+"""Compare the direct multi-horizon energy model with the per-horizon models
+on accuracy and request latency. Run from the repository root:
+
+    python backend/benchmark_energy_direct.py [horizon ...]
+
+Both are trained on the same leading 80% of the hourly dataset and scored on
+the targets of the remaining rows, with the same information available: the
+per-horizon model for horizon h uses the days h + 1 to h + 3 before the
+target, so the direct model forecasts h + 1 days ahead of the same origin.
+The per-horizon models use the fixed "best_params" settings instead of the
+random search. Pass --synthetic to run on generated data.
+"""
+import sys
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error
+
+import config as cfg
+from benchmark_energy_preprocessing import _dataset
+from modules.energy_features import EnergyFeatures
+from modules.train_energy_direct import ORIGIN_LAGS, TARGET, fit, origin_rows, training_samples
+from modules.train_energy_model import LAGS, _preprocess_data
+
+HORIZONS = [int(arg) for arg in sys.argv[1:] if arg.isdigit()] or [1, 7, 30, 90, 180]
+REPEATS = 20
+
+
+def _timed(fn, repeats=1):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeats
+
+
+def main():
+    data = _dataset()
+    features = EnergyFeatures.fit(data)
+    n_train = features._EnergyFeatures__state["n_train"]
+    target = features.column(TARGET)
+    X_origin = features.derive(0, ORIGIN_LAGS)
+    max_horizon = max(cfg.energy_max_horizon, max(HORIZONS) + 1)
+
+    X, y = training_samples(
+        features, max_horizon, cfg.energy_training_samples, origins=slice(None, n_train), end=n_train)
+    direct, direct_train = _timed(lambda: fit(X, y))
+    print(f"Direct model: trained in {direct_train:.1f}s on {len(y)} samples")
+    print()
+    print(f"{'horizon':>7} {'MAE per-h':>10} {'MAE direct':>10} {'train per-h':>11} "
+          f"{'latency per-h':>13} {'latency direct':>14}")
+
+    for horizon in HORIZONS:
+        X_train, X_val, y_train, y_val, _ = _preprocess_data(
+            data.copy(), horizon=horizon, lags=LAGS)
+        per_horizon, train_time = _timed(lambda: RandomForestRegressor(
+            n_estimators=125, min_samples_split=4, max_samples=0.9,
+            max_features="sqrt", max_depth=20, n_jobs=-1, random_state=42,
+        ).fit(X_train, y_train))
+        per_horizon_mae = mean_absolute_error(y_val, per_horizon.predict(X_val))
+
+        # Same targets, origins h + 1 days before them
+        rows = np.arange(n_train, len(features))
+        origins = rows - (horizon + 1) * 24
+        known = ~np.isnan(target[rows])
+        X_direct = np.hstack([X_origin[origins[known]], np.full((known.sum(), 1), horizon + 1.0)])
+        direct_mae = mean_absolute_error(target[rows[known]], direct.predict(X_direct))
+
+        # A request predicts the next `horizon` values
+        _, per_horizon_latency = _timed(lambda: per_horizon.predict(X_val[-horizon:]), REPEATS)
+        _, direct_latency = _timed(
+            lambda: direct.predict(origin_rows(features.derive(0, ORIGIN_LAGS, rows=1)[0], horizon)),
+            REPEATS,
+        )
+        print(
+            f"{horizon:7d} {per_horizon_mae:10.3f} {direct_mae:10.3f} {train_time:10.1f}s "
+            f"{per_horizon_latency * 1000:11.1f}ms {direct_latency * 1000:12.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Compare the vectorized energy feature engineering with the previous
+row-wise implementation on the hourly dataset, and check both produce the
+same output. Run from the repository root:
+
+    python backend/benchmark_energy_preprocessing.py [horizon] [repeats]
+
+Pass --synthetic to run on generated data of the same shape when the dataset
+is not available.
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import OrdinalEncoder
+
+from modules.energy_store import DATASET_PATH, open_store
+from modules.energy_features import DROPPED_COLUMNS
+from modules.train_energy_model import _preprocess_data
+
+SYNTHETIC = "--synthetic" in sys.argv
+ARGS = [arg for arg in sys.argv[1:] if arg != "--synthetic"]
+HORIZON = int(ARGS[0]) if len(ARGS) > 0 else 7
+REPEATS = int(ARGS[1]) if len(ARGS) > 1 else 3
+
+
+def _legacy_season_from_month(month):
+    if month in [12, 1, 2]:
+        return "winter"
+    elif month in [3, 4, 5]:
+        return "spring"
+    elif month in [6, 7, 8]:
+        return "summer"
+    elif month in [9, 10, 11]:
+        return "autumn"
+
+
+def _legacy_lag_column(df, column, horizon: int, lags=list[int]):
+    for lag in lags:
+        delay = lag + horizon
+        new_column_name = column + "_t-" + str(lag)
+        df[new_column_name] = df[column].shift(delay * 24)
+    return df
+
+
+def legacy_preprocess_data(data, horizon=None, lags=None, target="price_actual"):
+    """_preprocess_data before vectorization."""
+    data.columns = data.columns.str.replace(" ", "_").str.replace("-", "_")
+    data.sort_index(inplace=True)
+    data.index = pd.to_datetime(data.index, utc=True)
+    data = data.loc[:, data.isnull().sum() / len(data) * 100 < 0.95]
+    data.drop(columns=DROPPED_COLUMNS, inplace=True)
+    data["season"] = data.apply(lambda x: _legacy_season_from_month(x.name.month), axis=1)
+
+    if lags and horizon:
+        for column in data.columns:
+            data = _legacy_lag_column(data, column, horizon=horizon, lags=lags)
+            if column != target and column != "season":
+                data.drop(columns=column, inplace=True)
+
+    y, X = data[target], data.drop(columns=target)
+    X_train, X_val, y_train, y_val = train_test_split(
+        X, y, test_size=0.2, random_state=42, shuffle=False
+    )
+
+    features_names = X_train.columns
+    ordinal_encoder = OrdinalEncoder()
+    ordinal_encoder = ordinal_encoder.fit(X_train[["season"]])
+    X_train["season"] = ordinal_encoder.transform(X_train[["season"]])
+    X_val["season"] = ordinal_encoder.transform(X_val[["season"]])
+
+    if lags:
+        for lag in lags:
+            ordinal_encoder = ordinal_encoder.fit(X_train[[f"season_t-{lag}"]])
+            X_train[f"season_t-{lag}"] = ordinal_encoder.transform(X_train[[f"season_t-{lag}"]])
+            X_val[f"season_t-{lag}"] = ordinal_encoder.transform(X_val[[f"season_t-{lag}"]])
+
+    simp = SimpleImputer(strategy="mean")
+    simp = simp.fit(X_train)
+    return simp.transform(X_train), simp.transform(X_val), y_train, y_val, features_names
+
+
+def _synthetic_dataset() -> pd.DataFrame:
+    # Four years of hourly rows with the columns of the real dataset
+    rng = np.random.default_rng(42)
+    index = pd.date_range("2015-01-01", "2018-12-31 23:00", freq="h", tz="UTC", name="time")
+    columns = DROPPED_COLUMNS + [
+        f"generation {name}" for name in [
+            "biomass", "fossil brown coal/lignite", "fossil gas", "fossil hard coal",
+            "fossil oil", "hydro pumped storage consumption", "hydro run-of-river and poundage",
+            "hydro water reservoir", "nuclear", "other", "other renewable", "solar",
+            "waste", "wind onshore",
+        ]
+    ] + ["forecast solar day ahead", "forecast wind onshore day ahead", "total load actual",
+         "price actual"]
+    data = pd.DataFrame(rng.normal(100, 20, (len(index), len(columns))), index=index, columns=columns)
+    # Gaps in every column except the target
+    data = data.mask((rng.random(data.shape) < 0.001) & (data.columns != "price actual"))
+    data["generation hydro pumped storage aggregated"] = np.nan
+    return data
+
+
+def _dataset() -> pd.DataFrame:
+    if SYNTHETIC:
+        return _synthetic_dataset()
+    if not DATASET_PATH.exists():
+        sys.exit(f"{DATASET_PATH} not found, pass --synthetic to use generated data")
+    return open_store().frame()
+
+
+def _timed(fn, data, **kwargs):
+    timings = []
+    for _ in range(REPEATS):
+        copy = data.copy()
+        start = time.perf_counter()
+        result = fn(copy, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
+
+
+def main():
+    data = _dataset()
+    print(f"Dataset: {data.shape[0]} rows, {data.shape[1]} columns, horizon {HORIZON}")
+
+    for lags in [[1, 2, 3], [0, 1, 2]]:
+        legacy, legacy_time = _timed(legacy_preprocess_data, data, horizon=HORIZON, lags=lags)
+        vectorized, vectorized_time = _timed(_preprocess_data, data, horizon=HORIZON, lags=lags)
+
+        assert list(legacy[4]) == list(vectorized[4]), "feature names differ"
+        for name, a, b in zip(["X_train", "X_val"], legacy[:2], vectorized[:2]):
+            assert np.array_equal(a, b, equal_nan=True), f"{name} differs"
+        for name, a, b in zip(["y_train", "y_val"], legacy[2:4], vectorized[2:4]):
+            pd.testing.assert_series_equal(a, b, obj=name)
+
+        print(
+            f"lags {lags}: legacy {legacy_time:.3f}s, vectorized {vectorized_time:.3f}s, "
+            f"speedup {legacy_time / vectorized_time:.1f}x, outputs identical"
+        )
+
+
+if __name__ == "__main__":
+    main()
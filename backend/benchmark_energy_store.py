@@ -0,0 +1,78 @@
+"""Compare the per-request cost of reading the energy dataset from the CSV
+with the memory-mapped columnar store.
+
+Each variant runs in a fresh process so peak RSS is measured separately. Run
+from the repository root:
+
+    python backend/benchmark_energy_store.py [horizon] [repeats]
+"""
+import json
+import resource
+import subprocess
+import sys
+import time
+
+HORIZON = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 30
+REPEATS = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+
+def _csv_request(horizon):
+    import pandas as pd
+    from modules.energy_store import DATASET_PATH
+
+    data = pd.read_csv(DATASET_PATH, parse_dates=["time"], index_col="time")
+    return data.iloc[-horizon * 24 :: 24]["price actual"]
+
+
+def _store_request(horizon):
+    from modules.energy_store import open_store
+
+    return open_store().series("price actual", start=-horizon * 24, step=24)
+
+
+def run_variant(name):
+    request = {"csv": _csv_request, "store": _store_request}[name]
+    start = time.perf_counter()
+    request(HORIZON)
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        request(HORIZON)
+    per_request = (time.perf_counter() - start) / REPEATS
+
+    print(json.dumps({
+        "variant": name,
+        "first_ms": round(first * 1000, 2),
+        "per_request_ms": round(per_request * 1000, 3),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def main():
+    from modules.energy_store import open_store
+
+    # Build the store up front so its one-off ingest is not measured
+    open_store()
+    for name in ["csv", "store"]:
+        output = subprocess.run(
+            [sys.executable, __file__, "--variant", name, str(HORIZON), str(REPEATS)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{result['variant']:>6}: first {result['first_ms']:9.2f} ms, "
+            f"per request {result['per_request_ms']:9.3f} ms, "
+            f"peak RSS {result['peak_rss_mb']:7.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    if "--variant" in sys.argv:
+        variant = sys.argv.pop(sys.argv.index("--variant") + 1)
+        sys.argv.remove("--variant")
+        HORIZON, REPEATS = int(sys.argv[1]), int(sys.argv[2])
+        run_variant(variant)
+    else:
+        main()
@@ -0,0 +1,77 @@
+"""Compare rendering the forecast plots by building and serializing the bokeh
+figure per request with the templated rendering of modules/plot_rendering.py,
+uncached (new data every time) and cached. Run from the repository root:
+
+    python backend/benchmark_plot_rendering.py [repeats]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from bokeh.embed import file_html
+from bokeh.models import ColumnDataSource
+from bokeh.resources import CDN
+
+import config as cfg
+from modules import plot_rendering
+from modules.train_energy_model import _trend_figure
+from modules.train_steel_model import _forecast_figure
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+
+def _data(value_column, n_past, n_forecast, freq, seed):
+    rng = np.random.default_rng(seed)
+    time = pd.date_range("2023-01-01", periods=n_past + n_forecast, freq=freq)
+    values = 100 + rng.normal(size=n_past + n_forecast).cumsum()
+    return {
+        "past": {"time": time[:n_past], value_column: values[:n_past]},
+        "forecast": {"time": time[n_past:], value_column: values[n_past:]},
+        "bridge": {"time": time[n_past - 1:n_past + 1], value_column: values[n_past - 1:n_past + 1]},
+    }
+
+
+PLOTS = {
+    "energy_trend": (_trend_figure, "price", 30, 30, "D", {}),
+    "steel_forecast": (_forecast_figure, "steel_index", 11, 6, "MS", {"title": "Steel Index"}),
+}
+
+
+def legacy_render(build, data, layout):
+    sources = {name: ColumnDataSource(data=columns) for name, columns in data.items()}
+    return file_html(build(sources, **layout), CDN)
+
+
+def _timed(render):
+    sizes = []
+    start = time.perf_counter()
+    for seed in range(REPEATS):
+        sizes.append(len(render(seed)))
+    return (time.perf_counter() - start) / REPEATS * 1000, int(np.mean(sizes))
+
+
+def main():
+    # Every rendering is a cache miss unless the data repeats
+    cfg.plot_cache_max_mb = 0
+    for plot_type, (build, column, n_past, n_forecast, freq, layout) in PLOTS.items():
+        data = lambda seed: _data(column, n_past, n_forecast, freq, seed)
+        start = time.perf_counter()
+        plot_rendering.render(plot_type, data(REPEATS), **layout)
+        template_ms = (time.perf_counter() - start) * 1000
+
+        legacy = _timed(lambda seed: legacy_render(build, data(seed), layout))
+        templated = _timed(lambda seed: plot_rendering.render(plot_type, data(seed), **layout))
+        cfg.plot_cache_max_mb = 16
+        repeated = data(0)
+        plot_rendering.render(plot_type, repeated, **layout)
+        cached = _timed(lambda seed: plot_rendering.render(plot_type, repeated, **layout))
+        cfg.plot_cache_max_mb = 0
+
+        print(f"{plot_type} (template built once in {template_ms:.1f}ms)")
+        for name, (ms, size) in [("figure + file_html", legacy), ("templated", templated), ("cached", cached)]:
+            print(f"  {name:20s} {ms:8.3f}ms per plot  {size / 1024:6.1f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare the per-request data preparation of the steel forecasts: the
+previous implementation reading and merging both CSVs on every request, and
+the cached frames of modules/steel_data.py. Checks both give the same values.
+Run from the repository root:
+
+    python backend/benchmark_steel_data.py [repeats]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules import steel_data
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+
+def legacy_load_data():
+    df = pd.read_csv(steel_data.STEEL_PATH)
+    df_electricity = pd.read_csv(steel_data.ELECTRICITY_PATH)
+
+    new_column_names = {col: f"{col}_steel_index" for col in df.columns if col != "time"}
+    df = df.rename(columns=new_column_names)
+    new_column_names = {col: f"{col}_electricity_index" for col in df_electricity.columns if col != "time"}
+    df_electricity = df_electricity.rename(columns=new_column_names)
+
+    df["time"] = df["time"].apply(lambda x: f"{x}-01")
+    df_electricity["time"] = df_electricity["time"].apply(lambda x: f"{x}-01")
+
+    df = pd.merge(df, df_electricity, on="time", how="left")
+    df = df.replace(':', method='ffill')
+    return df.tail(36)
+
+
+def cached_load_data():
+    return steel_data.merged().tail(36)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = fn()
+    return result, (time.perf_counter() - start) / REPEATS
+
+
+def main():
+    start = time.perf_counter()
+    steel_data.merged()
+    first = time.perf_counter() - start
+
+    legacy, legacy_time = _timed(legacy_load_data)
+    cached, cached_time = _timed(cached_load_data)
+
+    assert list(legacy.columns) == list(cached.columns), "columns differ"
+    assert list(legacy["time"]) == list(cached["time"]), "dates differ"
+    columns = [column for column in cached.columns if column != "time"]
+    assert np.array_equal(legacy[columns].astype(np.float64), cached[columns], equal_nan=True), \
+        "values differ"
+
+    print(f"first load {first * 1000:.2f}ms")
+    print(
+        f"per request: legacy {legacy_time * 1000:.3f}ms, cached {cached_time * 1000:.3f}ms, "
+        f"speedup {legacy_time / cached_time:.0f}x, values identical"
+    )
+
+
+if __name__ == "__main__":
+    main()
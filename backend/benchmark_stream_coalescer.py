@@ -0,0 +1,111 @@
+"""Frames per streamed response with and without the stream coalescer.
+
+Streams tokens through SocketModelHandler.send_text at several generation
+rates, then replays the frames the backend sent through the BFF Executor.
+Reports the frames per response, the delay the batching adds to a token, the
+backend CPU time of the stream and the BFF CPU time of relaying it. Both ends
+encode frames as JSON like socket.io does. Unbatched means a flush after every
+token, as before. Run from the repository root:
+
+    python backend/benchmark_stream_coalescer.py [tokens]
+"""
+import contextlib
+import io
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+import config as cfg
+from model_handler.socket_model_handler import SocketModelHandler, acknowledge
+from prompts.explainer_prompt import EXPLAINER_PROMPT
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "bff"))
+from dispatcher import Dispatcher  # noqa: E402
+from executor import Executor  # noqa: E402
+
+TOKENS = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+# Tokens per second, None streams as fast as possible
+RATES = [None, 200, 50]
+
+
+class RecordingSocket:
+    """Backend socket, encodes and records every frame with its send time."""
+
+    sid = "benchmark"
+
+    def __init__(self):
+        self.frames = []
+
+    def emit(self, event, data=None):
+        json.dumps([event, *data])
+        self.frames.append((time.monotonic(), event, data))
+        if event == "finalize":
+            acknowledge(data[0])
+
+
+class UserSocket:
+    def emit(self, event, data):
+        json.dumps([event, data])
+
+
+def _tokens():
+    text = (EXPLAINER_PROMPT * (TOKENS // 100 + 1))
+    return re.findall(r"\s?\S{1,4}", text)[:TOKENS]
+
+
+def stream(rate, flush_chars):
+    cfg.stream_flush_chars = flush_chars
+    sio = RecordingSocket()
+    handler = SocketModelHandler({"id": "execution", "request": {"messages": []}}, sio)
+    written = []
+    cpu = time.process_time()
+    for token in _tokens():
+        written.append(time.monotonic())
+        handler.send_text(token)
+        if rate:
+            time.sleep(1 / rate)
+    handler.finalize()
+    cpu = time.process_time() - cpu
+
+    # Delay of each token until the frame holding it was sent
+    delays = []
+    frames = [(sent, data[2]) for sent, event, data in sio.frames if event == "send_text"]
+    tokens = iter(zip(written, _tokens()))
+    for sent, text in frames:
+        while text:
+            token_written, token = next(tokens)
+            delays.append(sent - token_written)
+            text = text[len(token):]
+    return sio.frames, delays, cpu
+
+
+def relay(frames):
+    """BFF CPU time of relaying the frames to the user."""
+    executor = Executor(RecordingSocket(), Dispatcher())
+    executor.assign({"execution": {"id": "execution"}, "user_sio": UserSocket()})
+    cpu = time.process_time()
+    for _, event, data in frames:
+        executor.recieve(event, *data)
+    return time.process_time() - cpu
+
+
+def main():
+    print(f"{TOKENS} tokens, batches of {cfg.stream_flush_chars} chars or {cfg.stream_flush_ms}ms")
+    flush_chars = cfg.stream_flush_chars
+    for rate in RATES:
+        for name, chars in [("unbatched", 1), ("coalesced", flush_chars)]:
+            # Both ends print every frame
+            with contextlib.redirect_stdout(io.StringIO()):
+                frames, delays, backend_cpu = stream(rate, chars)
+                bff_cpu = relay(frames)
+            print(
+                f"{rate or 'max'} tokens/s {name}: {len([f for f in frames if f[1] == 'send_text'])} text frames, "
+                f"added delay mean {sum(delays) / len(delays) * 1000:.1f}ms max {max(delays) * 1000:.1f}ms, "
+                f"backend cpu {backend_cpu * 1000:.1f}ms, bff cpu {bff_cpu * 1000:.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
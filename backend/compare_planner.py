@@ -0,0 +1,103 @@
+"""Compare the combined planner with the three step planner (filter, model
+selection, time extraction) on a labelled prompt set.
+
+Reports the latency of both paths, their accuracy against the labels and how
+often they agree with each other. Run from the repository root:
+
+    python backend/compare_planner.py
+"""
+import time
+from typing import List, Optional
+
+from model_handler.model_handler import ModelHandler
+from modules.module_planner import PlannerModule
+from modules.module_time import TimeModule
+
+ENERGY = "ENERGY PRICE FORECAST MODEL"
+STEEL = "STEEL PRICE FORECAST MODEL"
+
+# (prompt, expected goal or deny reason, expected models, expected days)
+LABELLED_PROMPTS = [
+    ("Can you write me a poem about the sea?", "irrelevant", [], None),
+    ("Hi there, how are you today?", "irrelevant", [], None),
+    ("What will the price of steel be in 3 months?", "explain", [STEEL], 90),
+    ("I need an energy price forecast for the next 2 weeks.", "explain", [ENERGY], 14),
+    ("How will my steel plant's margins develop over the next month?", "explain", [ENERGY, STEEL], 30),
+    ("Give me the electricity price outlook for the next 10 days.", "explain", [ENERGY], 10),
+    ("Should I buy steel now or in half a year?", "explain", [STEEL], 180),
+    ("Which steel mills have the lowest emissions?", "no_model", [], None),
+    ("Summarize the latest patents on stainless steel manufacturing.", "no_model", [], None),
+    ("Is energy expensive?", "no_time", [ENERGY], None),
+]
+
+
+class StaticModelHandler(ModelHandler):
+    def __init__(self, prompt: str):
+        super().__init__()
+        self.__messages = [{"role": "user", "content": prompt}]
+
+    def messages(self):
+        return self.__messages
+
+
+def _outcome(plan, days: Optional[int]):
+    plan = plan["orchestrationPlan"]
+    if plan["goal"] == "deny":
+        return plan["reasoning"], [], None
+    if days is None:
+        return "no_time", sorted(plan["relevantModels"]), None
+    return "explain", sorted(plan["relevantModels"]), days
+
+
+def run_combined(planner: PlannerModule, prompt: str):
+    plan = planner.execute_combined(StaticModelHandler(prompt))
+    return _outcome(plan, plan["orchestrationPlan"].get("days"))
+
+
+def run_sequential(planner: PlannerModule, time_module: TimeModule, prompt: str):
+    handler = StaticModelHandler(prompt)
+    plan = planner.execute_sequential(handler)
+    days = None
+    if plan["orchestrationPlan"]["goal"] == "explain":
+        days = time_module.execute(handler)["days"]
+    return _outcome(plan, days)
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    planner = PlannerModule(modelName="mistral-7B-instruct", mode="combined")
+    time_module = TimeModule(modelName="mistral-7B-instruct")
+    planner.prime()
+    time_module.prime()
+
+    rows: List[tuple] = []
+    for prompt, goal, models, days in LABELLED_PROMPTS:
+        expected = (goal, sorted(models), days)
+        combined, combined_time = _timed(run_combined, planner, prompt)
+        sequential, sequential_time = _timed(run_sequential, planner, time_module, prompt)
+        rows.append((prompt, expected, combined, combined_time, sequential, sequential_time))
+
+    print(f"{'prompt':60} {'combined':>10} {'3-step':>10}  agree")
+    for prompt, expected, combined, combined_time, sequential, sequential_time in rows:
+        print(
+            f"{prompt[:60]:60} {combined_time:9.2f}s {sequential_time:9.2f}s  "
+            f"{'yes' if combined == sequential else 'no'}"
+        )
+
+    n = len(rows)
+    print()
+    print(f"Mean latency combined:   {sum(r[3] for r in rows) / n:.2f}s")
+    print(f"Mean latency three step: {sum(r[5] for r in rows) / n:.2f}s")
+    print(f"Accuracy combined:       {sum(r[2] == r[1] for r in rows) / n:.0%}")
+    print(f"Accuracy three step:     {sum(r[4] == r[1] for r in rows) / n:.0%}")
+    print(f"Agreement:               {sum(r[2] == r[4] for r in rows) / n:.0%}")
+    print(f"Goal agreement:          {sum(r[2][0] == r[4][0] for r in rows) / n:.0%}")
+
+
+if __name__ == "__main__":
+    main()
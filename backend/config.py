@@ -5,6 +5,62 @@ models = {
     "mistral-7B": "./models/7B/mistral-7b.Q4_K_M.gguf"
 }
 
+# "combined" plans relevance, models and horizon in a single generation,
+# "sequential" runs the separate filter, model and time prompts
+planner_mode = "combined"
+
+# Horizon the forecasts speculatively start with while the time module is
+# still generating, None disables speculation
+speculative_forecast_days = 30
+
 grammar = {
     "json": "./custom_types/json.gbnf"
-}
\ No newline at end of file
+}
+
+# Executions a backend process runs at once, advertised to the BFF. They share
+# the loaded models and take turns on each (see model_registry.chat_completion)
+execution_workers = 2
+
+# Streamed text is sent in batches of this many characters, or once its first
+# token waited stream_flush_ms
+stream_flush_chars = 64
+stream_flush_ms = 30
+
+# How long finalize waits for the BFF to acknowledge it received every event
+# of the execution
+finalize_ack_timeout_seconds = 10
+
+# Evaluated llama.cpp states of the static prompt preambles
+prompt_cache_dir = "./models/prompt_cache"
+
+# Memory cap of the in-process forecast result cache, and whether its
+# invalidation hashes file contents instead of comparing size and mtime
+forecast_cache_max_mb = 64
+forecast_cache_hash_files = False
+
+# Memory cap of the cache of rendered forecast plot pages
+plot_cache_max_mb = 16
+
+# Asset type of the forecast plots: "chart+json" sends only the series, drawn
+# by the frontend, "html" a standalone bokeh page
+plot_asset_type = "chart+json"
+
+# Longest horizon in days the energy model forecasts, and the number of
+# (origin, days ahead) samples it is trained on
+energy_max_horizon = 365
+energy_training_samples = 200_000
+
+# Versioned registry of the trained forecast models, filled by
+# training_worker.py, and how often the worker checks for training requests
+artifact_registry_dir = "./models/registry"
+training_poll_seconds = 5
+# A failed training request is not queued again before this many seconds,
+# doubled after every further failure up to the maximum
+training_retry_seconds = 600
+training_retry_max_seconds = 86400
+
+# Checkpoints and cached fold matrices of the hyperparameter searches
+hyperparameter_search_dir = "./models/search"
+# Pick the energy model parameters with a successive-halving search when
+# training, instead of the fixed train_energy_direct.MODEL_PARAMS
+energy_hyperparameter_search = True
@@ -0,0 +1,72 @@
+import json
+from typing import Any, List, Union, get_args, get_origin
+
+from typing_extensions import Literal, NotRequired, Required, get_type_hints, is_typeddict
+
+# Builds GBNF grammars for llama.cpp from the TypedDict shapes in
+# orchestration_types, so generation can only produce JSON objects with the
+# declared keys, in declaration order, and values of the declared types.
+# Literal values are enforced as enums. Like llama.cpp's json.gbnf, strings
+# exclude control characters, which strict JSON parsing rejects, and
+# whitespace is bounded so generation cannot run on emitting it. Integers are
+# non-negative, the only integers in the shapes are counts of days.
+
+# Whitespace between tokens: nothing, a space, or a newline and up to
+# MAX_INDENT spaces or tabs
+MAX_INDENT = 20
+
+BASE_RULES = r"""
+string ::= "\"" ( [^"\\\x7F\x00-\x1F] | "\\" (["\\/bfnrt] | "u" [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F]) )* "\""
+integer ::= "0" | [1-9] [0-9]*
+number ::= "-"? ("0" | [1-9] [0-9]*) ("." [0-9]+)?
+boolean ::= "true" | "false"
+ws ::= ( " " | "\n" indent )?
+""" + "indent ::= " + r"( [ \t] " * MAX_INDENT + ")? " * MAX_INDENT + "\n"
+
+
+def _quote(value: str) -> str:
+    # JSON encode the value, then escape it as a GBNF string literal
+    encoded = json.dumps(value)
+    return '"' + encoded.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _value_rule(annotation: Any) -> str:
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+
+    if origin in (NotRequired, Required):
+        return _value_rule(args[0])
+    if annotation is str:
+        return "string"
+    if annotation is bool:
+        return "boolean"
+    if annotation is int:
+        return "integer"
+    if annotation is float:
+        return "number"
+    if annotation is type(None):
+        return '"null"'
+    if origin is Literal:
+        return "( " + " | ".join(_quote(str(arg)) for arg in args) + " )"
+    if origin is Union:
+        return "( " + " | ".join(_value_rule(arg) for arg in args) + " )"
+    if origin in (list, List):
+        item = _value_rule(args[0])
+        return f'"[" ws ( {item} ( "," ws {item} )* )? ws "]"'
+    if is_typeddict(annotation):
+        return _object_rule(annotation)
+    raise TypeError(f"Unsupported type for JSON grammar: {annotation}")
+
+
+def _object_rule(typedDict: type) -> str:
+    fields = get_type_hints(typedDict)
+    members = ' ws "," ws '.join(
+        f'{_quote(name)} ws ":" ws {_value_rule(annotation)}'
+        for name, annotation in fields.items()
+    )
+    return f'"{{" ws {members} ws "}}"'
+
+
+def grammar_from_typed_dict(typedDict: type) -> str:
+    """GBNF grammar accepting exactly the JSON objects described by a TypedDict."""
+    return f"root ::= {_object_rule(typedDict)}\n" + BASE_RULES
@@ -3,10 +3,41 @@ from typing_extensions import TypedDict, NotRequired, Literal
 
 from custom_types.message_types import ChatCompletionRequestMessage
 
+ForecastModel = Literal["ENERGY PRICE FORECAST MODEL", "STEEL PRICE FORECAST MODEL"]
+# Countries of the steel index columns in data/processed_steel_data.csv
+SteelCountry = Literal["Germany", "Greece", "Italy", "Netherlands", "Sweden"]
+
 class OrchestrationPlan(TypedDict):
     goal: Literal["deny", "explain"]
     reasoning: str
-    relevantModels: NotRequired[Literal["ENERGY PRICE FORECAST MODEL", "STEEL PRICE FORECAST MODEL"]]
+    relevantModels: NotRequired[List[ForecastModel]]
+    # Steel forecast countries, Germany when the request names none
+    countries: NotRequired[List[SteelCountry]]
+    # Only set by the combined planner, which extracts the horizon itself
+    days: NotRequired[int]
+
+# Shapes of the JSON answers generated by the planner and time modules. The
+# key order is the order the model is made to generate them in.
+
+class FilterDecision(TypedDict):
+    reasoning: str
+    decision: Literal["DECLINE", "PASS"]
+
+class ModelSelection(TypedDict):
+    models: List[ForecastModel]
+    countries: List[SteelCountry]
+    reasoning: str
+
+class TimeResponse(TypedDict):
+    reasoning: str
+    days: Optional[int]
+
+class CombinedPlan(TypedDict):
+    reasoning: str
+    decision: Literal["DECLINE", "PASS"]
+    models: List[ForecastModel]
+    countries: List[SteelCountry]
+    days: Optional[int]
 
 class ExecutionReturn(TypedDict):
     orchestrationPlan: OrchestrationPlan
@@ -14,4 +45,55 @@ class ExecutionReturn(TypedDict):
 
 class ModuleResults(TypedDict):
     text: Literal["steel", "energy"]
-    plot: str
+    # Missing when the forecast model is not trained yet. A standalone html
+    # page or a ChartSpec JSON, depending on cfg.plot_asset_type
+    plot: NotRequired[str]
+
+# Data-only plot sent as a "chart+json" asset and drawn by the frontend
+
+class ChartSeries(TypedDict):
+    name: str
+    color: str
+    # Dates as YYYY-MM-DD, values null where missing
+    x: List[str]
+    y: List[Optional[float]]
+
+class ChartSpec(TypedDict):
+    title: str
+    xLabel: str
+    yLabel: str
+    series: List[ChartSeries]
+
+# How a plot type of modules/plot_rendering.py maps to a ChartSpec: the
+# data source and color of each series, and the columns on the axes
+
+class ChartLayoutSeries(TypedDict):
+    name: str
+    source: str
+    color: str
+
+class ChartLayout(TypedDict):
+    title: str
+    xLabel: str
+    yLabel: str
+    x: str
+    y: str
+    series: List[ChartLayoutSeries]
+
+# Result of one (series, horizon) pair of a batch forecast, see
+# modules/batch_forecast.py
+
+class ForecastResult(TypedDict):
+    series: str
+    horizon: int
+    status: Literal["ok", "not_available", "training_failed"]
+    # Days or months the forecast covers, less than the horizon (clamped)
+    # when the model does not forecast that far ahead. None unless the status
+    # is ok
+    effective_horizon: Optional[int]
+    clamped: bool
+    # Dates and predicted values, empty unless the status is ok
+    dates: List[str]
+    values: List[float]
+    last_date: Optional[str]
+    version: Optional[str]
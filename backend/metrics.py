@@ -0,0 +1,28 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+# Process-wide counters, e.g. LLM generation attempts and invalid outputs.
+# Names are dotted, "<module>.<step>.<counter>".
+
+_counters: Dict[str, int] = defaultdict(int)
+_lock = threading.Lock()
+
+
+def increment(name: str, value: int = 1) -> None:
+    with _lock:
+        _counters[name] += value
+
+
+def snapshot() -> Dict[str, float]:
+    """All counters, plus "<prefix>.invalid_rate" for every "<prefix>.invalid"
+    counter that has a matching "<prefix>.attempts" counter."""
+    with _lock:
+        values = dict(_counters)
+    for name in list(values):
+        if name.endswith(".invalid"):
+            prefix = name[: -len(".invalid")]
+            attempts = values.get(f"{prefix}.attempts", 0)
+            if attempts:
+                values[f"{prefix}.invalid_rate"] = round(values[name] / attempts, 3)
+    return values
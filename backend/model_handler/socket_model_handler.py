@@ -1,8 +1,29 @@
-import uuid
-from typing import Any, List, Union
-import time
+import hashlib
+from typing import Any, Dict, List, Union
+import threading
 import logging
+import config as cfg
 from .model_handler import ModelHandler
+from .stream_coalescer import StreamCoalescer
+
+
+# Events of an execution are numbered from 1, in the order they are sent. The
+# BFF handles them in that order whatever order they arrive in, finalize
+# carries the number of the last one. Once the BFF handled all of them and
+# released the execution it acknowledges with a "finalized" event, which
+# finalize waits for. Without it, an event was lost on the way, finalize
+# sends "abandon" and the BFF fails the execution and frees its slot.
+
+_acks: Dict[str, threading.Event] = {}
+_acksLock = threading.Lock()
+
+
+def acknowledge(execution_id: str) -> None:
+    """The BFF released the execution."""
+    with _acksLock:
+        ack = _acks.get(execution_id)
+    if ack is not None:
+        ack.set()
 
 
 class SocketModelHandler(ModelHandler):
@@ -11,22 +32,51 @@ class SocketModelHandler(ModelHandler):
         self.__execution = execuiton
         self.__sio = sio
         self.is_finalized = False
+        self.__seq = 0
+        self.__text = StreamCoalescer(
+            self.__send_text, cfg.stream_flush_chars, cfg.stream_flush_ms / 1000)
 
-    def send_text(self, text):
+    def __emit(self, event, *data):
+        # Buffered text goes first to keep the order
+        with self.__text.lock:
+            self.__text.flush()
+            self.__send(event, *data)
+
+    def __send(self, event, *data):
+        # Called with the lock of the text stream held. Every event starts
+        # with the execution id, a backend runs several executions at once.
+        self.__seq += 1
+        self.__sio.emit(event, (self.__execution["id"], self.__seq, *data))
+
+    def __send_text(self, text):
         print(f"Sending text {text}")
-        self.__sio.emit("send_text", text)
+        self.__send("send_text", text)
+
+    def send_text(self, text):
+        self.__text.write(text)
 
     def send_asset(self, type: str, asset: Any):
-        id = str(uuid.uuid4())
+        # Named after the content, the BFF stores identical assets once
+        id = hashlib.sha256(asset.encode("utf-8") if isinstance(asset, str) else asset).hexdigest()
         filename = f"{id}.{type}"
         print(f"Sending {filename} {asset}")
-        self.__sio.emit("send_asset", {"id": id, "type": type, "asset": asset})
+        self.__emit("send_asset", {"id": id, "type": type, "asset": asset})
         return f"<asset:{type}:{id}.{type}>"
 
     def finalize(self):
         print(f"Finalizing")
-        time.sleep(1)
-        self.__sio.emit("finalize")
+        executionId = self.__execution["id"]
+        ack = threading.Event()
+        with _acksLock:
+            _acks[executionId] = ack
+        self.__text.close()
+        with self.__text.lock:
+            self.__sio.emit("finalize", (executionId, self.__seq))
+        if not ack.wait(cfg.finalize_ack_timeout_seconds):
+            logging.warning(f"Execution {executionId} finalized without acknowledgement, abandoning it")
+            self.__sio.emit("abandon", (executionId,))
+        with _acksLock:
+            del _acks[executionId]
         self.is_finalized = True
 
     def messages(self) -> List[str]:
@@ -34,13 +84,13 @@ class SocketModelHandler(ModelHandler):
 
     def update_status_message(self, status: str) -> None:
         print(f"Updating status message {status}")
-        self.__sio.emit("update_status_message", status)
+        self.__emit("update_status_message", status)
 
     def update_progress_bar(self, progress: Union[int, None]) -> None:
         print(f"Updating status progress {progress}")
-        self.__sio.emit("update_status_progress", progress)
+        self.__emit("update_status_progress", progress)
 
     def send_debug_thoughts(self, thought: str) -> None:
         logging.info(f"Sending debug thought {thought}")
-        self.__sio.emit("send_debug_thought", thought)
+        self.__emit("send_debug_thought", thought)
         pass
@@ -0,0 +1,78 @@
+import threading
+import time
+from typing import Callable, List, Optional
+
+# Batches streamed text into fewer socket frames.
+#
+# Tokens are buffered and sent as one text once the buffer holds max_chars
+# characters or its first token is max_delay seconds old, whichever comes
+# first, so text never waits much longer than max_delay. The time limit is
+# enforced by one flusher thread per stream, started with the first token and
+# stopped by close(). Asset tags ("<asset:...>") are sent on their own after
+# the buffered text, the frontend only recognizes them as a whole message.
+# Callers flush before sending any other event, to keep the order of the
+# stream, and close it at finalize.
+
+
+class StreamCoalescer:
+    def __init__(self, send: Callable[[str], None], max_chars: int = 64, max_delay: float = 0.03):
+        self.__send = send
+        self.__maxChars = max_chars
+        self.__maxDelay = max_delay
+        self.__buffer: List[str] = []
+        self.__length = 0
+        # When the first buffered token was written
+        self.__since: Optional[float] = None
+        self.__closed = False
+        self.__flusher: Optional[threading.Thread] = None
+        # Held while sending, so timed flushes do not interleave with the
+        # events of the caller
+        self.lock = threading.RLock()
+        self.__changed = threading.Condition(self.lock)
+
+    def write(self, text: str) -> None:
+        with self.lock:
+            if text.startswith("<asset:"):
+                self.flush()
+                self.__send(text)
+                return
+            self.__buffer.append(text)
+            self.__length += len(text)
+            if self.__length >= self.__maxChars or self.__closed:
+                self.flush()
+            elif self.__since is None:
+                self.__since = time.monotonic()
+                if self.__flusher is None and not self.__closed:
+                    self.__flusher = threading.Thread(target=self.__run, daemon=True)
+                    self.__flusher.start()
+                self.__changed.notify()
+
+    def flush(self) -> None:
+        """Send the buffered text now."""
+        with self.lock:
+            if not self.__buffer:
+                return
+            text = "".join(self.__buffer)
+            self.__buffer = []
+            self.__length = 0
+            self.__since = None
+            self.__send(text)
+
+    def close(self) -> None:
+        """Send the buffered text and stop the flusher thread."""
+        with self.lock:
+            self.flush()
+            self.__closed = True
+            self.__changed.notify()
+
+    def __run(self) -> None:
+        with self.lock:
+            while not self.__closed:
+                if self.__since is None:
+                    self.__changed.wait()
+                    continue
+                wait = self.__since + self.__maxDelay - time.monotonic()
+                if wait > 0:
+                    self.__changed.wait(wait)
+                else:
+                    self.flush()
@@ -0,0 +1,51 @@
+# Base packages
+import logging
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple, Union
+
+# 3rd party packages
+import numpy as np
+import pandas as pd
+
+# In-process cache for model pickles and CSV files read on the request path.
+# Entries are keyed by path and modification time, so a retrained model or a
+# refreshed dataset is picked up on the next access without a restart.
+
+_entries: Dict[Tuple[str, str], Tuple[int, Any]] = {}
+_lock = threading.Lock()
+
+
+def _cached(kind: str, path: Union[str, Path], loader) -> Any:
+    path = str(path)
+    mtime = os.stat(path).st_mtime_ns
+    with _lock:
+        entry = _entries.get((kind, path))
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+
+    logging.info(f"Loading {kind} {path}")
+    value = loader(path)
+    with _lock:
+        _entries[(kind, path)] = (mtime, value)
+    return value
+
+
+def load_pickle(path: Union[str, Path]) -> Any:
+    def loader(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    return _cached("pickle", path, loader)
+
+
+def load_numpy(path: Union[str, Path]) -> np.ndarray:
+    return _cached("numpy", path, np.load)
+
+
+def read_csv(path: Union[str, Path], **kwargs) -> pd.DataFrame:
+    """Cached pd.read_csv. Returns a copy, callers are free to modify it."""
+    kind = f"csv{sorted(kwargs.items())}"
+    return _cached(kind, path, lambda path: pd.read_csv(path, **kwargs)).copy()
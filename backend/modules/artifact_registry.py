@@ -0,0 +1,299 @@
+# Base packages
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# 3rd party packages
+from sklearn.ensemble import RandomForestRegressor
+
+# Own packages
+import config as cfg
+
+from . import artifact_cache, compact_forest
+
+# Versioned registry of the trained forecast models.
+#
+# Models are trained off the request path by training_worker.py, which
+# publishes each one as a new version: the model under <registry>/<name>/ plus
+# an entry in <registry>/index.json with its metadata (training data hash, last
+# date, servable horizons, metrics, feature names). Random forests are stored
+# in the memory-mappable compact format (see compact_forest.py), other models
+# as pickles. Request-time code only looks up the latest ready version in
+# the index. When there is none it raises ArtifactNotAvailable and leaves a
+# training request in <registry>/queue for the worker, so a request never
+# blocks on training.
+#
+# The worker records a failed training in <registry>/failed. Until the retry
+# delay passed (cfg.training_retry_seconds, doubled after every consecutive
+# failure) the request is not queued again and lookups raise TrainingFailed,
+# so a training that always fails does not keep the worker busy.
+
+
+class ArtifactNotAvailable(Exception):
+    def __init__(self, name: str, **match):
+        self.name = name
+        self.match = match
+        super().__init__(f"No trained {name} model available for {match}")
+
+
+class TrainingFailed(ArtifactNotAvailable):
+    def __init__(self, name: str, failure: dict, **match):
+        self.name = name
+        self.match = match
+        self.failure = failure
+        Exception.__init__(
+            self, f"Training of {name} model for {match} failed at {failure['failed']}: {failure['error']}")
+
+
+def _registry_dir() -> Path:
+    return Path(cfg.artifact_registry_dir)
+
+
+def _index_path() -> Path:
+    return _registry_dir() / "index.json"
+
+
+def _queue_dir() -> Path:
+    return _registry_dir() / "queue"
+
+
+def _failed_dir() -> Path:
+    return _registry_dir() / "failed"
+
+
+def _write_atomic(path: Path, write) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tempPath = path.with_name(path.name + ".tmp")
+    with open(tempPath, "wb") as f:
+        write(f)
+    os.replace(tempPath, path)
+
+
+_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def data_hash(files: Iterable[Union[str, Path]]) -> str:
+    """sha256 over the contents of the training data files."""
+    digest = hashlib.sha256()
+    for path in files:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        if key not in _hashes:
+            fileDigest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(2**20), b""):
+                    fileDigest.update(chunk)
+            _hashes[key] = fileDigest.hexdigest()
+        digest.update(_hashes[key].encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Index
+
+_index: Optional[Tuple[int, Dict[str, List[dict]]]] = None
+_indexLock = threading.Lock()
+
+
+def _read_index() -> Dict[str, List[dict]]:
+    global _index
+    try:
+        mtime = os.stat(_index_path()).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    with _indexLock:
+        if _index is None or _index[0] != mtime:
+            with open(_index_path()) as f:
+                _index = (mtime, json.load(f)["artifacts"])
+        return _index[1]
+
+
+@contextmanager
+def _locked_index():
+    """Index for updating, locked against other writers."""
+    _registry_dir().mkdir(parents=True, exist_ok=True)
+    with open(_registry_dir() / "index.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        artifacts = {}
+        if _index_path().exists():
+            with open(_index_path()) as f:
+                artifacts = json.load(f)["artifacts"]
+        yield artifacts
+        _write_atomic(
+            _index_path(),
+            lambda f: f.write(json.dumps({"artifacts": artifacts}, indent=2).encode("utf-8")),
+        )
+
+
+def _matches(entry: dict, match: Dict[str, Any]) -> bool:
+    if entry["status"] != "ready":
+        return False
+    for key, value in match.items():
+        if value is None:
+            continue
+        if key == "horizon":
+            if value not in entry["horizons"]:
+                return False
+        elif entry.get(key) != value:
+            return False
+    return True
+
+
+def latest(name: str, **match) -> dict:
+    """Metadata of the latest ready version matching the metadata values,
+    e.g. horizon (served by the version) or series."""
+    for entry in reversed(_read_index().get(name, [])):
+        if _matches(entry, match):
+            return entry
+    raise ArtifactNotAvailable(name, **match)
+
+
+def load(
+    name: str,
+    data_files: Optional[Iterable[Union[str, Path]]] = None,
+    **match,
+) -> Tuple[Any, dict]:
+    """Latest ready model matching the metadata values and its metadata.
+    Requests training when there is none, or when it was trained on other
+    data than data_files (the stale model is still returned)."""
+    try:
+        entry = latest(name, **match)
+    except ArtifactNotAvailable:
+        failure = recent_failure(name, **match)
+        if failure is not None:
+            raise TrainingFailed(name, failure, **match) from None
+        request_training(name, **match)
+        raise
+    if data_files is not None and entry["data_hash"] != data_hash(data_files):
+        request_training(name, **match)
+    if entry.get("format") == "compact_forest":
+        return compact_forest.load(path(entry)), entry
+    return artifact_cache.load_pickle(path(entry)), entry
+
+
+def path(entry: dict) -> Path:
+    return _registry_dir() / entry["path"]
+
+
+def publish(
+    name: str,
+    model: Any,
+    data_hash: str,
+    last_date: str,
+    horizons: List[int],
+    metrics: Dict[str, float],
+    feature_names: List[str],
+    **extra,
+) -> dict:
+    """Store a trained model as the latest version of an artifact."""
+    created = datetime.now(timezone.utc)
+    version = f"{created.strftime('%Y%m%dT%H%M%S%f')}-{data_hash[:8]}"
+    compact = isinstance(model, RandomForestRegressor) and model.n_outputs_ == 1
+    entry = {
+        "name": name,
+        "version": version,
+        "status": "ready",
+        "created": created.isoformat(),
+        "format": "compact_forest" if compact else "pickle",
+        "path": f"{name}/{version}" if compact else f"{name}/{version}.pkl",
+        "data_hash": data_hash,
+        "last_date": last_date,
+        "horizons": [int(horizon) for horizon in horizons],
+        "metrics": {key: float(value) for key, value in metrics.items()},
+        "feature_names": [str(feature) for feature in feature_names],
+        **extra,
+    }
+    if compact:
+        compact_forest.export(model, path(entry))
+    else:
+        _write_atomic(path(entry), lambda f: pickle.dump(model, f))
+    with _locked_index() as artifacts:
+        artifacts.setdefault(name, []).append(entry)
+    logging.info(f"Published {name} model version {version}")
+    return entry
+
+
+# Training requests
+
+
+def _request_name(name: str, match: Dict[str, Any]) -> str:
+    suffix = "".join(f"-{match[key]}" for key in sorted(match) if match[key] is not None)
+    return f"{name}{suffix}.json"
+
+
+def _request_path(name: str, match: Dict[str, Any]) -> Path:
+    return _queue_dir() / _request_name(name, match)
+
+
+def _failure_path(name: str, match: Dict[str, Any]) -> Path:
+    return _failed_dir() / _request_name(name, match)
+
+
+def _read_failure(name: str, match: Dict[str, Any]) -> Optional[dict]:
+    try:
+        with open(_failure_path(name, match)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def recent_failure(name: str, **match) -> Optional[dict]:
+    """The recorded failure of the last training for the artifact and
+    metadata values, while it is not retried yet."""
+    failure = _read_failure(name, match)
+    if failure is None:
+        return None
+    delay = min(
+        cfg.training_retry_seconds * 2 ** (failure["attempts"] - 1),
+        cfg.training_retry_max_seconds,
+    )
+    age = datetime.now(timezone.utc) - datetime.fromisoformat(failure["failed"])
+    return failure if age.total_seconds() < delay else None
+
+
+def request_training(name: str, **match) -> None:
+    """Queue a training request for the worker, once per artifact and
+    metadata values, unless its last training failed recently."""
+    requestPath = _request_path(name, match)
+    if requestPath.exists() or recent_failure(name, **match) is not None:
+        return
+    logging.info(f"Requesting training of {name} model for {match}")
+    request = {"name": name, "match": match, "requested": datetime.now(timezone.utc).isoformat()}
+    _write_atomic(requestPath, lambda f: f.write(json.dumps(request).encode("utf-8")))
+
+
+def complete_request(requestPath: Path, request: dict, error: Optional[str] = None) -> None:
+    """Remove a handled training request, recording the error when the
+    training failed."""
+    failurePath = _failure_path(request["name"], request["match"])
+    if error is None:
+        failurePath.unlink(missing_ok=True)
+    else:
+        previous = _read_failure(request["name"], request["match"])
+        failure = {
+            "name": request["name"],
+            "match": request["match"],
+            "failed": datetime.now(timezone.utc).isoformat(),
+            "error": error,
+            "attempts": previous["attempts"] + 1 if previous else 1,
+        }
+        _write_atomic(failurePath, lambda f: f.write(json.dumps(failure).encode("utf-8")))
+    requestPath.unlink(missing_ok=True)
+
+
+def pending_requests() -> List[Tuple[Path, dict]]:
+    """Queued training requests, oldest first."""
+    if not _queue_dir().exists():
+        return []
+    requests = []
+    for requestPath in _queue_dir().glob("*.json"):
+        with open(requestPath) as f:
+            requests.append((requestPath, json.load(f)))
+    return sorted(requests, key=lambda request: request[1]["requested"])
@@ -0,0 +1,79 @@
+# Base packages
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+# Own packages
+from custom_types.orchestration_types import ForecastResult
+
+from . import artifact_registry
+from .module_energy import EnergyModule
+from .module_steel import SteelModule
+
+# Batch forecasts for many (series, horizon) pairs in one call.
+#
+# Series are "energy" or "steel:<country>", e.g. "steel:Italy" for the
+# Italy_steel_index column of the steel dataset. The pairs are grouped by
+# series, so the data of each series is loaded once and every model runs a
+# single predict for all the horizons it serves: the direct energy model
+# predicts up to the longest horizon once and each horizon is a prefix of
+# that, steel has one model per horizon. Results come back in request order,
+# with status "not_available" where no trained model exists yet (training
+# is requested in the registry as for a single forecast), or
+# "training_failed" while the registry backs off from a failed training.
+# A horizon beyond the longest the model serves is forecast up to that one
+# and flagged as clamped, with the effective horizon.
+
+
+def parse_series(series: str) -> Tuple[str, Optional[str]]:
+    """Artifact name and country of a series name."""
+    name, _, country = series.partition(":")
+    return name, country or None
+
+
+def _not_available(series: str, horizon: int, status: str = "not_available") -> ForecastResult:
+    return {
+        "series": series,
+        "horizon": horizon,
+        "status": status,
+        "effective_horizon": None,
+        "clamped": False,
+        "dates": [],
+        "values": [],
+        "last_date": None,
+        "version": None,
+    }
+
+
+def _forecast_series(series: str, horizons: List[int]) -> Dict[int, ForecastResult]:
+    name, country = parse_series(series)
+    if name == "energy":
+        return EnergyModule().forecast(horizons)
+    if name == "steel":
+        return SteelModule(model_name="Steel", country=country or "Germany").forecast(horizons)
+    raise ValueError(f"Unknown forecast series {series}")
+
+
+def forecast(requests: List[Tuple[str, int]]) -> List[ForecastResult]:
+    """Forecasts for (series, horizon) pairs, in the order of the pairs."""
+    horizons = defaultdict(list)
+    for series, horizon in requests:
+        horizons[series].append(horizon)
+
+    results = {}
+    for series, series_horizons in horizons.items():
+        status = "not_available"
+        try:
+            forecasts = _forecast_series(series, series_horizons)
+        except artifact_registry.ArtifactNotAvailable as e:
+            logging.warning(e)
+            forecasts = {}
+            if isinstance(e, artifact_registry.TrainingFailed):
+                status = "training_failed"
+        for horizon in series_horizons:
+            if horizon in forecasts:
+                results[(series, horizon)] = {**forecasts[horizon], "series": series}
+            else:
+                results[(series, horizon)] = _not_available(series, horizon, status)
+
+    return [results[(series, horizon)] for series, horizon in requests]
@@ -0,0 +1,165 @@
+# Base packages
+import json
+import logging
+import os
+import pickle
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Union
+
+# 3rd party packages
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+# Array-backed inference format for trained random forests.
+#
+# The nodes of all trees are concatenated into flat arrays (split feature,
+# threshold, children, missing value direction and leaf value), stored as one
+# .npy file each so they can be memory-mapped instead of unpickled. Only what
+# prediction and the explanations need is kept.
+#
+# predict() walks all trees for all rows at once, one tree level per step. It
+# reproduces RandomForestRegressor.predict exactly: inputs are cast to float32
+# and compared to the float64 thresholds as in sklearn, and the tree outputs
+# are added up in tree order before dividing by the number of trees.
+
+# Marks a leaf in the feature array, as in sklearn
+LEAF = -2
+ARRAYS = ["feature", "threshold", "left", "right", "missing_left", "value", "roots"]
+
+
+class CompactForest:
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: dict):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.feature_importances_ = arrays["feature_importances"]
+        self.feature_names_in_ = (
+            np.array(meta["feature_names"], dtype=object)
+            if meta["feature_names"] is not None else None
+        )
+        self.n_features_in_ = meta["n_features"]
+        self.max_depth = meta["max_depth"]
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def from_forest(cls, forest: RandomForestRegressor) -> "CompactForest":
+        if forest.n_outputs_ != 1:
+            raise ValueError("Only single output forests can be compacted")
+
+        arrays = {name: [] for name in ARRAYS}
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            children = np.stack([tree.children_left, tree.children_right])
+            # Child ids become global, leaves keep -1
+            children = np.where(children >= 0, children + offset, -1)
+            arrays["feature"].append(tree.feature.astype(np.int32))
+            arrays["threshold"].append(tree.threshold.astype(np.float64))
+            arrays["left"].append(children[0].astype(np.int32))
+            arrays["right"].append(children[1].astype(np.int32))
+            arrays["missing_left"].append(
+                np.asarray(getattr(tree, "missing_go_to_left", np.zeros(tree.node_count)), dtype=bool)
+            )
+            arrays["value"].append(tree.value[:, 0, 0].astype(np.float64))
+            arrays["roots"].append([offset])
+            offset += tree.node_count
+
+        arrays = {name: np.concatenate(parts) for name, parts in arrays.items()}
+        arrays["roots"] = arrays["roots"].astype(np.int32)
+        arrays["feature_importances"] = forest.feature_importances_
+        featureNames = getattr(forest, "feature_names_in_", None)
+        meta = {
+            "n_features": int(forest.n_features_in_),
+            "feature_names": None if featureNames is None else [str(name) for name in featureNames],
+            "max_depth": int(max(estimator.tree_.max_depth for estimator in forest.estimators_)),
+        }
+        return cls(arrays, meta)
+
+    def predict(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame) and self.feature_names_in_ is not None:
+            X = X[list(self.feature_names_in_)]
+        # sklearn predicts on float32 inputs
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"X has shape {X.shape}, the forest expects {self.n_features_in_} features")
+
+        # One path per (row, tree), only the ones not at a leaf yet are advanced
+        nodes = np.tile(self.roots, len(X))
+        rows = np.repeat(np.arange(len(X)), len(self.roots))
+        active = np.arange(len(nodes))
+        for _ in range(self.max_depth + 1):
+            current = nodes[active]
+            feature = self.feature[current]
+            split = feature != LEAF
+            active, current, feature = active[split], current[split], feature[split]
+            if not len(active):
+                break
+            values = X[rows[active], feature]
+            goLeft = np.where(
+                np.isnan(values), self.missing_left[current], values <= self.threshold[current])
+            nodes[active] = np.where(goLeft, self.left[current], self.right[current])
+
+        # Sequential sum in tree order, as the forest accumulates its trees
+        leafValues = self.value[nodes].reshape(len(X), len(self.roots))
+        return np.cumsum(leafValues, axis=1)[:, -1] / len(self.roots)
+
+    def save(self, directory: Union[str, Path]) -> None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS + ["feature_importances"]:
+            array = self.feature_importances_ if name == "feature_importances" else getattr(self, name)
+            np.save(directory / f"{name}.npy", np.asarray(array))
+        meta = {
+            "n_features": self.n_features_in_,
+            "feature_names": None if self.feature_names_in_ is None else list(self.feature_names_in_),
+            "max_depth": self.max_depth,
+        }
+        # Written last, marks the export as complete
+        with open(directory / "meta.json", "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], mmap: bool = True) -> "CompactForest":
+        directory = Path(directory)
+        with open(directory / "meta.json") as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(directory / f"{name}.npy", mmap_mode="r" if mmap else None)
+            for name in ARRAYS + ["feature_importances"]
+        }
+        return cls(arrays, meta)
+
+
+def export(forest: RandomForestRegressor, directory: Union[str, Path]) -> CompactForest:
+    """Write a trained forest in the compact format."""
+    compact = CompactForest.from_forest(forest)
+    compact.save(directory)
+    return compact
+
+
+_forests: Dict[str, tuple] = {}
+_forestsLock = threading.Lock()
+
+
+def load(directory: Union[str, Path]) -> CompactForest:
+    """Memory-mapped forest, cached until the export is rewritten."""
+    directory = str(directory)
+    mtime = os.stat(Path(directory) / "meta.json").st_mtime_ns
+    with _forestsLock:
+        entry = _forests.get(directory)
+        if entry is None or entry[0] != mtime:
+            logging.info(f"Loading compact forest {directory}")
+            entry = _forests[directory] = (mtime, CompactForest.load(directory))
+        return entry[1]
+
+
+if __name__ == "__main__":
+    # Convert a pickled forest: python -m modules.compact_forest model.pkl out_dir
+    with open(sys.argv[1], "rb") as f:
+        export(pickle.load(f), sys.argv[2])
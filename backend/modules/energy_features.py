@@ -0,0 +1,274 @@
+# Base packages
+import logging
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+# 3rd party packages
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import OrdinalEncoder
+
+# Own packages
+from .energy_store import DATASET_PATH, open_store
+
+# Incremental feature matrices of the energy models.
+#
+# Every horizon's features are lags of the same hourly columns, so a single
+# base matrix is kept: the prepared columns of the dataset with the season
+# ordinal encoded. The features for a horizon and lags are derived from it by
+# shifting, then imputed with the column means of the training rows, as
+# _preprocess_data does. Lagged seasons before the first row are not imputed,
+# they get the extra missing season category _preprocess_data encodes them as.
+#
+# The fitted state (selected columns, number of training rows, the season
+# encoder and one imputer per horizon and lags) is frozen when the base is
+# first built. When new hourly rows are added to the dataset only those rows
+# are prepared and appended to the base; the training rows never change, so
+# the fitted transformers stay valid. If the rows already in the base changed,
+# the dataset is no longer an extension of the base and the base and state
+# are rebuilt.
+
+FEATURES_DIR = DATASET_PATH.parent / "features"
+
+ImputerKey = Tuple[int, Tuple[int, ...]]
+
+# Season of each month, indexed by month number
+SEASONS = np.array(
+    [None]
+    + ["winter"] * 2
+    + ["spring"] * 3
+    + ["summer"] * 3
+    + ["autumn"] * 3
+    + ["winter"],
+    dtype=object,
+)
+
+DROPPED_COLUMNS = [
+    "price_day_ahead",
+    "generation_marine",
+    "generation_fossil_coal_derived_gas",
+    "generation_fossil_oil_shale",
+    "generation_fossil_peat",
+    "generation_geothermal",
+    "total_load_forecast",
+]
+
+
+def prepare_data(data: pd.DataFrame, columns: list[str] | None = None) -> pd.DataFrame:
+    """Rename, sort and select the raw columns and add the season. Without
+    columns, the ones with too many missing values are dropped."""
+    # Rename columns by replacing all - or blank space with _
+    data.columns = data.columns.str.replace(" ", "_").str.replace("-", "_")
+
+    data.sort_index(inplace=True)
+
+    # Make the index DT
+    data.index = pd.to_datetime(data.index, utc=True)
+
+    if columns is None:
+        # Drop columns with more than 95% missing values
+        data = data.loc[:, data.isnull().sum() / len(data) * 100 < 0.95]
+        data = data.drop(columns=DROPPED_COLUMNS)
+    else:
+        data = data[[column for column in columns if column != "season"]]
+
+    data["season"] = SEASONS[data.index.month]
+    return data
+
+
+class EnergyFeatures:
+    def __init__(self, base: np.ndarray, state: dict):
+        self.__base = base
+        self.__state = state
+        self.__lock = threading.Lock()
+
+    @property
+    def columns(self) -> List[str]:
+        return self.__state["columns"]
+
+    @property
+    def source(self) -> dict:
+        return self.__state["source"]
+
+    def __len__(self) -> int:
+        return len(self.__base)
+
+    @classmethod
+    def fit(cls, data: pd.DataFrame, source: Optional[dict] = None) -> "EnergyFeatures":
+        """Build the base matrix and fit the season encoder on the raw dataset."""
+        data = prepare_data(data.copy())
+        # Same training rows as the split in _preprocess_data
+        n_train = len(train_test_split(np.arange(len(data)), test_size=0.2, shuffle=False)[0])
+        encoder = OrdinalEncoder().fit(data[["season"]].iloc[:n_train])
+        state = {
+            "columns": list(data.columns),
+            "n_train": n_train,
+            "season_encoder": encoder,
+            "imputers": {},
+            "source": source,
+            "last_time": data.index[-1],
+        }
+        return cls(cls.__encode(data, encoder), state)
+
+    @staticmethod
+    def __encode(data: pd.DataFrame, encoder: OrdinalEncoder) -> np.ndarray:
+        data = data.copy()
+        data["season"] = encoder.transform(data[["season"]])
+        return data.to_numpy(np.float64)
+
+    def extends(self, data: pd.DataFrame) -> bool:
+        """Whether the first rows of the raw dataset are the rows of the base,
+        so newer rows can be appended."""
+        try:
+            data = prepare_data(data.copy(), columns=self.columns)
+        except KeyError:
+            return False
+        with self.__lock:
+            base, last_time = self.__base, self.__state["last_time"]
+        data = data.iloc[: len(base)]
+        return (
+            len(data) == len(base)
+            and data.index[-1] == last_time
+            and np.array_equal(self.__encode(data, self.__state["season_encoder"]), base, equal_nan=True)
+        )
+
+    def append(self, data: pd.DataFrame, source: Optional[dict] = None) -> int:
+        """Append the rows of the raw dataset newer than the base. Returns the
+        number of rows added."""
+        data = prepare_data(data.copy(), columns=self.columns)
+        with self.__lock:
+            data = data[data.index > self.__state["last_time"]]
+            if len(data):
+                rows = self.__encode(data, self.__state["season_encoder"])
+                self.__base = np.concatenate([self.__base, rows])
+                self.__state["last_time"] = data.index[-1]
+            if source is not None:
+                self.__state["source"] = source
+        return len(data)
+
+    def column(self, name: str) -> np.ndarray:
+        """Values of a prepared column (the season ordinal encoded)."""
+        with self.__lock:
+            return np.array(self.__base[:, self.columns.index(name)])
+
+    def feature_names(self, lags: List[int]) -> List[str]:
+        return ["season"] + [f"{column}_t-{lag}" for column in self.columns for lag in lags]
+
+    def __shifted(self, shift: int, start: int, stop: int) -> np.ndarray:
+        # Rows [start, stop) of the base shifted down by shift rows
+        shifted = np.full((stop - start, self.__base.shape[1]), np.nan)
+        first = max(start, shift)
+        if first < stop:
+            shifted[first - start :] = self.__base[first - shift : stop - shift]
+        return shifted
+
+    def __lagged(self, horizon: int, lags: List[int], start: int, stop: int) -> np.ndarray:
+        lagged = np.stack(
+            [self.__shifted((lag + horizon) * 24, start, stop) for lag in lags], axis=2
+        )
+        # _preprocess_data ordinal encodes the lagged seasons, missing ones
+        # before the first row become a category after the seasons, they are
+        # not imputed
+        seasonIndex = self.columns.index("season")
+        missingSeason = len(self.__state["season_encoder"].categories_[0])
+        seasons = lagged[:, seasonIndex, :]
+        seasons[np.isnan(seasons)] = missingSeason
+        lagged = lagged.reshape(stop - start, -1)
+        season = self.__base[start:stop, [seasonIndex]]
+        # Column major like the DataFrame _preprocess_data imputes
+        return np.asfortranarray(np.hstack([season, lagged]))
+
+    def __imputer(self, horizon: int, lags: List[int]) -> SimpleImputer:
+        key: ImputerKey = (horizon, tuple(lags))
+        with self.__lock:
+            imputer = self.__state["imputers"].get(key)
+            if imputer is None:
+                logging.info(f"Fitting energy feature imputer for horizon {horizon}, lags {lags}")
+                train = self.__lagged(horizon, lags, 0, self.__state["n_train"])
+                imputer = SimpleImputer(strategy="mean").fit(train)
+                self.__state["imputers"][key] = imputer
+        return imputer
+
+    def derive(self, horizon: int, lags: List[int], rows: Optional[int] = None) -> np.ndarray:
+        """Imputed features of the last rows (all of them by default) for a
+        horizon and lags, as _preprocess_data computes them."""
+        imputer = self.__imputer(horizon, lags)
+        with self.__lock:
+            stop = len(self.__base)
+            start = 0 if rows is None else max(stop - rows, 0)
+            features = self.__lagged(horizon, lags, start, stop)
+        return imputer.transform(features)
+
+    def save(self, directory: Union[str, Path] = FEATURES_DIR) -> None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self.__lock:
+            base, state = self.__base, dict(self.__state)
+            state["imputers"] = dict(state["imputers"])
+        # Replaced rather than overwritten, memory-mapped readers keep the old file
+        for filename, write in [
+            ("base.npy", lambda f: np.save(f, base)),
+            ("state.pkl", lambda f: pickle.dump(state, f)),
+        ]:
+            temp_path = directory / f"{filename}.tmp"
+            with open(temp_path, "wb") as f:
+                write(f)
+            os.replace(temp_path, directory / filename)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path] = FEATURES_DIR) -> "EnergyFeatures":
+        directory = Path(directory)
+        with open(directory / "state.pkl", "rb") as f:
+            state = pickle.load(f)
+        return cls(np.load(directory / "base.npy", mmap_mode="r"), state)
+
+
+_features: Dict[Path, EnergyFeatures] = {}
+_featuresLock = threading.Lock()
+
+
+def files(directory: Union[str, Path] = FEATURES_DIR) -> List[Path]:
+    """Files the derived features depend on, for cache fingerprints."""
+    return [Path(directory) / "base.npy", Path(directory) / "state.pkl"]
+
+
+def open_features(
+    csv_path: Union[str, Path] = DATASET_PATH,
+    directory: Union[str, Path] = FEATURES_DIR,
+) -> EnergyFeatures:
+    """Return the features of the dataset, appending rows added to it since
+    the last call and building them on first use."""
+    directory = Path(directory)
+    store = open_store(csv_path)
+    source = store.meta["source"]
+    with _featuresLock:
+        features = _features.get(directory)
+        if features is None and (directory / "state.pkl").exists():
+            features = EnergyFeatures.load(directory)
+        if features is not None and features.source == source:
+            _features[directory] = features
+            return features
+
+        frame = store.frame() if features is not None and len(features) < len(store) else None
+        # A rewritten dataset is rebuilt, not mixed with the stale rows
+        if frame is not None and features.extends(frame):
+            added = features.append(frame.iloc[len(features):], source=source)
+            # Rows inserted before the end of the base are not appended
+            if len(features) == len(store):
+                logging.info(f"Appended {added} rows to the energy features")
+            else:
+                features = None
+        else:
+            features = None
+
+        if features is None:
+            logging.info(f"Building energy features in {directory}")
+            features = EnergyFeatures.fit(store.frame() if frame is None else frame, source=source)
+        features.save(directory)
+        _features[directory] = features
+        return features
@@ -0,0 +1,144 @@
+# Base packages
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+# 3rd party packages
+import numpy as np
+import pandas as pd
+
+# Columnar, memory-mapped copy of data/energy/dataset.csv.
+#
+# The hourly CSV is parsed once by ingest() into one .npy file per column
+# plus the timestamps (UTC) and their original UTC offsets. Request-time code
+# memory-maps the columns and slices the rows it needs without any parsing.
+# The store remembers the size and mtime of the CSV it was built from and is
+# rebuilt automatically when the CSV changes.
+
+DATASET_PATH = Path(__file__).parent.parent.parent / "data/energy/dataset.csv"
+# Relative to the directory of the CSV
+STORE_DIRNAME = "columnar"
+
+
+def _source_version(csv_path: Path) -> Dict[str, int]:
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _save(path: Path, array: np.ndarray) -> None:
+    # Replace rather than overwrite, so processes that memory-mapped the old
+    # file keep a valid mapping
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(temp_path, path)
+
+
+def _store_dir(csv_path: Union[str, Path]) -> Path:
+    return Path(csv_path).parent / STORE_DIRNAME
+
+
+def ingest(csv_path: Union[str, Path] = DATASET_PATH) -> None:
+    """Convert the hourly CSV into the columnar store next to it."""
+    csv_path, store_dir = Path(csv_path), _store_dir(csv_path)
+    logging.info(f"Ingesting {csv_path} into {store_dir}")
+    version = _source_version(csv_path)
+    data = pd.read_csv(csv_path)
+
+    # Timestamps carry a DST dependent offset, keep it to restore local dates
+    local_times = data.pop("time")
+    times = pd.to_datetime(local_times, utc=True)
+    offsets = (
+        pd.to_datetime(local_times.str.slice(0, 19)) - times.dt.tz_localize(None)
+    ).dt.total_seconds()
+
+    store_dir.mkdir(parents=True, exist_ok=True)
+    _save(store_dir / "time.npy", times.dt.tz_localize(None).to_numpy("datetime64[ns]"))
+    _save(store_dir / "utc_offset.npy", offsets.to_numpy(np.int32))
+
+    columns = {}
+    for i, column in enumerate(data.columns):
+        filename = f"column_{i}.npy"
+        _save(store_dir / filename, pd.to_numeric(data[column]).to_numpy(np.float64))
+        columns[column] = filename
+
+    meta = {"source": version, "rows": len(data), "columns": columns}
+    # Written last, a store without meta.json is incomplete
+    with open(store_dir / "meta.json", "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+class EnergyStore:
+    def __init__(self, store_dir: Union[str, Path]):
+        self.store_dir = Path(store_dir)
+        with open(self.store_dir / "meta.json") as f:
+            self.meta = json.load(f)
+        self.columns = list(self.meta["columns"])
+        self.__time = np.load(self.store_dir / "time.npy", mmap_mode="r")
+        self.__offsets = np.load(self.store_dir / "utc_offset.npy", mmap_mode="r")
+        self.__arrays: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only memory-mapped values of a column."""
+        if name not in self.__arrays:
+            self.__arrays[name] = np.load(
+                self.store_dir / self.meta["columns"][name], mmap_mode="r"
+            )
+        return self.__arrays[name]
+
+    def index(self, start: Optional[int] = None, step: Optional[int] = None) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(self.__time[start::step], name="time").tz_localize("UTC")
+
+    def series(self, name: str, start: Optional[int] = None, step: Optional[int] = None) -> pd.Series:
+        """Rows [start::step] of a column, indexed by UTC time."""
+        return pd.Series(
+            np.array(self.column(name)[start::step]),
+            index=self.index(start, step),
+            name=name,
+        )
+
+    def frame(self, start: Optional[int] = None) -> pd.DataFrame:
+        """Rows [start:] of the dataset in memory, indexed by UTC time."""
+        return pd.DataFrame(
+            {name: np.array(self.column(name)[start:]) for name in self.columns},
+            index=self.index(start),
+        )
+
+    def last_date(self) -> str:
+        """Local date of the last row, as in the CSV."""
+        last = self.__time[-1] + np.timedelta64(int(self.__offsets[-1]), "s")
+        return pd.Timestamp(last).strftime("%Y-%m-%d")
+
+
+_stores: Dict[Path, EnergyStore] = {}
+_storesLock = threading.Lock()
+
+
+def open_store(csv_path: Union[str, Path] = DATASET_PATH) -> EnergyStore:
+    """Return the store for the CSV, (re)building it if the CSV changed."""
+    store_dir = _store_dir(csv_path)
+    with _storesLock:
+        version = _source_version(csv_path)
+        store = _stores.get(store_dir)
+        if store is not None and store.meta["source"] == version:
+            return store
+
+        stale = True
+        meta_path = store_dir / "meta.json"
+        if meta_path.exists():
+            with open(meta_path) as f:
+                stale = json.load(f)["source"] != version
+        if stale:
+            ingest(csv_path)
+        store = _stores[store_dir] = EnergyStore(store_dir)
+        return store
+
+
+if __name__ == "__main__":
+    ingest()
@@ -0,0 +1,112 @@
+# Base packages
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Tuple, Union
+
+# Own packages
+import config as cfg
+import metrics
+
+# LRU cache for (explanation_text, plot_html) results of the forecast modules.
+#
+# Between data refreshes the answer for a given horizon never changes, so the
+# result is keyed by module, horizon and a fingerprint of every file it was
+# computed from (model pickle, preprocessed data, CSVs). The fingerprint uses
+# size and modification time, or the content hash when
+# cfg.forecast_cache_hash_files is set, so a new file invalidates the entries
+# built from the old one. Entries are evicted least recently used first once
+# the cached strings exceed cfg.forecast_cache_max_mb.
+
+FileFingerprint = Tuple[str, int, str]
+
+_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def _content_hash(path: str, stat: os.stat_result) -> str:
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(2**20), b""):
+                digest.update(chunk)
+        _hashes[key] = digest.hexdigest()
+    return _hashes[key]
+
+
+def fingerprint(files: Iterable[Union[str, Path]]) -> Tuple[FileFingerprint, ...]:
+    result = []
+    for path in files:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        if cfg.forecast_cache_hash_files:
+            version = _content_hash(path, stat)
+        else:
+            version = f"{stat.st_mtime_ns}"
+        result.append((path, stat.st_size, version))
+    return tuple(result)
+
+
+def _size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (tuple, list)):
+        return sum(_size(item) for item in value)
+    return 0
+
+
+class ForecastCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.__entries: "OrderedDict[Any, Tuple[int, Any]]" = OrderedDict()
+        self.__bytes = 0
+        self.__lock = threading.Lock()
+
+    def get_or_compute(
+        self,
+        module: str,
+        request: Any,
+        files: Iterable[Union[str, Path]],
+        compute: Callable[[], Any],
+    ) -> Any:
+        """Return the cached result of a module for a request (e.g. the
+        horizon) computed from the given files, or compute and cache it."""
+        key = (module, request, fingerprint(files))
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+                metrics.increment(f"forecast_cache.{module}.hits")
+                return entry[1]
+
+        metrics.increment(f"forecast_cache.{module}.misses")
+        value = compute()
+        size = _size(value)
+        if size > self.max_bytes:
+            return value
+
+        with self.__lock:
+            if key in self.__entries:
+                self.__bytes -= self.__entries.pop(key)[0]
+            self.__entries[key] = (size, value)
+            self.__bytes += size
+            while self.__bytes > self.max_bytes:
+                evictedKey, (evictedSize, _) = self.__entries.popitem(last=False)
+                self.__bytes -= evictedSize
+                metrics.increment(f"forecast_cache.{evictedKey[0]}.evictions")
+            logging.info(
+                f"Cached {module} forecast for {request}, "
+                f"{len(self.__entries)} entries, {self.__bytes} bytes")
+        return value
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+            self.__bytes = 0
+
+
+# Shared by the energy and steel modules
+forecast_cache = ForecastCache(max_bytes=int(cfg.forecast_cache_max_mb * 2**20))
@@ -0,0 +1,244 @@
+# Base packages
+import hashlib
+import json
+import logging
+import math
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# 3rd party packages
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import BaseEstimator, clone
+from sklearn.model_selection import ParameterSampler, TimeSeriesSplit
+
+# Successive-halving hyperparameter search with checkpoints.
+#
+# Candidates are sampled like RandomizedSearchCV does. The first rung
+# evaluates all of them with a small sample budget (the most recent
+# min_resources rows of each training fold); every following rung keeps the
+# best 1/factor of the candidates and multiplies the budget by factor, until
+# the budget covers the full folds. Most candidates are therefore only fitted
+# on small samples.
+#
+# The training matrix is written once to the cache directory and memory-mapped,
+# so every fold of every candidate is a view of the same file, shared with the
+# worker processes instead of being copied to each of them. Folds of a
+# TimeSeriesSplit are contiguous, so the fold matrices are plain slices.
+#
+# Each evaluated (rung, candidate, fold) is appended to a JSONL checkpoint as
+# soon as it finishes, with its score and wall time. The checkpoint is named
+# after the data and the search settings; rerunning an interrupted search
+# skips everything already in it.
+
+
+def _digest(*parts: Any) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, range):
+        return list(value)
+    return value
+
+
+class FoldCache:
+    """Training matrix memory-mapped from disk, with the fold slices."""
+
+    def __init__(self, X, y, cv: TimeSeriesSplit, directory: Union[str, Path]):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.key = _digest(X.shape, X, y)
+        directory = Path(directory) / self.key
+        if not (directory / "y.npy").exists():
+            directory.mkdir(parents=True, exist_ok=True)
+            np.save(directory / "X.npy", X)
+            # Written last, marks the cache as complete
+            np.save(directory / "y.npy", y)
+        self.X = np.load(directory / "X.npy", mmap_mode="r")
+        self.y = np.load(directory / "y.npy", mmap_mode="r")
+        self.folds: List[Tuple[slice, slice]] = [
+            (slice(int(train[0]), int(train[-1]) + 1), slice(int(test[0]), int(test[-1]) + 1))
+            for train, test in cv.split(self.X)
+        ]
+
+
+def _evaluate(estimator: BaseEstimator, params: dict, X, y, train: slice, test: slice, resources: int):
+    # The budget is the most recent rows of the training fold
+    train = slice(max(train.start, train.stop - resources), train.stop)
+    model = clone(estimator).set_params(**params)
+    start = time.perf_counter()
+    model.fit(X[train], y[train])
+    fitTime = time.perf_counter() - start
+    start = time.perf_counter()
+    score = model.score(X[test], y[test])
+    return score, fitTime, time.perf_counter() - start
+
+
+class SuccessiveHalvingSearch:
+    def __init__(
+        self,
+        estimator: BaseEstimator,
+        param_distributions: Dict[str, Iterable],
+        n_candidates: int = 27,
+        min_resources: int = 1000,
+        factor: int = 3,
+        cv: Optional[TimeSeriesSplit] = None,
+        checkpoint_dir: Union[str, Path] = "./models/search",
+        n_jobs: int = -1,
+        random_state: int = 42,
+    ):
+        self.estimator = estimator
+        self.param_distributions = param_distributions
+        self.n_candidates = n_candidates
+        self.min_resources = min_resources
+        self.factor = factor
+        self.cv = cv or TimeSeriesSplit(n_splits=2)
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def _candidates(self) -> List[dict]:
+        return [
+            {key: _jsonable(value) for key, value in params.items()}
+            for params in ParameterSampler(
+                self.param_distributions, self.n_candidates, random_state=self.random_state
+            )
+        ]
+
+    def _rungs(self, n_samples: int) -> List[Tuple[int, int]]:
+        """(number of candidates, resources) of each rung."""
+        rungs = []
+        candidates, resources = self.n_candidates, self.min_resources
+        while True:
+            rungs.append((candidates, min(resources, n_samples)))
+            if candidates <= 1 or resources >= n_samples:
+                return rungs
+            candidates = math.ceil(candidates / self.factor)
+            resources *= self.factor
+
+    def _load_checkpoint(self) -> Dict[Tuple[int, int, int], dict]:
+        done = {}
+        if self.checkpoint_path.exists():
+            with open(self.checkpoint_path) as f:
+                for line in f:
+                    try:
+                        result = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Line cut short by an interruption
+                        continue
+                    done[(result["rung"], result["candidate"], result["fold"])] = result
+        return done
+
+    def fit(self, X, y) -> "SuccessiveHalvingSearch":
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        folds = FoldCache(X, y, self.cv, self.checkpoint_dir / "folds")
+        candidates = self._candidates()
+        searchKey = _digest(
+            folds.key, self.estimator, candidates, self.min_resources, self.factor, self.cv
+        )
+        self.checkpoint_path = self.checkpoint_dir / f"search_{searchKey}.jsonl"
+        done = self._load_checkpoint()
+        if done:
+            logging.info(f"Resuming search with {len(done)} evaluations from {self.checkpoint_path}")
+
+        start = time.perf_counter()
+        self.results_: List[dict] = []
+        alive = list(range(len(candidates)))
+        maxResources = max(train.stop - train.start for train, _ in folds.folds)
+        for rung, (n_candidates, resources) in enumerate(self._rungs(maxResources)):
+            alive = alive[:n_candidates]
+            scores = self._run_rung(rung, resources, alive, candidates, folds, done)
+            # Best candidates first, ties keep the sampling order
+            alive = sorted(alive, key=lambda candidate: -scores[candidate])
+            for candidate in alive:
+                self.results_.append(self._summary(rung, resources, candidate, candidates, scores, done))
+            logging.info(
+                f"Rung {rung}: {len(alive)} candidates on {resources} samples, "
+                f"best score {scores[alive[0]]:.4f}"
+            )
+
+        self.best_index_ = alive[0]
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = scores[self.best_index_]
+        self.search_time_ = time.perf_counter() - start
+
+        # Refit on the whole training matrix, like RandomizedSearchCV(refit=True)
+        start = time.perf_counter()
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+        self.best_estimator_.fit(folds.X, folds.y)
+        self.refit_time_ = time.perf_counter() - start
+        return self
+
+    def _run_rung(self, rung, resources, alive, candidates, folds: FoldCache, done) -> Dict[int, float]:
+        todo = [
+            (candidate, fold)
+            for candidate in alive
+            for fold in range(len(folds.folds))
+            if (rung, candidate, fold) not in done
+        ]
+        jobs = (
+            delayed(_evaluate)(
+                self.estimator, candidates[candidate], folds.X, folds.y,
+                *folds.folds[fold], resources,
+            )
+            for candidate, fold in todo
+        )
+        results = Parallel(n_jobs=self.n_jobs, return_as="generator")(jobs)
+        with open(self.checkpoint_path, "a") as checkpoint:
+            for (candidate, fold), (score, fitTime, scoreTime) in zip(todo, results):
+                result = {
+                    "rung": rung,
+                    "candidate": candidate,
+                    "fold": fold,
+                    "resources": resources,
+                    "params": candidates[candidate],
+                    "score": score,
+                    "fit_time": fitTime,
+                    "score_time": scoreTime,
+                }
+                done[(rung, candidate, fold)] = result
+                checkpoint.write(json.dumps(result) + "\n")
+                checkpoint.flush()
+
+        return {
+            candidate: float(np.mean([
+                done[(rung, candidate, fold)]["score"] for fold in range(len(folds.folds))
+            ]))
+            for candidate in alive
+        }
+
+    def _summary(self, rung, resources, candidate, candidates, scores, done) -> dict:
+        evaluations = [result for key, result in done.items() if key[:2] == (rung, candidate)]
+        return {
+            "rung": rung,
+            "resources": resources,
+            "candidate": candidate,
+            "params": candidates[candidate],
+            "mean_score": scores[candidate],
+            # Wall time of the candidate summed over its folds
+            "wall_time": sum(result["fit_time"] + result["score_time"] for result in evaluations),
+        }
+
+    def report(self) -> str:
+        """Score and wall time of every evaluated candidate, per rung."""
+        lines = [f"{'rung':>4} {'samples':>8} {'cand':>4} {'score':>8} {'wall time':>10}  params"]
+        for result in self.results_:
+            lines.append(
+                f"{result['rung']:4d} {result['resources']:8d} {result['candidate']:4d} "
+                f"{result['mean_score']:8.4f} {result['wall_time']:9.2f}s  {result['params']}"
+            )
+        lines.append(
+            f"Search {self.search_time_:.1f}s, refit {self.refit_time_:.1f}s, "
+            f"best {self.best_params_} ({self.best_score_:.4f})"
+        )
+        return "\n".join(lines)
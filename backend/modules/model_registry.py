@@ -0,0 +1,122 @@
+# Base packages
+import logging
+import os
+import resource
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+# 3rd party packages
+from llama_cpp import Llama
+
+# Process-wide registry of loaded GGUF models.
+#
+# Entries are keyed by (model path, n_ctx, n_gpu_layers). A request for a
+# smaller context than an already loaded instance of the same weights is served
+# by that instance, so modules with different context needs share one copy of
+# the weights and one KV cache. Models are loaded with use_mmap, so even
+# distinct instances of the same file share the page cache.
+#
+# A Llama instance evaluates one prompt at a time, so concurrent executions
+# take turns on it through its lock: chat_completion holds the lock for a
+# completion, and for a stream until it is consumed or closed.
+
+ModelKey = Tuple[str, int, int]
+
+_models: Dict[ModelKey, Llama] = {}
+_registryLock = threading.RLock()
+_modelLocks: Dict[int, threading.RLock] = {}
+
+
+def _find_compatible(modelPath: str, n_ctx: int, n_gpu_layers: int) -> Optional[Llama]:
+    candidates = [
+        (key[1], model) for key, model in _models.items()
+        if key[0] == modelPath and key[2] == n_gpu_layers and key[1] >= n_ctx
+    ]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda candidate: candidate[0])[1]
+
+
+def get_model(modelPath: str, n_ctx: int, n_gpu_layers: int = 128) -> Llama:
+    """Return the shared Llama instance for the given weights and context size,
+    loading it on first use."""
+    with _registryLock:
+        model = _find_compatible(modelPath, n_ctx, n_gpu_layers)
+        if model is not None:
+            return model
+
+        logging.info(
+            f"Loading model {modelPath} (n_ctx={n_ctx}, n_gpu_layers={n_gpu_layers})")
+        model = Llama(
+            model_path=modelPath,
+            n_gpu_layers=n_gpu_layers,
+            n_ctx=n_ctx,
+            use_mmap=True,
+        )
+        _models[(modelPath, n_ctx, n_gpu_layers)] = model
+        logging.info(f"Model loaded. {memory_report()}")
+        return model
+
+
+def model_lock(model: Llama) -> threading.RLock:
+    """Lock to hold while evaluating with the model."""
+    with _registryLock:
+        lock = _modelLocks.get(id(model))
+        if lock is None:
+            lock = _modelLocks[id(model)] = threading.RLock()
+        return lock
+
+
+def _locked_stream(model: Llama, messages, before, kwargs) -> Iterator[Dict[str, Any]]:
+    with model_lock(model):
+        if before is not None:
+            before()
+        yield from model.create_chat_completion(messages, **kwargs)
+
+
+def chat_completion(model: Llama, messages, before: Optional[Callable[[], None]] = None, **kwargs):
+    """model.create_chat_completion, holding the model's lock. before runs
+    first with the lock held, e.g. to restore a cached prompt state."""
+    if kwargs.get("stream"):
+        return _locked_stream(model, messages, before, kwargs)
+    with model_lock(model):
+        if before is not None:
+            before()
+        return model.create_chat_completion(messages, **kwargs)
+
+
+def warm_up(models: Iterable[Tuple[str, int]], n_gpu_layers: int = 128) -> None:
+    """Load every (model path, n_ctx) pair ahead of the first request.
+
+    The largest context per model is loaded first so smaller requests for the
+    same weights resolve to it instead of loading a second copy."""
+    for modelPath, n_ctx in sorted(models, key=lambda model: -model[1]):
+        get_model(modelPath, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers)
+    logging.info(f"Models warmed up. {memory_report()}")
+
+
+def loaded_models() -> Dict[ModelKey, Llama]:
+    with _registryLock:
+        return dict(_models)
+
+
+def _resident_memory_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is the peak resident size, in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def memory_report() -> Dict[str, float]:
+    """Resident memory of the process and on-disk size of the loaded weights."""
+    with _registryLock:
+        weightFiles = {key[0] for key in _models}
+        instances = len(_models)
+    weights = sum(os.path.getsize(path) for path in weightFiles if os.path.exists(path))
+    return {
+        "instances": instances,
+        "weights_mb": round(weights / 2**20, 1),
+        "resident_mb": round(_resident_memory_bytes() / 2**20, 1),
+    }
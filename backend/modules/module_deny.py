@@ -4,12 +4,12 @@ import json
 
 # Custom packages
 from .module_base import ModuleBase
+from . import model_registry, prompt_cache
 from model_handler.model_handler import ModelHandler
 import config as cfg
 import logging
 
 # 3rd party packages
-from llama_cpp import Llama
 from langchain.prompts import PromptTemplate
 
 DENY_IRRELEVANT_PROMPT = """<s>[INST]
@@ -108,10 +108,16 @@ class DenyModule(ModuleBase):
         self.n_batch = 512
         self.modelName = modelName
         self.stream = True
-        self.__model = Llama(model_path=cfg.models[modelName], n_gpu_layers=128, n_ctx=self.maxOutputTokens)
+        self.__model = model_registry.get_model(
+            cfg.models[modelName], n_ctx=self.maxOutputTokens, n_gpu_layers=128)
+        self.__promptCache = prompt_cache.for_model(self.__model)
 
         logging.info(f"Initialized deny response model {modelName}")
     
+    def prime(self) -> None:
+        for reason, template in TEMPLATES.items():
+            self.__promptCache.prime(f"deny.{reason}", template)
+
     def execute(
         self,
         handler: ModelHandler, 
@@ -119,6 +125,7 @@ class DenyModule(ModuleBase):
 
         logging.info(f"Executing deny response function for reason {reason}")
         self.__modelHandler = handler
+        self.__promptCache.prime(f"deny.{reason}", TEMPLATES[reason])
         messages = handler.messages()
         tempMessages = copy.deepcopy(messages)
 
@@ -129,8 +136,10 @@ class DenyModule(ModuleBase):
         tempMessages[-1]["content"] = prompt
 
         # Generate deny
-        responseStream = self.__model.create_chat_completion(
+        responseStream = model_registry.chat_completion(
+            self.__model,
             tempMessages,
+            before=lambda: self.__promptCache.restore(f"deny.{reason}", tempMessages),
             max_tokens=1024,
             stream=self.stream,
             temperature=self.temperature,
@@ -1,66 +1,110 @@
-import pickle
-from pathlib import Path
+import logging
+from typing import List
 
 import numpy as np
-import pandas as pd
-from sklearn.base import BaseEstimator
 
+from . import artifact_registry, energy_features, energy_store
+from .energy_store import DATASET_PATH
+from .forecast_cache import forecast_cache
 from .module_base import ModuleBase
-from .train_energy_model import get_data_explanation, train
+from .train_energy_direct import ORIGIN_LAGS, origin_rows
+from .train_energy_model import get_data_explanation
 
 
 class EnergyModule(ModuleBase):
-    def _load_model(self, horizon: int) -> BaseEstimator:
-        model_candidates = list(Path(f"models/energy").glob(f"energy_*_{horizon}.pkl"))
-        # TODO: load the model with the latest timestamp, for now there is only one model
-        if model_candidates:
-            model_candidate = model_candidates[0]
-            with open(model_candidate, "rb") as f:
-                model = pickle.load(f)
-        else:
-            print(
-                f"Energy model with horizon {horizon} does not exist. Training new model."
-            )
-            train(horizon)
-            model, model_candidate = self._load_model(horizon)
+    def _load_model(self):
+        """Latest trained model and its registry metadata. Raises
+        ArtifactNotAvailable until the training worker published one."""
+        return artifact_registry.load("energy", data_files=[DATASET_PATH])
 
-        return model, model_candidate
+    def preload(self) -> None:
+        """Load the dataset, its features and the trained model."""
+        if DATASET_PATH.exists():
+            energy_features.open_features()
+        try:
+            self._load_model()
+        except artifact_registry.ArtifactNotAvailable as e:
+            logging.warning(e)
 
     def execute(self, horizon: int):
-        model, model_filename = self._load_model(horizon)
-        self._data = np.load(f"data/energy/data_preprocessed_horizon_{horizon}.npy")
+        model, metadata = self._load_model()
+        max_horizon = metadata["horizons"][-1]
+        requested = horizon
+        if horizon > max_horizon:
+            logging.info(f"Energy horizon {horizon} exceeds the model's {max_horizon} days")
+            horizon = max_horizon
+        # Appends the rows added to the dataset since the last request
+        features = energy_features.open_features()
+        files = [artifact_registry.path(metadata), *energy_features.files(), DATASET_PATH]
+        text, plot = forecast_cache.get_or_compute(
+            "energy",
+            horizon,
+            files,
+            lambda: self._predict(horizon, model, metadata, features),
+        )
+        if requested > horizon:
+            # The explanation must not claim the requested horizon
+            text = (
+                f"The energy price model forecasts at most {horizon} days ahead, "
+                f"so this forecast covers the next {horizon} days instead of the "
+                f"requested {requested}.\n" + text
+            )
+        return text, plot
+
+    def forecast(self, horizons: List[int]) -> dict:
+        """Predicted daily prices for several horizons from one predict up to
+        the longest of them. Maps each horizon to its ForecastResult, horizons
+        beyond the model's longest are clamped to it."""
+        model, metadata = self._load_model()
+        max_horizon = metadata["horizons"][-1]
+        features = energy_features.open_features()
+        origin = features.derive(0, ORIGIN_LAGS, rows=1)[0]
+        # The inputs for days 1..h are the first h rows of the longest horizon
+        longest = min(max(horizons), max_horizon)
+        predictions = model.predict(origin_rows(origin, longest))
+        last_date = energy_store.open_store().last_date()
+        dates = (np.datetime64(last_date) + np.arange(1, longest + 1)).astype(str)
+        results = {}
+        for horizon in set(horizons):
+            days = min(horizon, max_horizon)
+            if days < horizon:
+                logging.info(f"Energy horizon {horizon} exceeds the model's {max_horizon} days")
+            results[horizon] = {
+                "series": "energy",
+                "horizon": horizon,
+                "status": "ok",
+                "effective_horizon": days,
+                "clamped": days < horizon,
+                "dates": dates[:days].tolist(),
+                "values": predictions[:days].tolist(),
+                "last_date": last_date,
+                "version": metadata["version"],
+            }
+        return results
 
-        features = self._data[-horizon:, :]
-        predictions = model.predict(features)
+    def _predict(self, horizon: int, model, metadata: dict, features):
+        # The forecast starts from the latest hour of the dataset
+        origin = features.derive(0, ORIGIN_LAGS, rows=1)[0]
+        predictions = model.predict(origin_rows(origin, horizon))
 
         str_for_explanation = self._generate_str_for_explanation(
-            horizon, model, predictions, model_filename
+            horizon, model, metadata, predictions
         )
 
         return str_for_explanation
 
-    def _last_date(self, model_filename: Path) -> str:
-        return model_filename.stem.split("_")[1]
-
-    def _generate_str_for_explanation(
-        self, horizon, model, predictions, model_filename
-    ):
-        with open(f"models/energy/feature_names_horizon={horizon}.pkl", "rb") as f:
-            feature_names = pickle.load(f)
-
-        data = pd.read_csv(
-            Path(__file__).parent.parent.parent / "data/energy/dataset.csv",
-            parse_dates=["time"],
-            index_col="time",
-        )
+    def _generate_str_for_explanation(self, horizon, model, metadata, predictions):
+        store = energy_store.open_store()
         # for now getting midnight values
-        latest_horizon_target_values = data.iloc[-horizon * 24 :: 24]["price actual"]
+        latest_horizon_target_values = store.series(
+            "price actual", start=-horizon * 24, step=24
+        )
 
         return get_data_explanation(
             model,
             predictions,
-            feature_names,
+            np.array(metadata["feature_names"]),
             horizon,
-            last_date=self._last_date(model_filename),
+            last_date=store.last_date(),
             latest_horizon_target_values=latest_horizon_target_values,
         )
@@ -4,13 +4,13 @@ import logging
 
 # Custom packages
 from .module_base import ModuleBase
+from . import model_registry
 from model_handler.model_handler import ModelHandler
 from custom_types.orchestration_types import ExecutionReturn, ModuleResults
 from prompts.explainer_prompt import EXPLAINER_PROMPT
 import config as cfg
 
 # 3rd party packages
-from llama_cpp import Llama
 from langchain.prompts import PromptTemplate
 
 INTRO_PROMPT = """<s>[INST]
@@ -37,8 +37,8 @@ class ExplainerModule(ModuleBase):
         self.modelName = modelName
         self.stream = True
         self.__maxRetries = 3
-        self.__model = Llama(
-            model_path=cfg.models[modelName], n_gpu_layers=128, n_ctx=self.context)
+        self.__model = model_registry.get_model(
+            cfg.models[modelName], n_ctx=self.context, n_gpu_layers=128)
 
         logging.info(f"Initialized time model {modelName}")
 
@@ -66,7 +66,8 @@ class ExplainerModule(ModuleBase):
         logging.info(f"Prompting summary model with: {summaryPrompt}")
         tempMessages[-1]["content"] = summaryPrompt
 
-        responseStream = self.__model.create_chat_completion(
+        responseStream = model_registry.chat_completion(
+            self.__model,
             tempMessages,
             max_tokens=self.maxOutputTokens,
             stream=self.stream,
@@ -87,17 +88,17 @@ class ExplainerModule(ModuleBase):
         logging.info(f"Summary response generated: {result}")
 
         # Send plots if steel model results are available
-        if len(moduleResults["steel"]["text"]) > 0:
+        if moduleResults["steel"].get("plot"):
             token = handler.send_asset(
-                "html",
+                cfg.plot_asset_type,
                 moduleResults["steel"]["plot"]
             )
             handler.send_text(token)
 
         # Send plots if energy model results are available
-        if len(moduleResults["energy"]["text"]) > 0:
+        if moduleResults["energy"].get("plot"):
             token = handler.send_asset(
-                "html",
+                cfg.plot_asset_type,
                 moduleResults["energy"]["plot"]
             )
             handler.send_text(token)
@@ -1,18 +1,21 @@
 # Base packages
 import logging
 import copy
-from typing import Any, List, Optional, Dict, Union
+from typing import Any, List, Optional, Dict, Union, get_args
 from typing_extensions import TypedDict, NotRequired, Literal
 import json
 
 # Own packages
 from model_handler.model_handler import ModelHandler
 from .module_base import ModuleBase
+from . import model_registry, prompt_cache
 import config as cfg
-from custom_types.orchestration_types import ExecutionReturn, OrchestrationPlan
+import metrics
+from custom_types.json_grammar import grammar_from_typed_dict
+from custom_types.orchestration_types import ExecutionReturn, OrchestrationPlan, FilterDecision, ModelSelection, CombinedPlan, SteelCountry
 
 # 3rd party packages
-from llama_cpp import Llama
+from llama_cpp import LlamaGrammar
 from langchain.prompts import PromptTemplate
 
 DENY_PROMPT = """<s>[INST]
@@ -88,13 +91,16 @@ STEEL PRICE FORECAST MODEL: Predicts steel alloy prices
 up to 12 months into the future.
 
 List ALL models applicable to the problem at hand. The Output
-should include a list of relevant models. Additionally, you must 
+should include a list of relevant models and a list of the countries
+the steel price is asked for, out of Germany, Greece, Italy, Netherlands
+and Sweden, empty if the request names none. Additionally, you must 
 argue in one sentence WHY YOU THINK THE MODELS YOU SELECTED ARE RELEVANT. [\INST]
 Here are some examples:
 
-Input: I want to know the price of purchasing steel in 6 weeks' time. Can you help me?
+Input: I want to know the price of purchasing steel in Italy in 6 weeks' time. Can you help me?
 Output: {{
     "models" : ["STEEL PRICE FORECAST MODEL"],
+    "countries" : ["Italy"],
     "reasoning": "Steel price directly impacts the purchase price."
 }}
 </s>
@@ -103,6 +109,7 @@ Output: {{
 Input: Do you know how much energy it takes to produce steel?
 Output: {{
     "models" : [],
+    "countries" : [],
     "reasoning": "The amount of energy required cannot be predicted by a price forecast model."
 }}
 </s>
@@ -111,6 +118,7 @@ Output: {{
 Input: I want to know the energy costs for manufacturing steel in 6 weeks' time. Can you help me?
 Output: {{
     "models" : ["ENERGY PRICE FORECAST MODEL"],
+    "countries" : [],
     "reasoning": "The energy price forecasting model directly predicts future energy costs."
 }}
 </s>
@@ -119,6 +127,7 @@ Output: {{
 Input: I want to forecast the profit margin for producing steel for the next 2 months. Can you help me come up with an estimate?
 Output: {{
     "models" : ["ENERGY PRICE FORECAST MODEL", "STEEL PRICE FORECAST MODEL"],
+    "countries" : [],
     "reasoning": "To calculate the profit, you need both a steel price forecast (revenue) and an energy price forecast (cost)."
 }}
 </s>
@@ -127,6 +136,7 @@ Output: {{
 Input: I want to know the latest news about the steel industry. Can you summarize them for me please?
 Output: {{
     "models" : [],
+    "countries" : [],
     "reasoning": "The forecasting models cannot be used to predict the news, only prices."
 }}
 </s>
@@ -134,11 +144,108 @@ Output: {{
 Input: {userPrompt}
 Output: """
 
+COMBINED_PROMPT = """<s>[INST]
+You are an assistant planning how to answer requests about the steel industry
+and energy prices. Generate a valid JSON string with the keys:
+"reasoning": one or two sentences justifying the other keys, written first.
+"decision": PASS if the request is related to the steel industry or energy
+prices in any way, DECLINE if it is unrelated or too generic.
+"models": ALL forecast models applicable to the request, out of
+ENERGY PRICE FORECAST MODEL (energy prices up to 12 months into the future) and
+STEEL PRICE FORECAST MODEL (steel alloy prices up to 12 months into the future).
+"countries": the countries the steel price is asked for, out of Germany, Greece,
+Italy, Netherlands and Sweden, or [] if the request names none.
+"days": how many days into the future the request looks, assuming 7 days a week
+and 30 days a month, rounded up, or null if the request has no time reference.
+[\INST]
+
+Here are some examples:
+
+Input: Can you generate some images of cats?
+Output: {{
+    "reasoning": "Generating images of cats is not related to the steel industry or energy prices.",
+    "decision": "DECLINE",
+    "models": [],
+    "countries": [],
+    "days": null
+}}
+</s>
+
+<s>
+Input: I want to know the price of purchasing steel in 6 weeks' time. Can you help me?
+Output: {{
+    "reasoning": "Steel price directly impacts the purchase price. 6 weeks x 7 days = 42 days.",
+    "decision": "PASS",
+    "models": ["STEEL PRICE FORECAST MODEL"],
+    "countries": [],
+    "days": 42
+}}
+</s>
+
+<s>
+Input: I want to forecast the profit margin for producing steel in Sweden and the Netherlands for the next 2 months. Can you help me come up with an estimate?
+Output: {{
+    "reasoning": "The profit needs a steel price forecast (revenue) for both countries and an energy price forecast (cost). 2 months x 30 days = 60 days.",
+    "decision": "PASS",
+    "models": ["ENERGY PRICE FORECAST MODEL", "STEEL PRICE FORECAST MODEL"],
+    "countries": ["Sweden", "Netherlands"],
+    "days": 60
+}}
+</s>
+
+<s>
+Input: I came to work early at 7am and now I need an energy price forecast for the next half week.
+Output: {{
+    "reasoning": "The energy price forecasting model predicts energy costs. Half a week is 0.5 x 7 days = 3.5 days, rounded up to 4 days.",
+    "decision": "PASS",
+    "models": ["ENERGY PRICE FORECAST MODEL"],
+    "countries": [],
+    "days": 4
+}}
+</s>
+
+<s>
+Input: I want to know the latest news about the steel industry. Can you summarize them for me please?
+Output: {{
+    "reasoning": "The request is related to the steel industry, but the forecasting models cannot predict the news, only prices.",
+    "decision": "PASS",
+    "models": [],
+    "countries": [],
+    "days": null
+}}
+</s>
+
+<s>
+Input: What is the price of steel, is it cheap or is it expensive?
+Output: {{
+    "reasoning": "The steel price forecast model is relevant, but the request has no time reference.",
+    "decision": "PASS",
+    "models": ["STEEL PRICE FORECAST MODEL"],
+    "countries": [],
+    "days": null
+}}
+</s>
+
+Input: {userPrompt}
+Output: """
+
+FILTER_GRAMMAR = LlamaGrammar.from_string(
+    grammar_from_typed_dict(FilterDecision), verbose=False)
+MODEL_GRAMMAR = LlamaGrammar.from_string(
+    grammar_from_typed_dict(ModelSelection), verbose=False)
+COMBINED_GRAMMAR = LlamaGrammar.from_string(
+    grammar_from_typed_dict(CombinedPlan), verbose=False)
+
+VALID_MODELS = ["ENERGY PRICE FORECAST MODEL", "STEEL PRICE FORECAST MODEL"]
+VALID_COUNTRIES = list(get_args(SteelCountry))
+
 
 class PlannerModule(ModuleBase):
     def __init__(self,
-                 modelName: str = "mistral-7B-instruct"):
+                 modelName: str = "mistral-7B-instruct",
+                 mode: Literal["combined", "sequential"] = cfg.planner_mode):
         super().__init__()
+        self.mode = mode
         self.maxOutputTokens = 2048
         self.temperature = 0.2
         self.top_p = 50
@@ -147,14 +254,118 @@ class PlannerModule(ModuleBase):
         self.modelName = modelName
         self.stream = False
         self.__maxRetries = 3
-        self.__model = Llama(
-            model_path=cfg.models[modelName], n_gpu_layers=128, n_ctx=self.maxOutputTokens)
+        self.__model = model_registry.get_model(
+            cfg.models[modelName], n_ctx=self.maxOutputTokens, n_gpu_layers=128)
+        self.__promptCache = prompt_cache.for_model(self.__model)
 
         logging.info(f"Initialized planner model {modelName}")
 
+    def prime(self) -> None:
+        if self.mode == "combined":
+            self.__promptCache.prime("planner.combined", COMBINED_PROMPT)
+        self.__promptCache.prime("planner.deny", DENY_PROMPT)
+        self.__promptCache.prime("planner.model", MODEL_PROMPT)
+
     def execute(self, handler: ModelHandler) -> ExecutionReturn:
+        if self.mode == "combined":
+            try:
+                return self.execute_combined(handler)
+            except RuntimeError as e:
+                metrics.increment("planner.combined.fallbacks")
+                logging.warning(
+                    f"Combined planner failed, falling back to sequential planning: {e}")
+        return self.execute_sequential(handler)
+
+    def execute_combined(self, handler: ModelHandler) -> ExecutionReturn:
+        """Decide relevance, models and horizon in a single generation.
+
+        The returned plan carries "days" when the goal is "explain", so the
+        time module does not need to run."""
+        logging.info("Executing combined planner function")
+        self.__modelHandler = handler
+        self.__promptCache.prime("planner.combined", COMBINED_PROMPT)
+        messages = handler.messages()
+        tempMessages = copy.deepcopy(messages)
+
+        combinedPrompt = PromptTemplate(
+            template=COMBINED_PROMPT, input_variables=["userPrompt"])
+        combinedPrompt = combinedPrompt.format(userPrompt=messages[-1]["content"])
+        logging.info(f"Prompting model with: {combinedPrompt}")
+        tempMessages[-1]["content"] = combinedPrompt
+
+        plan = None
+        for i in range(self.__maxRetries):
+            metrics.increment("planner.combined.attempts")
+            if i > 0:
+                metrics.increment("planner.combined.retries")
+            planResponse = model_registry.chat_completion(
+                self.__model,
+                tempMessages,
+                before=lambda: self.__promptCache.restore("planner.combined", tempMessages),
+                max_tokens=256,
+                stream=self.stream,
+                temperature=self.temperature,
+                grammar=COMBINED_GRAMMAR,
+            )
+            responseText = planResponse['choices'][0]['message']['content']
+            logging.info(f"Combined plan response {i} generated: {responseText}")
+
+            try:
+                plan = json.loads(responseText)
+                if plan["decision"] in ["DECLINE", "PASS"] \
+                        and all(model in VALID_MODELS for model in plan["models"]) \
+                        and all(country in VALID_COUNTRIES for country in plan["countries"]) \
+                        and (plan["days"] is None or int(plan["days"]) >= 0):
+                    break
+            except (json.decoder.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+                logging.warn(f"Model generated invalid plan {responseText}: {e}")
+            metrics.increment("planner.combined.invalid")
+            plan = None
+
+        if plan is None:
+            raise RuntimeError("No usable response from LLM model")
+
+        handler.send_debug_thoughts(plan["reasoning"])
+        if plan["decision"] == "DECLINE":
+            return {
+                "orchestrationPlan": {
+                    "goal": "deny",
+                    "reasoning": "irrelevant"
+                },
+                "messages": messages,
+            }
+        if len(plan["models"]) == 0:
+            return {
+                "orchestrationPlan": {
+                    "goal": "deny",
+                    "reasoning": "no_model",
+                },
+                "messages": messages,
+            }
+        # No forecast has zero days, answer as for a missing horizon
+        if plan["days"] is None or int(plan["days"]) < 1:
+            return {
+                "orchestrationPlan": {
+                    "goal": "deny",
+                    "reasoning": "no_time",
+                },
+                "messages": messages,
+            }
+        return {
+            "orchestrationPlan": {
+                "goal": "explain",
+                "reasoning": plan["reasoning"],
+                "relevantModels": plan["models"],
+                "countries": plan["countries"] or ["Germany"],
+                "days": int(plan["days"]),
+            },
+            "messages": messages,
+        }
+
+    def execute_sequential(self, handler: ModelHandler) -> ExecutionReturn:
         logging.info("Executing planner function")
         self.__modelHandler = handler
+        self.prime()
         messages = handler.messages()
         tempMessages = copy.deepcopy(messages)
 
@@ -166,12 +377,19 @@ class PlannerModule(ModuleBase):
         tempMessages[-1]["content"] = denyPrompt
 
         # Task 1 - do we need to answer this message?
+        # The grammar makes invalid output unlikely; retries are tracked to confirm it
         for i in range(self.__maxRetries):
-            filterResponse = self.__model.create_chat_completion(
+            metrics.increment("planner.filter.attempts")
+            if i > 0:
+                metrics.increment("planner.filter.retries")
+            filterResponse = model_registry.chat_completion(
+                self.__model,
                 tempMessages,
+                before=lambda: self.__promptCache.restore("planner.deny", tempMessages),
                 max_tokens=128,
                 stream=self.stream,
                 temperature=self.temperature,
+                grammar=FILTER_GRAMMAR,
             )
             responseText = filterResponse['choices'][0]['message']['content']
             logging.info(f"Deny/accept response {i} generated: {responseText}")
@@ -179,6 +397,7 @@ class PlannerModule(ModuleBase):
             try:
                 denyResponse = json.loads(responseText)
             except json.decoder.JSONDecodeError:
+                metrics.increment("planner.filter.invalid")
                 logging.warn(f"Model generated invalid JSON: {responseText}")
                 continue
 
@@ -192,6 +411,7 @@ class PlannerModule(ModuleBase):
             except Exception as e:
                 logging.info(
                     f"Exception encountered when validating JSON contents: {e}")
+            metrics.increment("planner.filter.invalid")
 
         # Return: Question not relevant
         handler.send_debug_thoughts(denyResponse["reasoning"])
@@ -217,11 +437,17 @@ class PlannerModule(ModuleBase):
         tempMessages[-1]["content"] = modelPrompt
 
         for i in range(self.__maxRetries):
-            filterResponse = self.__model.create_chat_completion(
+            metrics.increment("planner.model.attempts")
+            if i > 0:
+                metrics.increment("planner.model.retries")
+            filterResponse = model_registry.chat_completion(
+                self.__model,
                 tempMessages,
+                before=lambda: self.__promptCache.restore("planner.model", tempMessages),
                 max_tokens=1024,
                 stream=self.stream,
                 temperature=self.temperature,
+                grammar=MODEL_GRAMMAR,
             )
             responseText = filterResponse['choices'][0]['message']['content']
             logging.info(
@@ -230,20 +456,25 @@ class PlannerModule(ModuleBase):
             try:
                 modelResponse = json.loads(responseText)
             except json.decoder.JSONDecodeError:
+                metrics.increment("planner.model.invalid")
                 logging.warn(f"Model generated invalid JSON: {responseText}")
+                if i + 1 == self.__maxRetries:
+                    raise RuntimeError("No usable response from LLM model")
                 continue
 
             try:
                 # Stop generating when correct classification is achieved
                 VALID_MODELS = ["ENERGY PRICE FORECAST MODEL",
                                 "STEEL PRICE FORECAST MODEL"]
-                if all(word in VALID_MODELS for word in modelResponse["models"]):
+                if all(word in VALID_MODELS for word in modelResponse["models"]) \
+                        and all(country in VALID_COUNTRIES for country in modelResponse["countries"]):
                     logging.info(
                         f"Model recommendations valid. Recommendations: {json.dumps(modelResponse, indent=2)}")
                     break
             except Exception as e:
                 logging.info(
                     f"Exception encountered when validating JSON contents: {e}")
+            metrics.increment("planner.model.invalid")
 
             if i + 1 == self.__maxRetries:
                 raise RuntimeError("No usable response from LLM model")
@@ -255,7 +486,8 @@ class PlannerModule(ModuleBase):
                 "orchestrationPlan": {
                     "goal": "explain",
                     "reasoning": modelResponse["reasoning"],
-                    "relevantModels": modelResponse["models"]
+                    "relevantModels": modelResponse["models"],
+                    "countries": modelResponse["countries"] or ["Germany"],
                 },
                 "messages": messages,
             }
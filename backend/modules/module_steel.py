@@ -1,73 +1,162 @@
-import pickle
-from pathlib import Path
-import os
+from typing import List, get_args
+import logging
+import threading
 
 import numpy as np
 import pandas as pd
 from sklearn.base import BaseEstimator
+from custom_types.orchestration_types import SteelCountry
+from . import artifact_registry, steel_data
+from .forecast_cache import forecast_cache
 from .module_base import ModuleBase
-from .train_steel_model import train, formulate_explanation_string, create_lag_features_forecast, create_forecast_plot
+from .train_steel_model import train, formulate_explanation_string, create_lag_features_forecast, create_forecast_plot, generate_upcoming_months
+
+# Every country column of the steel dataset is forecast by its own models. The
+# forecast lag features of all columns are built from the merged data of
+# steel_data.py once per data version; the modules of all countries share
+# them. Rows with missing values are dropped per model, over the columns of
+# its own features only, so a gap in one country's index does not drop that
+# month for the others.
+
+COUNTRIES = list(get_args(SteelCountry))
+# Only Germany has an electricity index, it is the feature for every country
+FEATURE_COLS = ["Germany_electricity_index"]
+
+
+_frame = None
+_frameLock = threading.Lock()
+
+
+def load_frame():
+    """The last three years of the merged data of all countries and its
+    forecast lag features, shared by all modules and rebuilt when a data file
+    changes. Callers must not modify them."""
+    global _frame
+    version = steel_data.version()
+    with _frameLock:
+        if _frame is None or _frame[0] != version:
+            data = steel_data.merged().tail(36)
+            columns = [f"{country}_steel_index" for country in COUNTRIES] + FEATURE_COLS
+            _frame = (version, data, create_lag_features_forecast(data, columns, dropna=False))
+        return _frame[1], _frame[2]
+
+
+def train_countries(horizon: int, countries: List[str] = COUNTRIES) -> List[dict]:
+    """Train a model per country for the horizon on the shared frame and
+    publish them to the registry. Only called by the training worker."""
+    data, _ = load_frame()
+    trained_hash = artifact_registry.data_hash(steel_data.files())
+    entries = []
+    for country in countries:
+        model, metrics = train(data, f"{country}_steel_index", FEATURE_COLS, horizon=horizon)
+        entries.append(artifact_registry.publish(
+            "steel",
+            model,
+            data_hash=trained_hash,
+            last_date=data["time"].max(),
+            horizons=[horizon],
+            metrics=metrics,
+            feature_names=model.feature_names_in_,
+            series=country,
+        ))
+    return entries
+
+
+def forecast_features(lag_features: pd.DataFrame, model: BaseEstimator, horizon: int) -> pd.DataFrame:
+    """The last horizon rows of the shared lag features with every feature of
+    the model known."""
+    return lag_features[list(model.feature_names_in_)].dropna().tail(horizon)
 
 
 class SteelModule(ModuleBase):
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, country: str = "Germany"):
         super().__init__()
         self.model_name = model_name
-        self.target_column = "Germany_steel_index"
-        self.feature_cols = ["Germany_electricity_index"]
-
-    def _load_model(self, model_filename: str, horizon: int) -> BaseEstimator:
-        model_path = f"/models/steel/{model_filename}"
-        if Path(model_path).exists():
-            with open(Path(model_path), "rb") as f:
-                model = pickle.load(f)
-        else:
-            print(
-                f"Model {model_filename} does not exist. Training new model."
-            )
-            model = train(self.data, self.target_column, self.feature_cols, horizon=horizon)
-            with open(os.getcwd() + model_path, 'wb') as file:
-                pickle.dump(model, file)
-        return model
-    
-    def _load_data(self, ):
-
-        input_folder = os.getcwd() + "/data"
-        df = pd.read_csv(Path(f"{input_folder}/processed_steel_data.csv"))
-        df_electricity = pd.read_csv(Path(f"{input_folder}/processed_eletricity_price_index.csv"))
-
-        new_column_names = {col: f"{col}_steel_index" for col in df.columns if col != "time"}
-        df = df.rename(columns=new_column_names)
-
-
-        new_column_names = {col: f"{col}_electricity_index" for col in df_electricity.columns if col != "time"}
-        df_electricity = df_electricity.rename(columns=new_column_names)
-
-        df["time"] = df["time"].apply(lambda x: f"{x}-01")
-        df_electricity["time"] = df_electricity["time"].apply(lambda x: f"{x}-01")
-
-
-        df = pd.merge(df, df_electricity, on="time", how="left")
-        df = df.replace(':', method='ffill')
-
-        return df.tail(36), self.model_name
+        self.country = country
+        self.target_column = f"{country}_steel_index"
+        self.feature_cols = FEATURE_COLS
+
+    def _load_model(self, horizon: int):
+        """Latest trained model for the country and horizon and its registry
+        metadata. Raises ArtifactNotAvailable until the training worker
+        published one."""
+        return artifact_registry.load(
+            "steel", data_files=steel_data.files(), horizon=horizon, series=self.country
+        )
+
+    def train(self, horizon: int) -> dict:
+        """Train a model for the country and horizon and publish it to the
+        registry. Only called by the training worker."""
+        return train_countries(horizon, [self.country])[0]
+
+    def preload(self) -> None:
+        """Load the steel and electricity CSVs and build the shared frame."""
+        load_frame()
 
     def execute(self, horizon: int) -> str:
-        self.data, self.data_name = self._load_data()
+        # The data files and the model version fully determine the result
+        model, metadata = self._load_model(horizon)
+        return forecast_cache.get_or_compute(
+            "steel",
+            (self.model_name, self.target_column, horizon),
+            [*steel_data.files(), artifact_registry.path(metadata)],
+            lambda: self._predict(horizon, model),
+        )
+
+    def forecast(self, horizons: List[int]) -> dict:
+        """Predicted values for several horizons, one predict per model, from
+        a single load of the data. Maps each horizon to its ForecastResult,
+        horizons without a trained model are left out unless their training
+        failed."""
+        data, lag_features = load_frame()
+        last_date = data["time"].max()
+        results = {}
+        for horizon in sorted(set(horizons)):
+            try:
+                model, metadata = self._load_model(horizon)
+            except artifact_registry.TrainingFailed as e:
+                logging.warning(e)
+                results[horizon] = {
+                    "series": f"steel:{self.country}",
+                    "horizon": horizon,
+                    "status": "training_failed",
+                    "effective_horizon": None,
+                    "clamped": False,
+                    "dates": [],
+                    "values": [],
+                    "last_date": None,
+                    "version": None,
+                }
+                continue
+            except artifact_registry.ArtifactNotAvailable:
+                continue
+            predictions = model.predict(forecast_features(lag_features, model, horizon))
+            results[horizon] = {
+                "series": f"steel:{self.country}",
+                "horizon": horizon,
+                "status": "ok",
+                "effective_horizon": horizon,
+                "clamped": False,
+                "dates": generate_upcoming_months(last_date, horizon),
+                "values": predictions.tolist(),
+                "last_date": last_date,
+                "version": metadata["version"],
+            }
+        return results
+
+    def _predict(self, horizon: int, model: BaseEstimator):
+        self.data, lag_features = load_frame()
+        self.data_name = self.model_name
 
         last_date = self.data["time"].max()
-        model_filename = f"{self.data_name}-{last_date}-{horizon}.pkl"
-
-        model = self._load_model(model_filename, horizon)
 
             
-        forecast_features = create_lag_features_forecast(self.data, [self.target_column]+self.feature_cols).tail(horizon)
+        features = forecast_features(lag_features, model, horizon)
         
         last_label_data = self.data[["time", self.target_column]].tail(horizon)
-        model_result_text = formulate_explanation_string(model, forecast_features, last_date, horizon, last_label_data)        
+        model_result_text = formulate_explanation_string(model, features, last_date, horizon, last_label_data, self.target_column)        
 
-        plot_str = create_forecast_plot(self.data, model.predict(forecast_features))
-        print(plot_str)
+        plot_str = create_forecast_plot(self.data, model.predict(features), self.target_column)
 
         return model_result_text, plot_str
     
@@ -4,13 +4,16 @@ import json
 
 # Custom packages
 from .module_base import ModuleBase
+from . import model_registry, prompt_cache
 from model_handler.model_handler import ModelHandler
-from custom_types.orchestration_types import ExecutionReturn
+from custom_types.json_grammar import grammar_from_typed_dict
+from custom_types.orchestration_types import ExecutionReturn, TimeResponse
 import config as cfg
+import metrics
 import logging
 
 # 3rd party packages
-from llama_cpp import Llama
+from llama_cpp import LlamaGrammar
 from langchain.prompts import PromptTemplate
 
 TIME_PROMPT = """<s>[INST]
@@ -64,6 +67,9 @@ Input: {userPrompt}
 Output: 
 """
 
+TIME_GRAMMAR = LlamaGrammar.from_string(
+    grammar_from_typed_dict(TimeResponse), verbose=False)
+
 
 class TimeModule(ModuleBase):
     def __init__(self,
@@ -77,14 +83,19 @@ class TimeModule(ModuleBase):
         self.modelName = modelName
         self.stream = False
         self.__maxRetries = 3
-        self.__model = Llama(
-            model_path=cfg.models[modelName], n_gpu_layers=128, n_ctx=self.maxOutputTokens)
+        self.__model = model_registry.get_model(
+            cfg.models[modelName], n_ctx=self.maxOutputTokens, n_gpu_layers=128)
+        self.__promptCache = prompt_cache.for_model(self.__model)
 
         logging.info(f"Initialized time model {modelName}")
 
+    def prime(self) -> None:
+        self.__promptCache.prime("time", TIME_PROMPT)
+
     def execute(self, handler: ModelHandler) -> float:
         logging.info("Executing time function")
         self.__modelHandler = handler
+        self.prime()
         messages = handler.messages()
         tempMessages = copy.deepcopy(messages)
 
@@ -96,12 +107,19 @@ class TimeModule(ModuleBase):
         tempMessages[-1]["content"] = timePrompt
 
         # Task 1 - what is the timeframe of the request (in days)?
+        # The grammar makes invalid output unlikely; retries are tracked to confirm it
         for i in range(self.__maxRetries):
-            filterResponse = self.__model.create_chat_completion(
+            metrics.increment("time.attempts")
+            if i > 0:
+                metrics.increment("time.retries")
+            filterResponse = model_registry.chat_completion(
+                self.__model,
                 tempMessages,
+                before=lambda: self.__promptCache.restore("time", tempMessages),
                 max_tokens=128,
                 stream=self.stream,
                 temperature=self.temperature,
+                grammar=TIME_GRAMMAR,
             )
             responseText = filterResponse['choices'][0]['message']['content']
             logging.info(
@@ -110,6 +128,7 @@ class TimeModule(ModuleBase):
             try:
                 timeResponse = json.loads(responseText)
             except json.decoder.JSONDecodeError:
+                metrics.increment("time.invalid")
                 logging.warn(
                     f"Time estimation model generated invalid JSON: {responseText}")
                 continue
@@ -130,6 +149,7 @@ class TimeModule(ModuleBase):
                 if timeResponse["days"] is None:
                     handler.send_debug_thoughts(timeResponse["reasoning"])
                     return timeResponse
+            metrics.increment("time.invalid")
 
             logging.info(
                 f"Invalid time estimation model response. Retrying ... ({i}/{self.__maxRetries})")
@@ -0,0 +1,188 @@
+# Base packages
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 3rd party packages
+import numpy as np
+import pandas as pd
+from bokeh.embed import file_html
+from bokeh.models import ColumnDataSource
+from bokeh.resources import CDN
+
+# Own packages
+import config as cfg
+from custom_types.orchestration_types import ChartLayout, ChartSpec
+
+# Templated rendering of the forecast plots.
+#
+# The bokeh figure of a plot type is built and serialized with file_html only
+# once per layout (title, labels), with a placeholder list in every column of
+# its named ColumnDataSources. Rendering a plot then only JSON encodes the
+# data and splices it into the placeholders of the serialized document. Date
+# columns are encoded as milliseconds since the epoch, as bokeh does.
+#
+# Rendered pages are cached by a fingerprint of the plot type, layout and
+# data, least recently used first out once they exceed cfg.plot_cache_max_mb.
+#
+# With cfg.plot_asset_type "chart+json" the forecasts send a chart spec
+# instead of the page: title, axis labels and the dates and values of each
+# series, drawn by the frontend. It is a few hundred bytes instead of a
+# standalone bokeh page, and no figure is serialized at request time.
+
+# Source name -> column name -> "datetime" or "number"
+SourceColumns = Dict[str, Dict[str, str]]
+
+_plotTypes: Dict[str, Tuple[Callable[..., Any], SourceColumns]] = {}
+_charts: Dict[str, ChartLayout] = {}
+
+
+def register(
+    plot_type: str, build: Callable[..., Any], sources: SourceColumns, chart: ChartLayout
+) -> None:
+    """Declare a plot type. build(sources, **layout) returns the bokeh figure
+    drawing from the given ColumnDataSources, one per source name. chart
+    describes the same plot as a chart spec; a title in the layout replaces
+    its title."""
+    _plotTypes[plot_type] = (build, sources)
+    _charts[plot_type] = chart
+
+
+def _placeholder(source: str, column: str) -> str:
+    return f"__plot_{source}_{column}__"
+
+
+class PlotTemplate:
+    def __init__(self, plot_type: str, layout: Dict[str, Any]):
+        build, self.sources = _plotTypes[plot_type]
+        dataSources = {
+            source: ColumnDataSource(
+                data={column: [_placeholder(source, column)] for column in columns}, name=source)
+            for source, columns in self.sources.items()
+        }
+        html = file_html(build(dataSources, **layout), CDN)
+
+        # Text chunks between the placeholders, in document order
+        self.__chunks: List[str] = []
+        self.__slots: List[Tuple[str, str]] = []
+        slots = sorted(
+            (html.index(json.dumps([_placeholder(source, column)])), source, column)
+            for source, columns in self.sources.items()
+            for column in columns
+        )
+        position = 0
+        for start, source, column in slots:
+            self.__chunks.append(html[position:start])
+            self.__slots.append((source, column))
+            position = start + len(json.dumps([_placeholder(source, column)]))
+        self.__chunks.append(html[position:])
+
+    def _encode(self, source: str, column: str, values) -> str:
+        if self.sources[source][column] == "datetime":
+            times = pd.to_datetime(pd.Series(values)).to_numpy(dtype="datetime64[ns]")
+            values = times.astype(np.int64) / 1e6
+        values = np.asarray(values, dtype=np.float64)
+        # NaN is not valid JSON, bokeh reads null as a missing value
+        return json.dumps([None if np.isnan(value) else value for value in values.tolist()])
+
+    def render(self, data: Dict[str, Dict[str, Any]]) -> str:
+        parts = []
+        for chunk, (source, column) in zip(self.__chunks, self.__slots):
+            parts.append(chunk)
+            parts.append(self._encode(source, column, data[source][column]))
+        parts.append(self.__chunks[-1])
+        return "".join(parts)
+
+
+_templates: Dict[Tuple[str, str], PlotTemplate] = {}
+_rendered: "OrderedDict[str, str]" = OrderedDict()
+_renderedSize = 0
+_lock = threading.Lock()
+
+
+def _template(plot_type: str, layout: Dict[str, Any]) -> PlotTemplate:
+    key = (plot_type, json.dumps(layout, sort_keys=True))
+    with _lock:
+        template = _templates.get(key)
+    if template is None:
+        logging.info(f"Building {plot_type} plot template for {layout}")
+        template = PlotTemplate(plot_type, layout)
+        with _lock:
+            _templates[key] = template
+    return template
+
+
+def _fingerprint(plot_type: str, layout: Dict[str, Any], data: Dict[str, Dict[str, Any]]) -> str:
+    digest = hashlib.sha256()
+    digest.update(json.dumps([plot_type, layout], sort_keys=True).encode("utf-8"))
+    for source in sorted(data):
+        for column in sorted(data[source]):
+            values = data[source][column]
+            digest.update(f"{source}.{column}".encode("utf-8"))
+            if isinstance(values, np.ndarray) and values.dtype != object:
+                digest.update(np.ascontiguousarray(values).tobytes())
+            else:
+                digest.update(repr([str(value) for value in values]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def render(plot_type: str, data: Dict[str, Dict[str, Any]], **layout) -> str:
+    """Standalone HTML page of the plot with the data, per source name and
+    column, and the layout values passed to the figure builder."""
+    global _renderedSize
+    key = _fingerprint(plot_type, layout, data)
+    with _lock:
+        html = _rendered.get(key)
+        if html is not None:
+            _rendered.move_to_end(key)
+            return html
+
+    html = _template(plot_type, layout).render(data)
+    with _lock:
+        if key not in _rendered:
+            _rendered[key] = html
+            _renderedSize += len(html)
+        while _renderedSize > cfg.plot_cache_max_mb * 2**20 and _rendered:
+            _, evicted = _rendered.popitem(last=False)
+            _renderedSize -= len(evicted)
+    return html
+
+
+def _dates(values) -> List[str]:
+    days = pd.DatetimeIndex(values).to_numpy(dtype="datetime64[D]")
+    return np.datetime_as_string(days).tolist()
+
+
+def _numbers(values) -> List[Optional[float]]:
+    # Rounded for display, full precision is in the explanation text
+    values = np.round(np.asarray(values, dtype=np.float64), 3)
+    return [None if np.isnan(value) else value for value in values.tolist()]
+
+
+def chart(plot_type: str, data: Dict[str, Dict[str, Any]], **layout) -> ChartSpec:
+    """Chart spec of the plot, with the series of the chart layout."""
+    layoutChart = _charts[plot_type]
+    return {
+        "title": layout.get("title", layoutChart["title"]),
+        "xLabel": layoutChart["xLabel"],
+        "yLabel": layoutChart["yLabel"],
+        "series": [
+            {
+                "name": series["name"],
+                "color": series["color"],
+                "x": _dates(data[series["source"]][layoutChart["x"]]),
+                "y": _numbers(data[series["source"]][layoutChart["y"]]),
+            }
+            for series in layoutChart["series"]
+        ],
+    }
+
+
+def render_asset(plot_type: str, data: Dict[str, Dict[str, Any]], **layout) -> str:
+    """The plot as an asset of type cfg.plot_asset_type."""
+    if cfg.plot_asset_type == "chart+json":
+        return json.dumps(chart(plot_type, data, **layout), separators=(",", ":"))
+    return render(plot_type, data, **layout)
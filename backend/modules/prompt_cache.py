@@ -0,0 +1,138 @@
+# Base packages
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# Own packages
+import config as cfg
+from . import model_registry
+
+# 3rd party packages
+from llama_cpp import Llama, LlamaState
+
+# llama.cpp state cache for the static few-shot preambles of the prompt
+# templates.
+#
+# Each template is evaluated once with an empty user prompt, as the only
+# message of a chat, and the resulting model state is kept. Before a
+# completion the module restores the state of its template (restore, under
+# the model lock), unless the tokens the model last evaluated already start
+# with it. llama.cpp then reuses the evaluated prefix and only evaluates the
+# user specific suffix. Only the first turn of a chat starts with the
+# preamble; later requests start with the earlier turns, so restore leaves
+# the model alone and llama.cpp reuses the previous turn of the chat instead.
+# The cache is not attached with Llama.set_cache: llama.cpp would save the
+# full state after every completion only to have it discarded.
+#
+# Entries are persisted to cfg.prompt_cache_dir, one file per model, so a
+# restarted process does not have to evaluate the preambles again. A file
+# written for different weights or context size is ignored, and an entry is
+# re-evaluated when its template text changes.
+
+
+def _model_fingerprint(model: Llama) -> str:
+    stat = os.stat(model.model_path)
+    identity = f"{os.path.abspath(model.model_path)}:{stat.st_size}:{stat.st_mtime_ns}:{model.n_ctx()}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+class PromptStateCache:
+    def __init__(self, model: Llama):
+        self.__model = model
+        self.__modelFingerprint = _model_fingerprint(model)
+        self.__path = Path(cfg.prompt_cache_dir) / f"{self.__modelFingerprint}.pkl"
+        # key -> (template fingerprint, prompt tokens, state)
+        self.__entries: Dict[str, Tuple[str, Tuple[int, ...], LlamaState]] = {}
+        # key -> the text of the template before the user prompt
+        self.__preambles: Dict[str, str] = {}
+        self.__lock = threading.Lock()
+        self.load()
+
+    def prime(self, key: str, template: str) -> None:
+        """Evaluate the static part of a template unless an up to date state
+        for it is already cached."""
+        fingerprint = hashlib.sha256(template.encode("utf-8")).hexdigest()
+        marker = f"<{fingerprint}>"
+        with self.__lock:
+            self.__preambles[key] = template.format(userPrompt=marker).split(marker)[0]
+            entry = self.__entries.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                return
+
+        logging.info(f"Evaluating prompt prefix {key}")
+        with model_registry.model_lock(self.__model):
+            self.__model.create_chat_completion(
+                [{"role": "user", "content": template.format(userPrompt="")}],
+                max_tokens=1,
+                temperature=0,
+            )
+            state = self.__model.save_state()
+        with self.__lock:
+            self.__entries[key] = (fingerprint, tuple(state.input_ids.tolist()), state)
+        self.save()
+
+    def restore(self, key: str, messages: List[Dict[str, Any]]) -> bool:
+        """Load the primed state of a template into the model if the request
+        messages start with it, returns whether it was loaded. Call with the
+        model lock held, right before the completion."""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            preamble = self.__preambles.get(key)
+        if entry is None or preamble is None:
+            return False
+        if len(messages) != 1 or not messages[0]["content"].startswith(preamble):
+            # Earlier turns of the chat come first, the request only shares
+            # the chat header with the primed state
+            return False
+        _, tokens, state = entry
+        evaluated = self.__model.input_ids[:self.__model.n_tokens]
+        if len(evaluated) >= len(tokens) and tuple(evaluated[:len(tokens)].tolist()) == tokens:
+            # Still in the KV cache from the last completion
+            return False
+        self.__model.load_state(state)
+        return True
+
+    # Persistence
+
+    def save(self) -> None:
+        with self.__lock:
+            entries = dict(self.__entries)
+        self.__path.parent.mkdir(parents=True, exist_ok=True)
+        tempPath = self.__path.with_suffix(".tmp")
+        with open(tempPath, "wb") as f:
+            pickle.dump({"model": self.__modelFingerprint, "entries": entries}, f)
+        os.replace(tempPath, self.__path)
+
+    def load(self) -> None:
+        if not self.__path.exists():
+            return
+        try:
+            with open(self.__path, "rb") as f:
+                stored = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logging.warning(f"Unable to read prompt cache {self.__path}: {e}")
+            return
+        if stored.get("model") != self.__modelFingerprint:
+            logging.info(f"Ignoring prompt cache {self.__path} written for another model")
+            return
+        with self.__lock:
+            self.__entries.update(stored["entries"])
+        logging.info(f"Loaded {len(stored['entries'])} cached prompt prefixes")
+
+
+_caches: Dict[int, PromptStateCache] = {}
+_cachesLock = threading.Lock()
+
+
+def for_model(model: Llama) -> PromptStateCache:
+    """Return the prompt cache of a model, creating it on first use."""
+    with _cachesLock:
+        cache = _caches.get(id(model))
+        if cache is None:
+            cache = PromptStateCache(model)
+            _caches[id(model)] = cache
+        return cache
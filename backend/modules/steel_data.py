@@ -0,0 +1,93 @@
+# Base packages
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# 3rd party packages
+import numpy as np
+import pandas as pd
+
+# Shared access to the monthly index CSVs of the steel forecasts.
+#
+# Each source is parsed once per file version: the ':' missing value marker
+# becomes NaN at parse time and is forward filled, the index columns are
+# float64 and renamed after their source (Germany -> Germany_steel_index),
+# and the months get the "YYYY-MM-01" dates the models work with, in one
+# vectorized operation. The merged frame of both sources is cached as well.
+# All frames are rebuilt when the mtime of a file changes.
+#
+# Callers get shallow copies whose value arrays are read-only: adding or
+# replacing columns only affects the copy, writing into the shared values
+# raises a ValueError.
+
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
+STEEL_PATH = DATA_DIR / "processed_steel_data.csv"
+ELECTRICITY_PATH = DATA_DIR / "processed_eletricity_price_index.csv"
+# Suffix of the index columns of each source
+SOURCES = {STEEL_PATH: "steel_index", ELECTRICITY_PATH: "electricity_index"}
+
+
+def files() -> List[Path]:
+    """The CSVs the steel forecasts are computed from."""
+    return list(SOURCES)
+
+
+def _frozen(times: np.ndarray, values: np.ndarray, columns: List[str]) -> pd.DataFrame:
+    """Frame over read-only copies of the arrays, one block per column so
+    pandas does not consolidate (copy) them."""
+    times = np.array(times, dtype=object)
+    values = np.array(values, dtype=np.float64)
+    times.flags.writeable = False
+    values.flags.writeable = False
+    return pd.DataFrame(
+        {"time": times, **{column: values[:, i] for i, column in enumerate(columns)}}, copy=False)
+
+
+def _read(path: Path) -> pd.DataFrame:
+    logging.info(f"Loading index data {path}")
+    raw = pd.read_csv(path, na_values=":", dtype={"time": str})
+    columns = [column for column in raw.columns if column != "time"]
+    return _frozen(
+        (raw["time"] + "-01").to_numpy(),
+        raw[columns].astype(np.float64).ffill().to_numpy(),
+        [f"{column}_{SOURCES[path]}" for column in columns],
+    )
+
+
+_frames: Dict[Tuple, pd.DataFrame] = {}
+_framesLock = threading.RLock()
+
+
+def _versions(paths: List[Path]) -> Tuple[int, ...]:
+    return tuple(os.stat(path).st_mtime_ns for path in paths)
+
+
+def _cached(key: Tuple, paths: List[Path], build) -> pd.DataFrame:
+    version = _versions(paths)
+    with _framesLock:
+        entry = _frames.get(key)
+        if entry is None or entry[0] != version:
+            entry = _frames[key] = (version, build())
+        return entry[1].copy(deep=False)
+
+
+def read_index(path: Path) -> pd.DataFrame:
+    """One source with its time column and float index columns."""
+    return _cached(("source", path), [path], lambda: _read(path))
+
+
+def merged() -> pd.DataFrame:
+    """The steel indices with the electricity index of the same months."""
+    def build():
+        data = pd.merge(read_index(STEEL_PATH), read_index(ELECTRICITY_PATH), on="time", how="left")
+        columns = [column for column in data.columns if column != "time"]
+        return _frozen(data["time"].to_numpy(), data[columns].to_numpy(), columns)
+
+    return _cached(("merged",), files(), build)
+
+
+def version() -> Tuple[int, ...]:
+    """Changes whenever one of the source files changes."""
+    return _versions(files())
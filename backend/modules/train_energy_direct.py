@@ -0,0 +1,148 @@
+# %%
+import logging
+import warnings
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import TimeSeriesSplit
+
+import config as cfg
+
+from . import artifact_registry
+from .energy_features import EnergyFeatures, open_features
+from .energy_store import DATASET_PATH, open_store
+from .hyperparameter_search import SuccessiveHalvingSearch
+
+warnings.filterwarnings(action="ignore")
+
+# Direct multi-horizon energy price model.
+#
+# Instead of one model per horizon, a single forest predicts the price any
+# number of days ahead (up to cfg.energy_max_horizon) from the features of the
+# forecast origin plus the number of days ahead. Its training samples are
+# random (origin hour, days ahead) pairs whose target is known, so the most
+# recent origins contribute to the short horizons they have targets for.
+#
+# A forecast for a horizon is one predict call over the rows for days
+# 1..horizon of the latest origin. With cfg.energy_hyperparameter_search the
+# forest parameters are picked by a successive-halving search over
+# SEARCH_SPACE on the training samples, MODEL_PARAMS otherwise. Training is
+# offline only, the model is published to the artifact registry:
+#
+#     python backend/training_worker.py energy
+
+# Lags of the origin features, the latest day first
+ORIGIN_LAGS = [0, 1, 2]
+TARGET = "price_actual"
+
+MODEL_PARAMS = {
+    "n_estimators": 100,
+    "max_depth": 20,
+    "min_samples_leaf": 20,
+    "max_features": "sqrt",
+    "max_samples": 0.5,
+}
+
+SEARCH_SPACE = {
+    "n_estimators": range(50, 200, 25),
+    "max_depth": range(10, 35, 5),
+    "min_samples_leaf": [5, 10, 20, 40],
+    "max_features": ["sqrt", "log2"],
+    "max_samples": np.arange(0.2, 1, 0.1),
+}
+
+
+def origin_feature_names(features: EnergyFeatures) -> np.ndarray:
+    return np.array(features.feature_names(ORIGIN_LAGS) + ["days_ahead"])
+
+
+def origin_rows(origin: np.ndarray, horizon: int) -> np.ndarray:
+    """Model inputs for days 1..horizon after one origin."""
+    days = np.arange(1, horizon + 1, dtype=np.float64)[:, None]
+    return np.hstack([np.repeat(origin[None, :], horizon, axis=0), days])
+
+
+def training_samples(
+    features: EnergyFeatures,
+    max_horizon: int,
+    n_samples: int,
+    origins: slice = slice(None),
+    end: int | None = None,
+    seed: int = 42,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Random (origin, days ahead) samples with a known target, drawn from
+    the given origin rows and ordered by origin. Rows from end on are not used
+    as targets."""
+    X_origin = features.derive(0, ORIGIN_LAGS)
+    target = features.column(TARGET)[:end]
+    candidates = np.arange(len(features))[origins]
+
+    rng = np.random.default_rng(seed)
+    origin = np.sort(rng.choice(candidates, size=n_samples))
+    days = rng.integers(1, max_horizon + 1, size=n_samples)
+    target_row = origin + days * 24
+    known = target_row < len(target)
+    known[known] = ~np.isnan(target[target_row[known]])
+
+    X = np.hstack([X_origin[origin[known]], days[known, None].astype(np.float64)])
+    return X, target[target_row[known]]
+
+
+def fit(X: np.ndarray, y: np.ndarray, params: dict = MODEL_PARAMS) -> RandomForestRegressor:
+    model = RandomForestRegressor(**params, n_jobs=-1, random_state=42)
+    return model.fit(X, y)
+
+
+def search_params(X: np.ndarray, y: np.ndarray) -> dict:
+    """Forest parameters picked by a successive-halving search. The samples
+    are ordered by origin, so the folds and the sample budgets of the search
+    are the latest origins."""
+    search = SuccessiveHalvingSearch(
+        RandomForestRegressor(random_state=42),
+        SEARCH_SPACE,
+        n_candidates=27,
+        min_resources=1000,
+        factor=3,
+        cv=TimeSeriesSplit(n_splits=2),
+        checkpoint_dir=cfg.hyperparameter_search_dir,
+    ).fit(X, y)
+    logging.info(f"Hyperparameter search:\n{search.report()}")
+    return search.best_params_
+
+
+def train(data_path: str = DATASET_PATH, max_horizon: int = cfg.energy_max_horizon) -> dict:
+    """Train the model on the dataset and publish it as the "energy" artifact."""
+    trained_hash = artifact_registry.data_hash([data_path])
+    features = open_features(data_path)
+    last_date = open_store(data_path).last_date()
+
+    # Hold out the origins of the last 20% of rows to report the accuracy
+    n_train = int(len(features) * 0.8)
+    X_train, y_train = training_samples(
+        features, max_horizon, cfg.energy_training_samples, origins=slice(None, n_train), end=n_train)
+    X_val, y_val = training_samples(
+        features, max_horizon, cfg.energy_training_samples // 4, origins=slice(n_train, None))
+    params = search_params(X_train, y_train) if cfg.energy_hyperparameter_search else MODEL_PARAMS
+    model = fit(X_train, y_train, params)
+    mae = mean_absolute_error(y_val, model.predict(X_val))
+    print("Validation MAE:", mae)
+
+    X, y = training_samples(features, max_horizon, cfg.energy_training_samples)
+    logging.info(f"Training direct energy model on {len(y)} samples")
+    model = fit(X, y, params)
+    return artifact_registry.publish(
+        "energy",
+        model,
+        data_hash=trained_hash,
+        last_date=last_date,
+        horizons=range(1, max_horizon + 1),
+        metrics={"validation_mae": mae},
+        feature_names=origin_feature_names(features),
+        params=params,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    train()
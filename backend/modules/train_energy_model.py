@@ -8,15 +8,13 @@ from typing import Literal
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from bokeh.embed import file_html
-from bokeh.models import ColumnDataSource, DatetimeTickFormatter, HoverTool
+from bokeh.models import DatetimeTickFormatter, HoverTool
 from bokeh.palettes import Category10
 from bokeh.plotting import figure
-from bokeh.resources import CDN
 from dateutil.relativedelta import relativedelta
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.impute import SimpleImputer
-from sklearn.metrics import mean_absolute_error
+from sklearn.metrics import mean_absolute_error, r2_score
 from sklearn.model_selection import (
     RandomizedSearchCV,
     TimeSeriesSplit,
@@ -24,26 +22,25 @@ from sklearn.model_selection import (
 )
 from sklearn.preprocessing import OrdinalEncoder
 
-warnings.filterwarnings(action="ignore")
+import config as cfg
+
+from . import plot_rendering
+from .energy_features import open_features, prepare_data
+from .energy_store import DATASET_PATH, open_store
+from .hyperparameter_search import SuccessiveHalvingSearch
 
+warnings.filterwarnings(action="ignore")
 
-def _season_from_month(month):
-    if month in [12, 1, 2]:
-        return "winter"
-    elif month in [3, 4, 5]:
-        return "spring"
-    elif month in [6, 7, 8]:
-        return "summer"
-    elif month in [9, 10, 11]:
-        return "autumn"
+LAGS = [1, 2, 3]
 
 
-def _lag_column(df, column, horizon: int, lags=list[int]):
-    for lag in lags:
-        delay = lag + horizon
-        new_column_name = column + "_t-" + str(lag)
-        df[new_column_name] = df[column].shift(delay * 24)
-    return df
+def _lag_columns(data: pd.DataFrame, horizon: int, lags: list[int]) -> list[pd.Series]:
+    # Lags of a column are ordered by lag, columns keep their order
+    return [
+        data[column].shift((lag + horizon) * 24).rename(f"{column}_t-{lag}")
+        for column in data.columns
+        for lag in lags
+    ]
 
 
 def _preprocess_data(
@@ -52,39 +49,12 @@ def _preprocess_data(
     lags: list[int] | None = None,
     target: str = "price_actual",
 ) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, list[str]]:
-    # Rename columns by replacing all - or blank space with _
-    data.columns = data.columns.str.replace(" ", "_").str.replace("-", "_")
-
-    data.sort_index(inplace=True)
-
-    # Make the index DT
-    data.index = pd.to_datetime(data.index, utc=True)
-
-    # Drop columns with more than 95% missing values
-    data = data.loc[:, data.isnull().sum() / len(data) * 100 < 0.95]
-
-    data.drop(
-        columns=[
-            "price_day_ahead",
-            "generation_marine",
-            "generation_fossil_coal_derived_gas",
-            "generation_fossil_oil_shale",
-            "generation_fossil_peat",
-            "generation_geothermal",
-            "generation_geothermal",
-            "total_load_forecast",
-        ],
-        inplace=True,
-    )
-
-    # Create column in dataframe that inputs the season based on the conditions created above
-    data["season"] = data.apply(lambda x: _season_from_month(x.name.month), axis=1)
+    data = prepare_data(data)
 
     if lags and horizon:
-        for column in data.columns:
-            data = _lag_column(data, column, horizon=horizon, lags=lags)
-            if column != target and column != "season":
-                data.drop(columns=column, inplace=True)
+        # Only the target and season are kept next to the lagged columns
+        kept = [column for column in data.columns if column in (target, "season")]
+        data = pd.concat([data[kept]] + _lag_columns(data, horizon, lags), axis=1)
 
     y, X = data[target], data.drop(columns=target)
     X_train, X_val, y_train, y_val = train_test_split(
@@ -117,22 +87,28 @@ def _preprocess_data(
 
 
 def _check_metrics(model, X_train, X_val, y_train, y_val):
+    # Each set is predicted once for all of its metrics
+    val_predictions = model.predict(X_val)
     print(model)
     print("===================================================================")
     print("Training MAE:", mean_absolute_error(y_train, model.predict(X_train)))
     print("-------------------------------------------------------------------")
-    print("Validation MAE:", mean_absolute_error(y_val, model.predict(X_val)))
+    print("Validation MAE:", mean_absolute_error(y_val, val_predictions))
     print("-------------------------------------------------------------------")
-    print("Validation R2 score:", model.score(X_val, y_val))
+    print("Validation R2 score:", r2_score(y_val, val_predictions))
     print("===================================================================")
 
 
 def _train_model(
-    X_train, y_train, X_val, y_val, mode: Literal["random_search", "best_params"]
+    X_train,
+    y_train,
+    X_val,
+    y_val,
+    mode: Literal["successive_halving", "random_search", "best_params"],
 ):
     model_rfr = RandomForestRegressor()
 
-    if mode == "random_search":
+    if mode in ["successive_halving", "random_search"]:
         params = {
             "max_depth": range(5, 35, 5),
             "n_estimators": range(25, 200, 10),
@@ -151,6 +127,21 @@ def _train_model(
 
     tscv = TimeSeriesSplit(n_splits=2)
 
+    if mode == "successive_halving":
+        # Resumable, most candidates are only fitted on the latest rows
+        search = SuccessiveHalvingSearch(
+            model_rfr,
+            params,
+            n_candidates=27,
+            min_resources=1000,
+            factor=3,
+            cv=tscv,
+            checkpoint_dir=cfg.hyperparameter_search_dir,
+        ).fit(X_train, y_train)
+        print(search.report())
+        _check_metrics(search.best_estimator_, X_train, X_val, y_train, y_val)
+        return search
+
     model_rs_rfr = RandomizedSearchCV(
         model_rfr,
         param_distributions=params,
@@ -208,37 +199,27 @@ def predict(model, data, horizon: int | None = None, lags: list[int] | None = No
     return model.predict(features)
 
 
-def _save_data_for_predictions(data: pd.DataFrame, horizon: int, lags: list[int]):
-    X_train, X_val, _, _, _ = _preprocess_data(
-        data, horizon=horizon, lags=[l - 1 for l in lags]
-    )
-    data_concat = np.concatenate([X_train, X_val])
-    np.save(f"data/energy/data_preprocessed_horizon_{horizon}.npy", data_concat)
-
-
 def train(
     horizon: int,
-    data_path: str = Path(__file__).parent.parent.parent / "data/energy/dataset.csv",
+    data_path: str = DATASET_PATH,
 ):
-    data = pd.read_csv(
-        data_path,
-        parse_dates=["time"],
-        index_col="time",
-    )
-    last_date = data.index[-1].strftime("%Y-%m-%d")
-    lags = [1, 2, 3]
+    store = open_store(data_path)
+    data = store.frame()
+    last_date = store.last_date()
+    lags = LAGS
     X_train, X_val, y_train, y_val, features_names = _preprocess_data(
         data, horizon=horizon, lags=lags
     )
 
-    model = _train_model(X_train, y_train, X_val, y_val, mode="random_search")
+    model = _train_model(X_train, y_train, X_val, y_val, mode="successive_halving")
 
     # _plot_feature_importances(model.best_estimator_, features_names, horizon=horizon)
 
     _save_model(
         model.best_estimator_, features_names, last_date=last_date, horizon=horizon
     )
-    _save_data_for_predictions(data, horizon=horizon, lags=lags)
+    # Builds the shared feature matrix, or appends the rows added since
+    open_features(data_path)
     return model.best_estimator_
 
 
@@ -335,26 +316,7 @@ def _formulate_explanation_string(
     return data_explanation, plot_html_str
 
 
-def plot_trend(previous_data, predicted_data, horizon, last_date):
-    predicted_days = _generate_upcoming_days(last_date, horizon)
-
-    # Sample Data
-    past_data = {
-        "time": np.array(previous_data["time"]),
-        "price": np.array(previous_data["price actual"]),
-    }
-    last_date = str(previous_data["time"].max())
-    print(last_date)
-    forecast_data = {
-        "time": predicted_days,
-        "price": predicted_data,
-    }
-
-    past_df = pd.DataFrame(past_data)
-    past_df["time"] = pd.to_datetime(past_df["time"])
-    forecast_df = pd.DataFrame(forecast_data)
-    forecast_df["time"] = pd.to_datetime(forecast_df["time"])
-    # Create Bokeh plot
+def _trend_figure(sources):
     p = figure(
         title="Energy Price Forecast",
         x_axis_label="Date",
@@ -364,14 +326,13 @@ def plot_trend(previous_data, predicted_data, horizon, last_date):
     )
     p.xaxis.major_label_orientation = 45
 
-    source_forecast = ColumnDataSource(forecast_df)
     forecast_dots = p.circle(
         x="time",
         y="price",
         size=10,
         color=Category10[3][1],
         legend_label="Forecast Data",
-        source=source_forecast,
+        source=sources["forecast"],
     )
     forecast_line = p.line(
         x="time",
@@ -379,31 +340,31 @@ def plot_trend(previous_data, predicted_data, horizon, last_date):
         line_width=4,
         color=Category10[3][1],
         legend_label="Forecast Data",
-        source=source_forecast,
+        source=sources["forecast"],
     )
     p.line(
-        pd.concat([past_df["time"].tail(1), forecast_df["time"].head(1)]),
-        pd.concat([past_df["price"].tail(1), forecast_df["price"].head(1)]),
+        x="time",
+        y="price",
         line_width=4,
         color=Category10[3][1],
+        source=sources["bridge"],
     )
 
     # Plot past data as dots
-    source_past = ColumnDataSource(past_df)
     past_dots = p.circle(
         x="time",
         y="price",
         size=10,
         color=Category10[3][0],
         legend_label="Past Data",
-        source=source_past,
+        source=sources["past"],
     )
     past_line = p.line(
         x="time",
         y="price",
         color=Category10[3][0],
         legend_label="Past Data",
-        source=source_past,
+        source=sources["past"],
         line_width=4,
     )
 
@@ -418,13 +379,53 @@ def plot_trend(previous_data, predicted_data, horizon, last_date):
     p.legend.click_policy = "hide"
 
     p.xaxis.formatter = DatetimeTickFormatter(
-        days=["%d/%m/%Y"],
-        months=["%d-%M-%Y"],
-        years=["%d-%M-%Y"],
+        days="%d/%m/%Y",
+        months="%d-%M-%Y",
+        years="%d-%M-%Y",
     )
+    return p
+
+
+PLOT_COLUMNS = {"time": "datetime", "price": "number"}
+plot_rendering.register(
+    "energy_trend",
+    _trend_figure,
+    {"past": PLOT_COLUMNS, "forecast": PLOT_COLUMNS, "bridge": PLOT_COLUMNS},
+    {
+        "title": "Energy Price Forecast",
+        "xLabel": "Date",
+        "yLabel": "Energy price [EUR/MWh]",
+        "x": "time",
+        "y": "price",
+        "series": [
+            {"name": "Past Data", "source": "past", "color": Category10[3][0]},
+            {"name": "Forecast Data", "source": "forecast", "color": Category10[3][1]},
+        ],
+    },
+)
+
+
+def plot_trend(previous_data, predicted_data, horizon, last_date):
+    predicted_days = _generate_upcoming_days(last_date, horizon)
 
-    html_str = file_html(p, CDN)
-    return html_str
+    past_time = pd.to_datetime(np.array(previous_data["time"]))
+    past_price = np.array(previous_data["price actual"], dtype=np.float64)
+    forecast_time = pd.to_datetime(predicted_days)
+    forecast_price = np.asarray(predicted_data, dtype=np.float64)
+
+    # The figure is templated, only the data is rendered per request
+    return plot_rendering.render_asset(
+        "energy_trend",
+        {
+            "past": {"time": past_time, "price": past_price},
+            "forecast": {"time": forecast_time, "price": forecast_price},
+            # Joins the last past value to the first forecast
+            "bridge": {
+                "time": [past_time[-1], forecast_time[0]],
+                "price": [past_price[-1], forecast_price[0]],
+            },
+        },
+    )
 
 
 def get_data_explanation(
@@ -1,18 +1,18 @@
 from bokeh.plotting import figure, show
 from bokeh.palettes import Category10
-from bokeh.models import ColumnDataSource, HoverTool
+from bokeh.models import HoverTool
 from bokeh.layouts import column
 from datetime import datetime
 import logging
 
 import numpy as np
 import pandas as pd
-from bokeh.embed import file_html
-from bokeh.resources import CDN
 from dateutil.relativedelta import relativedelta
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error
 
+from . import plot_rendering
+
 
 def zip_string(arr1, arr2):
     return "\n" + "\n".join([f"{arr1[i]}: {arr2[i]}" for i in range(len(arr1))]) + "\n"
@@ -60,7 +60,7 @@ def create_lag_features(data, label_column, feature_cols, horizon=3, lags=[1, 2,
     return data_lagged[delayed_cols].dropna()
 
 
-def create_lag_features_forecast(data, feature_cols, lags=[0, 1, 2]):
+def create_lag_features_forecast(data, feature_cols, lags=[0, 1, 2], dropna=True):
     """
     Generate lagged features for time-series data forecasting.
 
@@ -68,6 +68,7 @@ def create_lag_features_forecast(data, feature_cols, lags=[0, 1, 2]):
     - data (pd.DataFrame): The input DataFrame containing time-series data.riable.
     - feature_cols (list): List of column names to create lagged features for.
     - lags (list, optional): List of time lags to create features for. Default is [1, 2, 3].
+    - dropna (bool, optional): Drop the rows with a missing value in any of the columns. Default is True.
 
     Returns:
     pd.DataFrame: A new DataFrame with lagged features created for the specified columns.
@@ -81,6 +82,8 @@ def create_lag_features_forecast(data, feature_cols, lags=[0, 1, 2]):
             data_lagged[col_name] = data[feature].shift(i)
             delayed_cols.append(col_name)
 
+    if not dropna:
+        return data_lagged[delayed_cols]
     return data_lagged[delayed_cols].dropna()
 
 
@@ -100,7 +103,7 @@ def train(
         data,
         label_column=[target_column],
         feature_cols=[target_column] + feature_cols,
-        horizon=3,
+        horizon=horizon,
         lags=[1, 2, 3],
     )  #
 
@@ -128,11 +131,11 @@ def train(
     print("Training completed!")
     print(f"Root Mean Squared Error on Test Set: {rmse}")
 
-    return model
+    return model, {"test_rmse": rmse}
 
 
 def formulate_explanation_string(
-    model, forecast_features, last_date, horizon, last_label_data
+    model, forecast_features, last_date, horizon, last_label_data, target_column="Germany_steel_index"
 ):
     feat_names = model.feature_names_in_
     feat_importance = model.feature_importances_
@@ -161,7 +164,7 @@ def formulate_explanation_string(
     data_explanation += "\n"
 
     data_explanation += "Short-term business statistics (STS) provide index data on various economic activities. Percentage changes,\n"
-    data_explanation += "The column Germany_steel_index represents the STS for Basic iron and steel and ferro-alloys\n"
+    data_explanation += f"The column {target_column} represents the STS for Basic iron and steel and ferro-alloys\n"
     data_explanation += (
         "The column Germany_electricity_index represents the STS for Electricity\n"
     )
@@ -170,29 +173,9 @@ def formulate_explanation_string(
     return data_explanation
 
 
-def create_forecast_plot(past_df, predictions, past_target_col="Germany_steel_index"):
-    # Sample Data
-    past_data = {
-        "time": np.array(past_df["time"]),
-        "Germany_steel_index": np.array(past_df[past_target_col]).tolist(),
-    }
-    last_date = str(past_df["time"].max())
-    print(last_date)
-    forecast_data = {
-        "time": generate_upcoming_months(last_date, len(predictions.tolist())),
-        "Germany_steel_index": predictions.tolist(),
-    }
-
-    # past_df = pd.DataFrame(past_data)
-    past_df = past_df.tail(11)
-    past_df["time"] = pd.to_datetime(past_df["time"])
-    logging.info(forecast_data)
-    forecast_df = pd.DataFrame(forecast_data)
-    forecast_df["time"] = pd.to_datetime(forecast_df["time"])
-    # Create Bokeh plot
-    # Create Bokeh plot
+def _forecast_figure(sources, title):
     p = figure(
-        title="Short-term Business Statistics - Steel Index",
+        title=title,
         x_axis_label="time",
         y_axis_label="Index Value",
         x_axis_type="datetime",
@@ -202,64 +185,99 @@ def create_forecast_plot(past_df, predictions, past_target_col="Germany_steel_in
     p.title.text_font_size = "18pt"
     p.xaxis.major_label_orientation = 45
 
-    source_forecast = ColumnDataSource(forecast_df)
     forecast_dots = p.circle(
         x="time",
-        y="Germany_steel_index",
+        y="steel_index",
         size=10,
         color=Category10[3][1],
         legend_label="Forecast Data",
-        source=source_forecast,
+        source=sources["forecast"],
     )
     forecast_line = p.line(
         x="time",
-        y="Germany_steel_index",
+        y="steel_index",
         line_width=4,
         color=Category10[3][1],
         legend_label="Forecast Data",
-        source=source_forecast,
+        source=sources["forecast"],
     )
     p.line(
-        pd.concat([past_df["time"].tail(1), forecast_df["time"].head(1)]),
-        pd.concat(
-            [
-                past_df["Germany_steel_index"].tail(1),
-                forecast_df["Germany_steel_index"].head(1),
-            ]
-        ),
+        x="time",
+        y="steel_index",
         line_width=4,
         color=Category10[3][1],
+        source=sources["bridge"],
     )
 
     # Plot past data as dots
-    source_past = ColumnDataSource(past_df)
     past_dots = p.circle(
         x="time",
-        y="Germany_steel_index",
+        y="steel_index",
         size=10,
         color=Category10[3][0],
         legend_label="Past Data",
-        source=source_past,
+        source=sources["past"],
     )
     past_line = p.line(
         x="time",
-        y="Germany_steel_index",
+        y="steel_index",
         color=Category10[3][0],
         legend_label="Past Data",
-        source=source_past,
+        source=sources["past"],
         line_width=4,
     )
 
     # Add hover tool
     hover = HoverTool()
     hover.tooltips = [("time", "@time{%F}"),
-                      ("Index Value", "@Germany_steel_index")]
+                      ("Index Value", "@steel_index")]
     hover.formatters = {"@time": "datetime"}
     p.add_tools(hover)
 
     # Add labels and legend
     p.legend.location = "bottom_left"
     p.legend.click_policy = "hide"
-    html = file_html(p, CDN)
+    return p
+
+
+PLOT_COLUMNS = {"time": "datetime", "steel_index": "number"}
+plot_rendering.register(
+    "steel_forecast",
+    _forecast_figure,
+    {"past": PLOT_COLUMNS, "forecast": PLOT_COLUMNS, "bridge": PLOT_COLUMNS},
+    {
+        "title": "Short-term Business Statistics - Steel Index",
+        "xLabel": "time",
+        "yLabel": "Index Value",
+        "x": "time",
+        "y": "steel_index",
+        "series": [
+            {"name": "Past Data", "source": "past", "color": Category10[3][0]},
+            {"name": "Forecast Data", "source": "forecast", "color": Category10[3][1]},
+        ],
+    },
+)
 
-    return html
+
+def create_forecast_plot(past_df, predictions, past_target_col="Germany_steel_index"):
+    last_date = str(past_df["time"].max())
+    past_df = past_df.tail(11)
+    past_time = pd.to_datetime(np.array(past_df["time"]))
+    past_index = np.array(past_df[past_target_col], dtype=np.float64)
+    forecast_time = pd.to_datetime(generate_upcoming_months(last_date, len(predictions)))
+    forecast_index = np.asarray(predictions, dtype=np.float64)
+
+    # The figure is templated per country, only the data is rendered per request
+    return plot_rendering.render_asset(
+        "steel_forecast",
+        {
+            "past": {"time": past_time, "steel_index": past_index},
+            "forecast": {"time": forecast_time, "steel_index": forecast_index},
+            # Joins the last past value to the first forecast
+            "bridge": {
+                "time": [past_time[-1], forecast_time[0]],
+                "steel_index": [past_index[-1], forecast_index[0]],
+            },
+        },
+        title=f"Short-term Business Statistics - {past_target_col.split('_')[0]} Steel Index",
+    )
@@ -0,0 +1,197 @@
+# Base packages
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+# Own packages
+from model_handler.model_handler import ModelHandler
+
+# Runs orchestrator steps as a dependency graph on a thread pool.
+#
+# A step is a function called with the results of its dependencies as keyword
+# arguments. Steps whose dependencies are done run concurrently. The forecast
+# modules spend their time in numpy/sklearn and the LLM modules in llama.cpp,
+# both of which release the GIL, so threads are enough.
+#
+# A step can speculate on the result of some dependencies: it is started with
+# the guessed values right away, and once the real values are known its result
+# is kept if the guess was right. Otherwise it is cancelled and restarted with
+# the real values. Python threads cannot be interrupted, so cancelling a
+# speculative step that already started only discards its result, but the
+# run returns without waiting for it to finish.
+#
+# A step whose condition ("when") is false for the real inputs is skipped, and
+# its dependents receive None for it.
+
+
+class Step:
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[..., Any],
+        deps: List[str],
+        label: Optional[str],
+        when: Optional[Callable[..., bool]],
+        speculate: Optional[Dict[str, Any]],
+    ):
+        self.name = name
+        self.fn = fn
+        self.deps = deps
+        self.label = label
+        self.when = when
+        self.speculate = speculate or {}
+        self.future: Optional[Future] = None
+        self.inputs: Optional[Dict[str, Any]] = None
+        self.speculative = False
+
+
+class DagScheduler:
+    def __init__(self, handler: ModelHandler, max_workers: int = 4):
+        self.__handler = handler
+        self.__maxWorkers = max_workers
+        self.__steps: Dict[str, Step] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add(
+        self,
+        name: str,
+        fn: Callable[..., Any],
+        deps: Optional[List[str]] = None,
+        label: Optional[str] = None,
+        when: Optional[Callable[..., bool]] = None,
+        speculate: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Register a step.
+
+        - fn: called with the dependency results as keyword arguments.
+        - label: status message shown while the step runs.
+        - when: called like fn; the step is skipped when it returns False.
+        - speculate: guessed results of some dependencies, used to start the
+          step before they finish.
+        """
+        deps = deps or []
+        unknown = [dep for dep in deps if dep not in self.__steps]
+        if unknown:
+            raise ValueError(f"Step {name} depends on unknown steps {unknown}")
+        self.__steps[name] = Step(name, fn, deps, label, when, speculate)
+
+    def has(self, name: str) -> bool:
+        return name in self.__steps
+
+    def run(self) -> Dict[str, Any]:
+        """Run all steps and return their results. Skipped steps map to None."""
+        results: Dict[str, Any] = {}
+        finished = set()
+        pending = list(self.__steps.values())
+
+        # The request does not wait for discarded speculative steps, the pool
+        # is shut down without waiting and queued steps are dropped
+        pool = ThreadPoolExecutor(max_workers=self.__maxWorkers)
+        try:
+            while pending:
+                for step in list(pending):
+                    self.__schedule(pool, step, results, finished)
+                    if step.name in finished:
+                        pending.remove(step)
+
+                # Finished speculative steps wait for their real inputs
+                running = [
+                    step.future for step in pending
+                    if step.future is not None
+                    and not (step.speculative and step.future.done())
+                ]
+                if not running:
+                    if pending:
+                        raise RuntimeError(
+                            f"Steps {[step.name for step in pending]} can never run")
+                    break
+
+                completed, _ = wait(running, return_when=FIRST_COMPLETED)
+                for step in list(pending):
+                    if step.future not in completed or step.speculative:
+                        continue
+                    results[step.name] = step.future.result()
+                    finished.add(step.name)
+                    pending.remove(step)
+                    self.__report(step)
+        except Exception:
+            # A step failed, its siblings that did not start yet never will
+            for step in pending:
+                if step.future is not None:
+                    step.future.cancel()
+            raise
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        return results
+
+    def __schedule(self, pool: ThreadPoolExecutor, step: Step, results, finished) -> None:
+        depsDone = all(dep in finished for dep in step.deps)
+
+        if not depsDone:
+            if step.future is not None or not step.speculate:
+                return
+            unguessed = [dep for dep in step.deps if dep not in step.speculate]
+            if not all(dep in finished for dep in unguessed):
+                return
+            inputs = {dep: results[dep] for dep in unguessed}
+            inputs.update(step.speculate)
+            logging.info(f"Speculatively starting step {step.name} with {step.speculate}")
+            self.__submit(pool, step, inputs, speculative=True)
+            return
+
+        inputs = {dep: results[dep] for dep in step.deps}
+        if step.future is not None and not step.speculative:
+            return
+
+        if step.when is not None and not step.when(**inputs):
+            if step.future is not None:
+                logging.info(f"Cancelling speculative step {step.name}, it is not needed")
+                step.future.cancel()
+                step.inputs = None
+                self.timings.pop(step.name, None)
+            logging.info(f"Skipping step {step.name}")
+            results[step.name] = None
+            finished.add(step.name)
+            return
+
+        if step.future is not None:
+            if step.inputs == inputs:
+                logging.info(f"Speculation for step {step.name} was correct")
+                step.speculative = False
+                if step.future.done():
+                    self.__collect(step, results, finished)
+                return
+            logging.info(
+                f"Speculation for step {step.name} was wrong, restarting with {inputs}")
+            step.future.cancel()
+
+        if step.label:
+            self.__handler.update_status_message(step.label)
+        self.__submit(pool, step, inputs, speculative=False)
+
+    def __submit(self, pool: ThreadPoolExecutor, step: Step, inputs, speculative: bool) -> None:
+        def timed():
+            start = time.perf_counter()
+            try:
+                return step.fn(**inputs)
+            finally:
+                # Results of discarded speculative runs are not reported
+                if step.inputs is inputs:
+                    self.timings[step.name] = time.perf_counter() - start
+
+        step.inputs = inputs
+        step.speculative = speculative
+        step.future = pool.submit(timed)
+
+    def __collect(self, step: Step, results, finished) -> None:
+        results[step.name] = step.future.result()
+        finished.add(step.name)
+        self.__report(step)
+
+    def __report(self, step: Step) -> None:
+        elapsed = self.timings.get(step.name, 0.0)
+        logging.info(f"Step {step.name} finished in {elapsed:.2f}s")
+        if step.label:
+            self.__handler.update_status_message(f"{step.label} done in {elapsed:.1f}s")
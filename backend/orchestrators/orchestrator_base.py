@@ -1,10 +1,57 @@
+import logging
+import time
+from typing import Dict
+
 from model_handler.model_handler import ModelHandler
 
 
 class OrchestratorBase:
     def __init__(self):
+        # Name of each LLM used by the orchestrator (see config.models) mapped
+        # to the largest context size any of its modules requests
         self.models = {}
         # self.planner = PlannerModule(args...)
 
+    def warm_up(self) -> Dict[str, float]:
+        """Run every start-up stage and return its duration in seconds."""
+        timings = {}
+        stages = [
+            ("models", self._load_models),
+            ("data", self._load_data),
+            ("inference", self._dummy_inference),
+        ]
+        for stage, step in stages:
+            start = time.perf_counter()
+            step()
+            timings[stage] = round(time.perf_counter() - start, 3)
+            logging.info(f"Warm-up stage {stage} finished in {timings[stage]}s")
+        return timings
+
+    def _load_models(self) -> None:
+        if not self.models:
+            return
+
+        import config as cfg
+        from modules import model_registry
+
+        model_registry.warm_up(
+            [(cfg.models[name], n_ctx) for name, n_ctx in self.models.items()]
+        )
+
+    def _load_data(self) -> None:
+        pass
+
+    def _dummy_inference(self) -> None:
+        if not self.models:
+            return
+
+        import config as cfg
+        from modules import model_registry
+
+        for name, n_ctx in self.models.items():
+            model = model_registry.get_model(cfg.models[name], n_ctx=n_ctx)
+            with model_registry.model_lock(model):
+                model.create_completion("Hello", max_tokens=1)
+
     def execute(self, handler: ModelHandler):
         pass
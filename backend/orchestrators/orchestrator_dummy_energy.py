@@ -1,6 +1,8 @@
 import time
 
+import config as cfg
 from model_handler.model_handler import ModelHandler
+from modules.artifact_registry import ArtifactNotAvailable, TrainingFailed
 from modules.module_energy import EnergyModule
 from orchestrators.orchestrator_base import OrchestratorBase
 
@@ -11,18 +13,27 @@ class Orchestrator(OrchestratorBase):
 
         self.energy_module = EnergyModule()
 
+    def _load_data(self) -> None:
+        self.energy_module.preload()
+
     def execute(self, handler: ModelHandler):
         handler.update_status_message("started")
         time.sleep(2)
         horizon = 9 # Number of days
         handler.update_status_message(f"run energy module, horizon {horizon}")
         handler.update_progress_bar(0)
-        energy_predictions_with_explanation, plot = self.energy_module.execute(
-            horizon=horizon
-        )
-        handler.send_text(energy_predictions_with_explanation)
-        asset_tag = handler.send_asset("html", plot)
-        handler.send_text(asset_tag)
+        try:
+            energy_predictions_with_explanation, plot = self.energy_module.execute(
+                horizon=horizon
+            )
+        except TrainingFailed:
+            handler.send_text("Training the energy model failed, please try again later.")
+        except ArtifactNotAvailable:
+            handler.send_text("The energy model is not yet available, please try again later.")
+        else:
+            handler.send_text(energy_predictions_with_explanation)
+            asset_tag = handler.send_asset(cfg.plot_asset_type, plot)
+            handler.send_text(asset_tag)
 
         time.sleep(1)
         handler.finalize()
@@ -1,7 +1,11 @@
 # Base packages
 import logging
+from typing import List
 
 # Own packages
+import config as cfg
+from custom_types.orchestration_types import ModuleResults
+from orchestrators.dag_scheduler import DagScheduler
 from orchestrators.orchestrator_base import OrchestratorBase
 from model_handler.model_handler import ModelHandler
 from modules.module_planner import PlannerModule
@@ -10,6 +14,7 @@ from modules.module_energy import EnergyModule
 from modules.module_steel import SteelModule
 from modules.module_deny import DenyModule
 from modules.module_explainer import ExplainerModule
+from modules.artifact_registry import ArtifactNotAvailable, TrainingFailed
 
 # 3rd party packages
 import numpy as np
@@ -18,6 +23,21 @@ import numpy as np
 class Orchestrator(OrchestratorBase):
     def __init__(self):
         super().__init__()
+        # The explainer needs the largest context; planner, time and deny
+        # modules share its instance through the model registry
+        self.models = {"mistral-7B-instruct": 8192}
+
+    def _load_data(self) -> None:
+        EnergyModule().preload()
+        SteelModule(model_name="Steel").preload()
+
+    def _dummy_inference(self) -> None:
+        super()._dummy_inference()
+        # Evaluating the prompt preambles doubles as the dummy inference and
+        # leaves their states in the prompt cache for the first requests
+        PlannerModule(modelName="mistral-7B-instruct").prime()
+        TimeModule(modelName="mistral-7B-instruct").prime()
+        DenyModule(modelName="mistral-7B-instruct").prime()
 
     def execute(self, handler: ModelHandler) -> None:
         handler.update_status_message("Thinking...")
@@ -31,7 +51,7 @@ class Orchestrator(OrchestratorBase):
         # Orchestration plan goal: "deny" or "explain"
         goal = orchestrationPlan["orchestrationPlan"]["goal"]
 
-        # Deny request (politely)
+        # Deny request (politely), the combined planner also denies for "no_time"
         if goal == "deny":
             handler.update_progress_bar(50)
             DenyModule(
@@ -46,15 +66,82 @@ class Orchestrator(OrchestratorBase):
             return
 
         handler.update_status_message("Preparing forecasts...")
-        models = orchestrationPlan["orchestrationPlan"]["relevantModels"]
+        plan = orchestrationPlan["orchestrationPlan"]
+        models = plan["relevantModels"]
         logging.info(f"Explaining model output using models: {models}")
 
-        # Get timeline for predictions
-        tm_response = TimeModule(
-            modelName="mistral-7B-instruct"
-        ).execute(handler=handler)
+        scheduler = DagScheduler(handler)
+
+        # Get timeline for predictions, unless the planner already extracted it
+        if "days" in plan:
+            scheduler.add("time", lambda: {"days": plan["days"]})
+            speculate = None
+        else:
+            scheduler.add(
+                "time",
+                lambda: TimeModule(
+                    modelName="mistral-7B-instruct"
+                ).execute(handler=handler),
+                label="Extracting forecast horizon...",
+            )
+            # Forecasts start with the most likely horizon while the time
+            # module is still generating
+            speculate = cfg.speculative_forecast_days
+
+        # Convert days to months and round days/months, a horizon of zero
+        # days is answered like a missing one
+        scheduler.add(
+            "days",
+            lambda time: None if time["days"] is None or time["days"] <= 0 else int(np.ceil(time["days"])),
+            deps=["time"],
+        )
+        scheduler.add(
+            "months",
+            lambda days: None if days is None else int(np.ceil(days/30)),
+            deps=["days"],
+        )
 
-        if tm_response["days"] is None:
+        # Call-out to energy module relevant modules
+        if "ENERGY PRICE FORECAST MODEL" in models:
+            scheduler.add(
+                "energy",
+                self._run_energy,
+                deps=["days"],
+                label="Running energy forecast...",
+                when=lambda days: days is not None,
+                speculate=None if speculate is None else {"days": speculate},
+            )
+        if "STEEL PRICE FORECAST MODEL" in models:
+            countries = plan.get("countries") or ["Germany"]
+            scheduler.add(
+                "steel",
+                lambda months: self._run_steel(months, countries),
+                deps=["months"],
+                label="Running steel forecast...",
+                when=lambda months: months is not None,
+                speculate=None if speculate is None else {
+                    "months": int(np.ceil(speculate/30))},
+            )
+        forecasts = [name for name in ["energy", "steel"] if scheduler.has(name)]
+
+        def explain(days, **results):
+            # Generate model summary
+            handler.update_progress_bar(50)
+            moduleResults = {
+                "energy": {"text": ""},
+                "steel": {"text": ""}
+            }
+            moduleResults.update(
+                {name: result for name, result in results.items() if result})
+            ExplainerModule(
+                modelName="mistral-7B-instruct"
+            ).execute(
+                handler=handler,
+                moduleResults=moduleResults,
+                days=days
+            )
+
+        def deny_no_time(days):
             handler.update_progress_bar(50)
             DenyModule(
                 modelName="mistral-7B-instruct"
@@ -62,53 +149,77 @@ class Orchestrator(OrchestratorBase):
                 handler=handler,
                 reason="no_time"
             )
-            handler.update_progress_bar(100)
-            handler.update_status_message("Done!")
-            handler.finalize()
-            return
-        # Convert days to months and round days/months
-        days = tm_response["days"]
-        months = int(np.ceil(days/30))
-        days = int(np.ceil(days))
 
-        # Call-out to energy module relevant modules
-        moduleResults = {
-            "energy": {"text": ""},
-            "steel": {"text": ""}
-        }
-        if "ENERGY PRICE FORECAST MODEL" in models:
-            handler.update_status_message(
-                f"Running energy forecast for {days} days...")
-            logging.info(f"Running energy forecast for {days} days")
-            energyPredictions, energyPlot = EnergyModule().execute(horizon=days)
-
-            moduleResults["energy"] = {
-                "text": energyPredictions,
-                "plot": energyPlot
-            }
-
-        if "STEEL PRICE FORECAST MODEL" in models:
-            handler.update_status_message(
-                f"Running steel forecast for {months} months...")
-            logging.info(f"Running steel forecast for {months} months")
-            steelPredictions, steelPlot = SteelModule(
-                model_name="Steel"
-            ).execute(horizon=months)
-
-            moduleResults["steel"] = {
-                "text": steelPredictions,
-                "plot": steelPlot
-            }
-
-        # Generate model summary
-        handler.update_progress_bar(50)
-        ExplainerModule(
-            modelName="mistral-7B-instruct"
-        ).execute(
-            handler=handler,
-            moduleResults=moduleResults,
-            days=days
+        scheduler.add(
+            "explain",
+            explain,
+            deps=["days"] + forecasts,
+            when=lambda days, **_: days is not None,
+        )
+        scheduler.add(
+            "deny",
+            deny_no_time,
+            deps=["days"],
+            when=lambda days: days is None,
         )
+        scheduler.run()
+        logging.info(f"Step timings: {scheduler.timings}")
+
         handler.update_progress_bar(100)
         handler.update_status_message("Done!")
         handler.finalize()
+
+    def _run_energy(self, days: int) -> ModuleResults:
+        logging.info(f"Running energy forecast for {days} days")
+        try:
+            energyPredictions, energyPlot = EnergyModule().execute(horizon=days)
+        except TrainingFailed as e:
+            logging.warning(e)
+            return self._training_failed("energy price")
+        except ArtifactNotAvailable as e:
+            logging.info(e)
+            return self._not_available("energy price")
+        return {
+            "text": energyPredictions,
+            "plot": energyPlot
+        }
+
+    def _run_steel(self, months: int, countries: List[str]) -> ModuleResults:
+        logging.info(f"Running steel forecast for {months} months in {countries}")
+        texts = []
+        plots = []
+        for country in countries:
+            # All countries are served from the same data frame
+            try:
+                steelPredictions, steelPlot = SteelModule(
+                    model_name="Steel", country=country
+                ).execute(horizon=months)
+            except TrainingFailed as e:
+                logging.warning(e)
+                texts.append(self._training_failed(f"{country} steel price")["text"])
+                continue
+            except ArtifactNotAvailable as e:
+                logging.info(e)
+                texts.append(self._not_available(f"{country} steel price")["text"])
+                continue
+            texts.append(f"{country}:\n{steelPredictions}" if len(countries) > 1 else steelPredictions)
+            plots.append(steelPlot)
+        result = {"text": "\n".join(texts)}
+        # The answer has room for one plot, the first country's
+        if plots:
+            result["plot"] = plots[0]
+        return result
+
+    def _not_available(self, forecast: str) -> ModuleResults:
+        # Training was requested, answer without the forecast meanwhile
+        return {
+            "text": f"The {forecast} forecast for this horizon is not yet "
+            "available, its model is still being trained. Please try again later."
+        }
+
+    def _training_failed(self, forecast: str) -> ModuleResults:
+        # Training is retried later, once the registry's back-off passed
+        return {
+            "text": f"The {forecast} forecast for this horizon is not "
+            "available, training its model failed. Please try again later."
+        }
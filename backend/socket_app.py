@@ -1,8 +1,12 @@
+import logging
 import traceback
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import socketio
-from model_handler.socket_model_handler import SocketModelHandler
+import config as cfg
+import metrics
+from model_handler.socket_model_handler import SocketModelHandler, acknowledge
 
 module_name = sys.argv[1] if len(
     sys.argv) > 1 else "orchestrators.orchestrator_dummy"
@@ -13,13 +17,20 @@ module_import = __import__(module_name, fromlist=["Orchestrator"])
 print("Loading orchestrator")
 orchestrator = module_import.Orchestrator()
 
+print("Warming up orchestrator")
+warm_up_timings = orchestrator.warm_up()
+print(f"Orchestrator ready, warm-up timings {warm_up_timings}")
+
 print("Starting app in socket mode")
 sio = socketio.Client()
 
 
-@sio.event
-def execute(data):
-    print(f"execution requested {data}")
+# Executions run on the pool, at most cfg.execution_workers at once, the BFF
+# sends no more than that
+pool = ThreadPoolExecutor(max_workers=cfg.execution_workers)
+
+
+def run_execution(data):
     handler = SocketModelHandler(data, sio)
     try:
         orchestrator.execute(handler)
@@ -31,11 +42,24 @@ def execute(data):
     finally:
         if not handler.is_finalized:
             handler.finalize()
+        logging.info(f"Metrics {metrics.snapshot()}")
+
+
+@sio.event
+def execute(data):
+    print(f"execution requested {data}")
+    pool.submit(run_execution, data)
+
+
+@sio.event
+def finalized(execution_id):
+    acknowledge(execution_id)
 
 
 @sio.event
 def connect():
     print("Connected to executor service")
+    sio.emit("ready", {"warmUp": warm_up_timings, "concurrency": cfg.execution_workers})
 
 
 @sio.on("*")
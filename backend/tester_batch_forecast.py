@@ -0,0 +1,37 @@
+# Checks batch forecasts: results come back in request order, and a horizon
+# beyond the longest the energy model serves is forecast up to that one and
+# flagged as clamped instead of silently coming back short.
+import tempfile
+
+import config as cfg
+import training_worker
+from modules import batch_forecast, train_energy_direct
+
+cfg.artifact_registry_dir = tempfile.mkdtemp()
+cfg.hyperparameter_search_dir = tempfile.mkdtemp()
+cfg.energy_hyperparameter_search = False
+cfg.energy_training_samples = 20_000
+
+MAX_HORIZON = 30
+train_energy_direct.train(max_horizon=MAX_HORIZON)
+training_worker.run("steel", 3, "Germany")
+
+requests = [("energy", 7), ("steel:Germany", 3), ("energy", 90), ("steel:Germany", 6)]
+results = batch_forecast.forecast(requests)
+for result in results:
+    print({key: value for key, value in result.items() if key not in ["dates", "values"]})
+
+assert [(result["series"], result["horizon"]) for result in results] == requests, results
+week, steel, quarter, missing = results
+
+assert week["status"] == "ok" and not week["clamped"], week
+assert week["effective_horizon"] == 7 and len(week["values"]) == 7, week
+
+assert quarter["status"] == "ok" and quarter["clamped"], quarter
+assert quarter["effective_horizon"] == MAX_HORIZON and len(quarter["values"]) == MAX_HORIZON, quarter
+# The shorter horizon is a prefix of the same prediction
+assert quarter["values"][:7] == week["values"], "The energy horizons come from different predictions"
+
+assert steel["status"] == "ok" and not steel["clamped"] and len(steel["values"]) == 3, steel
+assert missing["status"] == "not_available" and missing["effective_horizon"] is None, missing
+print("Batch forecast flags the clamped horizon")
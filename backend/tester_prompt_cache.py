@@ -0,0 +1,38 @@
+import time
+
+import config as cfg
+from modules import model_registry, prompt_cache
+from modules.module_time import TIME_PROMPT
+
+# The time prompt as the modules send it, as the first turn of a chat and
+# as a follow-up with the earlier turns in front of it. Only the first turn
+# loads the primed state.
+model = model_registry.get_model(cfg.models["mistral-7B-instruct"], n_ctx=2048, n_gpu_layers=128)
+cache = prompt_cache.for_model(model)
+cache.prime("time", TIME_PROMPT)
+
+first = "What will the price of energy be 2 weeks from now?"
+followUp = "And a month from now?"
+# The multi turn chat goes first, right after priming the preamble is still
+# evaluated and the single turn would not need the primed state
+chats = {
+    "multi turn": [
+        {"role": "user", "content": first},
+        {"role": "assistant", "content": "The energy price will be around 90 EUR/MWh."},
+        {"role": "user", "content": TIME_PROMPT.format(userPrompt=followUp)},
+    ],
+    "single turn": [{"role": "user", "content": TIME_PROMPT.format(userPrompt=first)}],
+}
+
+for name, messages in chats.items():
+    restored = []
+    start = time.monotonic()
+    model_registry.chat_completion(
+        model,
+        messages,
+        before=lambda: restored.append(cache.restore("time", messages)),
+        max_tokens=1,
+        temperature=0,
+    )
+    print(f"{name}: primed state loaded {restored[0]}, first token after {time.monotonic() - start:.2f}s")
+    assert restored[0] == (name == "single turn")
@@ -0,0 +1,41 @@
+# Checks that steel requests never train: the first request without a model
+# only queues a training request, and once the worker published the model a
+# second request is served from the registry without any training.
+import tempfile
+
+import config as cfg
+import training_worker
+from modules import artifact_registry, module_steel
+from modules.module_steel import SteelModule
+
+cfg.artifact_registry_dir = tempfile.mkdtemp()
+
+trainings = []
+train = module_steel.train
+
+
+def counting_train(*args, **kwargs):
+    trainings.append(kwargs.get("horizon"))
+    return train(*args, **kwargs)
+
+
+module_steel.train = counting_train
+
+try:
+    SteelModule(model_name="steel").execute(horizon=6)
+    raise AssertionError("Served a steel forecast without a trained model")
+except artifact_registry.ArtifactNotAvailable:
+    pass
+assert trainings == [], f"The request trained models for horizons {trainings}"
+requests = [request for _, request in artifact_registry.pending_requests()]
+assert requests and requests[0]["match"] == {"horizon": 6, "series": "Germany"}, requests
+
+# The worker trains the requested horizon
+training_worker.run("steel", 6, "Germany")
+assert trainings == [6], trainings
+assert artifact_registry.latest("steel", horizon=6, series="Germany")["horizons"] == [6]
+
+steelPredictions, steelPlot = SteelModule(model_name="steel").execute(horizon=6)
+assert trainings == [6], f"The second request trained again: {trainings}"
+print(steelPredictions)
+print("Second request served without training")
@@ -0,0 +1,79 @@
+"""Train the forecast models off the request path and publish them to the
+artifact registry. Run from the same directory as the backend:
+
+    python backend/training_worker.py                # serve training requests
+    python backend/training_worker.py energy         # train the energy model
+    python backend/training_worker.py steel 3 6      # train steel models of all countries for 3 and 6 months
+    python backend/training_worker.py steel:Italy 3  # train the Italy steel model
+
+Without arguments the worker waits for the requests left in the registry
+queue by modules that had no model to serve, trains them one at a time and
+removes them when done. Failures are recorded in the registry, which backs
+off before queueing the request again.
+"""
+import logging
+import sys
+import time
+import traceback
+from typing import List, Optional
+
+import config as cfg
+from modules import artifact_registry
+from modules.batch_forecast import parse_series
+
+
+def train_energy(horizon: Optional[int] = None, series: Optional[str] = None) -> List[dict]:
+    # The direct model serves every horizon up to cfg.energy_max_horizon
+    from modules.train_energy_direct import train
+
+    return [train()]
+
+
+def train_steel(horizon: Optional[int] = None, series: Optional[str] = None) -> List[dict]:
+    # Without a series the models of all countries are trained in one pass
+    from modules.module_steel import COUNTRIES, train_countries
+
+    return train_countries(horizon or 3, COUNTRIES if series is None else [series])
+
+
+TRAINERS = {
+    "energy": train_energy,
+    "steel": train_steel,
+}
+
+
+def run(name: str, horizon: Optional[int] = None, series: Optional[str] = None) -> None:
+    start = time.perf_counter()
+    logging.info(f"Training {name} model for horizon {horizon}, series {series}")
+    entries = TRAINERS[name](horizon, series)
+    for entry in entries:
+        logging.info(
+            f"Trained {name} version {entry['version']} in {time.perf_counter() - start:.1f}s, "
+            f"metrics {entry['metrics']}"
+        )
+
+
+def serve() -> None:
+    logging.info(f"Waiting for training requests in {cfg.artifact_registry_dir}")
+    while True:
+        for requestPath, request in artifact_registry.pending_requests():
+            try:
+                run(request["name"], **request["match"])
+            except Exception as e:
+                logging.error(f"Training request {request} failed")
+                traceback.print_exc()
+                artifact_registry.complete_request(requestPath, request, error=f"{type(e).__name__}: {e}")
+            else:
+                artifact_registry.complete_request(requestPath, request)
+        time.sleep(cfg.training_poll_seconds)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1:
+        name, series = parse_series(sys.argv[1])
+        horizons = [int(horizon) for horizon in sys.argv[2:]] or [None]
+        for horizon in horizons:
+            run(name, horizon, series)
+    else:
+        serve()
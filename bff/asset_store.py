@@ -0,0 +1,131 @@
+import hashlib
+import os
+import re
+import time
+import uuid
+
+from eventlet import tpool
+
+# Assets of the executions, served to the users from /outfiles.
+#
+# Files are named after the sha256 of their content, so identical plots share
+# one file and a file never changes: it is served as immutable. The hash is
+# computed here while storing, the id sent by the backend only names the
+# asset in its text. Hashing and disk work run in eventlet's pool of OS
+# threads, the handler sending an asset waits for them without blocking the
+# other greenthreads. The store keeps an index of its files, loaded from the
+# directory on first use, and evicts the least recently sent files once the
+# store exceeds MAX_MB or a file was not sent for MAX_AGE_DAYS.
+
+OUTFILES_DIR = ".temp/outfiles"
+MAX_MB = 512
+MAX_AGE_DAYS = 7
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+ASSET_TYPE = re.compile(r"^[a-z0-9+]+$")
+
+# Filename -> (size in bytes, last sent)
+_index = None
+
+
+def _write(path, asset):
+    data = asset.encode("utf-8") if isinstance(asset, str) else asset
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Readers never see a partially written file
+    tempPath = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tempPath, "wb") as f:
+        f.write(data)
+    os.replace(tempPath, path)
+    return len(data)
+
+
+def _store(type, asset):
+    data = asset.encode("utf-8") if isinstance(asset, str) else asset
+    filename = f"{hashlib.sha256(data).hexdigest()}.{type}"
+    path = os.path.join(OUTFILES_DIR, filename)
+    try:
+        # Same content, only its age changes
+        os.utime(path)
+        return filename, os.path.getsize(path)
+    except FileNotFoundError:
+        return filename, _write(path, data)
+
+
+def _scan():
+    index = {}
+    if not os.path.isdir(OUTFILES_DIR):
+        return index
+    for entry in os.scandir(OUTFILES_DIR):
+        if entry.name.endswith(".tmp"):
+            os.remove(entry.path)
+        elif entry.is_file():
+            stat = entry.stat()
+            index[entry.name] = (stat.st_size, stat.st_mtime)
+    return index
+
+
+def _remove(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _load():
+    global _index
+    if _index is None:
+        _index = tpool.execute(_scan)
+    return _index
+
+
+def save(type, asset):
+    """Store the asset unless a file with its content exists, returns its
+    filename under /outfiles."""
+    if not ASSET_TYPE.match(type):
+        raise ValueError(f"Invalid asset type {type}")
+    index = _load()
+    filename, size = tpool.execute(_store, type, asset)
+    now = time.time()
+    index[filename] = (size, now)
+    _evict(index, now, keep=filename)
+    return filename
+
+
+def _evict(index, now, keep):
+    # The asset just sent stays, the user is about to fetch it
+    evicted = [
+        filename for filename, (_, sent) in index.items()
+        if now - sent > MAX_AGE_DAYS * 86400 and filename != keep
+    ]
+    for filename in evicted:
+        del index[filename]
+    size = sum(fileSize for fileSize, _ in index.values())
+    for filename, (fileSize, _) in sorted(index.items(), key=lambda item: item[1][1]):
+        if size <= MAX_MB * 2**20:
+            break
+        if filename == keep:
+            continue
+        del index[filename]
+        size -= fileSize
+        evicted.append(filename)
+    if evicted:
+        print(f"Evicting assets {evicted}")
+        tpool.execute(_remove, [os.path.join(OUTFILES_DIR, filename) for filename in evicted])
+
+
+def cache_headers(app, prefix="/outfiles/"):
+    """WSGI middleware adding the Cache-Control header to the assets."""
+
+    def wrapped(environ, start_response):
+        if not environ.get("PATH_INFO", "").startswith(prefix):
+            return app(environ, start_response)
+
+        def start(status, headers, *args):
+            if status.startswith("200"):
+                headers = [*headers, ("Cache-Control", CACHE_CONTROL)]
+            return start_response(status, headers, *args)
+
+        return app(environ, start)
+
+    return wrapped
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import deque
+
+# Hands queued executions to free executors.
+#
+# There is no polling loop: tasks are matched with executors with a free slot
+# whenever something changes, when a task is submitted, when an executor
+# becomes ready and the moment an executor finalizes an execution. Tasks wait
+# in a FIFO queue. Each executor runs up to its concurrency limit, advertised
+# by the backend in its ready event, and a task goes to the available
+# executor running the fewest executions, the longest available first on
+# ties.
+#
+# Executor states:
+#   starting  connected, still warming up, takes no tasks
+#   idle      running no executions
+#   busy      running executions, takes more up to its concurrency limit
+#   draining  finishes its current executions but takes no new ones
+#   stopped   disconnected or drained
+#
+# State changes happen under one lock and never emit while holding it, socket
+# events of the assigned tasks are sent after it is released.
+
+STARTING = "starting"
+IDLE = "idle"
+BUSY = "busy"
+DRAINING = "draining"
+STOPPED = "stopped"
+
+
+class Dispatcher:
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__tasks = deque()
+        # Executors with a free slot
+        self.__available = []
+        # Executor -> executions it is running
+        self.__running = {}
+
+    def submit(self, task):
+        """Queue a task, it starts right away if an executor has a free
+        slot."""
+        task["queued"] = time.monotonic()
+        with self.__lock:
+            self.__tasks.append(task)
+            assigned = self.__assign()
+        self.__start(assigned)
+
+    def ready(self, executor):
+        """The executor finished warming up and takes tasks."""
+        with self.__lock:
+            if executor.state != STARTING:
+                return
+            executor.state = IDLE
+            self.__running[executor] = 0
+            self.__available.append(executor)
+            assigned = self.__assign()
+        self.__start(assigned)
+
+    def finished(self, executor):
+        """The executor finalized an execution, its slot gets the next queued
+        task right away."""
+        with self.__lock:
+            if executor not in self.__running:
+                return
+            self.__running[executor] -= 1
+            if executor.state == DRAINING:
+                if not self.__running[executor]:
+                    self.__stop(executor)
+                return
+            executor.state = BUSY if self.__running[executor] else IDLE
+            if executor not in self.__available:
+                self.__available.append(executor)
+            assigned = self.__assign()
+        self.__start(assigned)
+
+    def drain(self, executor):
+        """Stop giving the executor tasks, it finishes the current ones."""
+        with self.__lock:
+            if self.__running.get(executor):
+                executor.state = DRAINING
+                self.__remove_available(executor)
+            else:
+                self.__stop(executor)
+
+    def remove(self, executor):
+        """The executor disconnected."""
+        with self.__lock:
+            self.__stop(executor)
+
+    def stats(self):
+        """Number of queued tasks, executors per state and running
+        executions."""
+        with self.__lock:
+            states = {}
+            for executor in self.__running:
+                states[executor.state] = states.get(executor.state, 0) + 1
+            return {
+                "queued": len(self.__tasks),
+                "executors": states,
+                "running": sum(self.__running.values()),
+            }
+
+    def __stop(self, executor):
+        self.__remove_available(executor)
+        self.__running.pop(executor, None)
+        executor.state = STOPPED
+
+    def __remove_available(self, executor):
+        if executor in self.__available:
+            self.__available.remove(executor)
+
+    def __assign(self):
+        # Only called with the lock held
+        assigned = []
+        while self.__tasks and self.__available:
+            executor = min(self.__available, key=lambda executor: self.__running[executor])
+            task = self.__tasks.popleft()
+            self.__running[executor] += 1
+            executor.state = BUSY
+            if self.__running[executor] >= executor.concurrency:
+                self.__available.remove(executor)
+            executor.assign(task)
+            assigned.append((executor, task["execution"]["id"]))
+        return assigned
+
+    def __start(self, assigned):
+        for executor, execution_id in assigned:
+            executor.start(execution_id)
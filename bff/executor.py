@@ -1,96 +1,187 @@
-import eventlet
-import os
-
-# standard Python
+import time
 
+import asset_store
+from dispatcher import STARTING
 
-class Executor:
-    def __init__(self, sio, taskQueue):
-        self.executor_sio = sio
-        self.taskQueue = taskQueue
-        self.execution = None
-        self.user_sio = None
-        self.__stopped = False
-
-    def run(self):
-        while True:
-            if self.__stopped:
-                print(f"Executor({self.executor_sio.sid}) Stopped")
-                break
-
-            task = None
-            try:
-                task = self.taskQueue.get(timeout=1)
-            except:
-                continue
+# standard Python
 
-            print(f"Executor({self.executor_sio.sid}) Got task {task}")
+# Asset types sent to the user inline instead of being saved to outfiles
+INLINE_ASSET_TYPES = ["chart+json"]
 
-            self.execution = task["execution"]
-            self.user_sio = task["user_sio"]
 
-            self.execution["status"] = "sceduled"
-            self.executor_sio.emit("execute", self.execution)
-            self.user_sio.emit("execution_updated", self.execution)
+def fail(task):
+    """Tell the user the execution failed."""
+    execution = task["execution"]
+    user_sio = task["user_sio"]
+    try:
+        execution["status"] = "failed"
+        execution["progress"] = None
+        user_sio.emit("execution_updated", execution)
+        user_sio.emit(
+            "text_received", {"id": execution["id"], "text": "<asset:error:>"}
+        )
+        user_sio.emit("finalize", execution)
+    except:
+        print("Unable to notify user about failed execution")
+        pass
 
-            while True:
-                print(
-                    f"Executor({self.executor_sio.sid}) Waiting for execution to finish"
-                )
-                eventlet.sleep(3)
-                if not self.execution or self.__stopped:
-                    break
 
-    def start(self):
-        eventlet.spawn(self.run)
+class Executor:
+    def __init__(self, sio, dispatcher):
+        self.executor_sio = sio
+        self.dispatcher = dispatcher
+        # Execution id -> {"execution", "user_sio", "queued"} of the
+        # executions running on the backend, with their event ordering state
+        self.tasks = {}
+        # Executions the backend runs at once, from its ready event
+        self.concurrency = 1
+        # Set by the dispatcher, executors only take tasks after the backend
+        # reports it finished warming up
+        self.state = STARTING
+
+    def assign(self, task):
+        """Called by the dispatcher, start() sends the execution."""
+        task["execution"]["status"] = "sceduled"
+        # Number of the next event to handle, events that arrived ahead of
+        # it, and the number of the last event once finalize arrived
+        task["next"] = 1
+        task["pending"] = {}
+        task["last"] = None
+        self.tasks[task["execution"]["id"]] = task
+
+    def start(self, execution_id):
+        task = self.tasks.get(execution_id)
+        if not task:
+            # Disconnected in the meantime, the user was notified
+            return
+        print(
+            f"Executor({self.executor_sio.sid}) Got task {task['execution']}, "
+            f"queued for {time.monotonic() - task['queued']:.3f}s"
+        )
+        self.executor_sio.emit("execute", task["execution"])
+        task["user_sio"].emit("execution_updated", task["execution"])
 
     def recieve(self, event, *data):
         print(f"Executor({self.executor_sio.sid}) Event {event} recieved {data}")
+        if event == "ready":
+            print(f"Executor({self.executor_sio.sid}) Ready {data[0] if data else ''}")
+            if data and data[0]:
+                self.concurrency = max(1, int(data[0].get("concurrency", 1)))
+            self.dispatcher.ready(self)
+            return
+        if event == "drain":
+            print(f"Executor({self.executor_sio.sid}) Draining")
+            self.dispatcher.drain(self)
+            return
+
+        # Events of an execution start with its id and number, they are
+        # handled in the order of their numbers. Finalize carries the number
+        # of the last event, the execution is released once all are handled.
+        # The backend abandons it when an event never arrived.
+        if not data or data[0] not in self.tasks:
+            print(f"Executor({self.executor_sio.sid}) No running execution for event {event} {data}")
+            return
+        executionId, *data = data
+        task = self.tasks[executionId]
+        if event == "abandon":
+            print(f"Executor({self.executor_sio.sid}) Execution {executionId} abandoned, missing events from {task['next']}")
+            del self.tasks[executionId]
+            fail(task)
+            self.dispatcher.finished(self)
+            return
         if event == "finalize":
-            print(f"Executor({self.executor_sio.sid}) Finalizing execution")
-            self.execution["status"] = "completed"
-            self.execution["progress"] = None
-            self.user_sio.emit("execution_updated", self.execution)
-            self.user_sio.emit("finalize", self.execution)
-            self.user_sio = None
-            self.execution = None
-        elif event == "send_text":
-            self.user_sio.emit(
-                "text_received", {"id": self.execution["id"], "text": data[0]}
+            task["last"] = data[0]
+        else:
+            seq, *data = data
+            if seq < task["next"] or seq in task["pending"]:
+                print(f"Executor({self.executor_sio.sid}) Dropping duplicate event {seq} of {executionId}")
+                return
+            task["pending"][seq] = (event, data)
+            while task["next"] in task["pending"]:
+                self.__handle(task, *task["pending"].pop(task["next"]))
+                task["next"] += 1
+                # Saving an asset yields, the executor may have stopped in
+                # the meantime and the user was notified
+                if self.tasks.get(executionId) is not task:
+                    return
+        if task["last"] is not None and task["next"] > task["last"]:
+            self.__finalize(task)
+
+    def __finalize(self, task):
+        executionId = task["execution"]["id"]
+        if self.tasks.pop(executionId, None) is not task:
+            return
+        print(f"Executor({self.executor_sio.sid}) Finalizing execution {executionId}")
+        execution = task["execution"]
+        execution["status"] = "completed"
+        execution["progress"] = None
+        task["user_sio"].emit("execution_updated", execution)
+        task["user_sio"].emit("finalize", execution)
+        # The backend waits for this before finishing the execution
+        self.executor_sio.emit("finalized", executionId)
+        self.dispatcher.finished(self)
+
+    def __handle(self, task, event, data):
+        execution = task["execution"]
+        executionId = execution["id"]
+        user_sio = task["user_sio"]
+
+        if event == "send_text":
+            user_sio.emit(
+                "text_received", {"id": executionId, "text": data[0]}
             )
         elif event == "send_debug_thought":
             print(f"Executor({self.executor_sio.sid}) Recieved debug thought {data[0]}")
-            self.user_sio.emit(
+            user_sio.emit(
                 "debug_thought_received",
-                {"id": self.execution["id"], "text": data[0]},
+                {"id": executionId, "text": data[0]},
             )
         elif event == "send_asset":
             type = data[0]["type"]
             asset = data[0]["asset"]
             id = data[0]["id"]
 
-            # Saving the asset
-            filename = f".temp/outfiles/{id}.{type}"
-            os.makedirs(os.path.dirname(filename), exist_ok=True)
-            f = open(filename, "w")
-            f.write(asset)
-            f.close()
+            if type in INLINE_ASSET_TYPES:
+                # Small data-only assets go to the user with the event, the
+                # frontend keeps them until their asset tag arrives
+                print(f"Executor({self.executor_sio.sid}) Recieved inline asset {id}.{type}")
+                user_sio.emit(
+                    "asset_received",
+                    {"id": executionId, "type": type, "filename": f"{id}.{type}", "asset": asset},
+                )
+                return
+
+            # Saving the asset, the following events of the execution wait
+            # for it, the other greenthreads do not
+            try:
+                filename = asset_store.save(type, asset)
+            except (ValueError, OSError) as e:
+                print(f"Executor({self.executor_sio.sid}) Unable to save asset {id}.{type}: {e}")
+                user_sio.emit(
+                    "asset_received",
+                    {"id": executionId, "type": "error", "filename": f"{id}.{type}"},
+                )
+                return
 
-            print(f"Executor({self.executor_sio.sid}) Recieved asset {data[0]}, saved to {filename}")
-            self.user_sio.emit(
+            if filename != f"{id}.{type}":
+                print(f"Executor({self.executor_sio.sid}) Asset {id}.{type} does not match its content, stored as {filename}")
+            print(f"Executor({self.executor_sio.sid}) Recieved asset {filename}")
+            user_sio.emit(
                 "asset_received",
-                {"id": self.execution["id"], "type": type, "filename": f"{id}.{type}"},
+                {"id": executionId, "type": type, "filename": filename},
             )
 
         elif event == "update_status_message":
-            self.execution["status"] = data[0] if len(data) > 0 else None
-            self.user_sio.emit("execution_updated", self.execution)
+            execution["status"] = data[0] if len(data) > 0 else None
+            user_sio.emit("execution_updated", execution)
 
         elif event == "update_status_progress":
-            self.execution["progress"] = data[0] if len(data) > 0 else None
-            self.user_sio.emit("execution_updated", self.execution)
+            execution["progress"] = data[0] if len(data) > 0 else None
+            user_sio.emit("execution_updated", execution)
 
     def stop(self):
-        self.__stopped = True
-        self.execution = None
-        self.user_sio = None
+        """Stop taking tasks, returns the tasks that were running."""
+        self.dispatcher.remove(self)
+        tasks = list(self.tasks.values())
+        self.tasks = {}
+        return tasks
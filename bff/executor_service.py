@@ -1,8 +1,8 @@
-from queue import Queue
 from uuid import uuid4
 
 import socketio
-from executor import Executor
+from dispatcher import Dispatcher
+from executor import Executor, fail
 from socket_wrapper import SocketWrapper
 
 STATIC_FILES = {
@@ -10,7 +10,7 @@ STATIC_FILES = {
     "/static": "../frontend/build/static",
 }
 
-taskQueue = Queue()
+dispatcher = Dispatcher()
 
 executors = {}
 
@@ -20,9 +20,8 @@ def routes(sio):
     def connect(sid, environ):
         print(f"Connecting executor {sid}")
         executor_sio = SocketWrapper(sio, sid)
-        executor = Executor(executor_sio, taskQueue)
+        executor = Executor(executor_sio, dispatcher)
         executors[sid] = executor
-        executor.start()
 
     @sio.on("disconnect")
     def disconnect(sid):
@@ -34,24 +33,11 @@ def routes(sio):
             )
             return
 
-        execution = executor.execution
-        user_sio = executor.user_sio
-
-        executor.stop()
+        tasks = executor.stop()
         executors[sid] = None
 
-        if execution and user_sio:
-            try:
-                execution["status"] = "failed"
-                execution["progress"] = None
-                user_sio.emit("execution_updated", execution)
-                user_sio.emit(
-                    "text_received", {"id": execution["id"], "text": "<asset:error:>"}
-                )
-                user_sio.emit("finalize", execution)
-            except:
-                print("Unable to notify user about failed execution")
-                pass
+        for task in tasks:
+            fail(task)
 
     @sio.on("*")
     def handle_messages(event, sid, *args):
@@ -72,8 +58,8 @@ def request_execution(messages, user_sio):
         "status": "requested",
         "progress": -1,
     }
-    taskQueue.put({"execution": execution, "user_sio": user_sio})
     user_sio.emit("execution_created", execution)
+    dispatcher.submit({"execution": execution, "user_sio": user_sio})
 
 
 sio = socketio.Server()
@@ -0,0 +1,197 @@
+"""Load test of the executor dispatch with simulated executors and users.
+
+Executors are Executor objects whose backend socket runs each execution for a
+random duration on a timer thread, then sends its texts and finalize in a
+random order, running up to the given number of executions at once. Users
+check they get the texts in order before the finalize. Users
+submit their requests one after the other with a random pause in between.
+Reports the queue-to-start latency (request submitted until the execute
+event is sent to a backend) and the throughput. With --legacy the same load
+also runs through the previous executor loop, polling the task queue every
+second and checking for the finalize every 3 seconds. It finalizes as soon as
+finalize arrives, which relied on the backend waiting a second before sending
+it. Run from bff/:
+
+    python load_test.py [executors] [users] [requests per user] [concurrency] [--legacy]
+"""
+import contextlib
+import io
+import queue
+import random
+import sys
+import threading
+import time
+from uuid import uuid4
+
+from dispatcher import Dispatcher
+from executor import Executor
+
+args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+EXECUTORS = int(args[0]) if len(args) > 0 else 20
+USERS = int(args[1]) if len(args) > 1 else 100
+REQUESTS = int(args[2]) if len(args) > 2 else 5
+CONCURRENCY = int(args[3]) if len(args) > 3 else 1
+# Text events per execution
+TEXTS = 5
+# Seconds, uniform
+EXECUTION_TIME = (0.05, 0.3)
+THINK_TIME = (0.0, 0.2)
+WARM_UP_TIME = (0.0, 0.5)
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.submitted = {}
+        self.latencies = []
+        self.misordered = 0
+        self.done = threading.Semaphore(0)
+
+    def submit(self, execution_id):
+        with self.lock:
+            self.submitted[execution_id] = time.monotonic()
+
+    def started(self, execution_id):
+        with self.lock:
+            self.latencies.append(time.monotonic() - self.submitted[execution_id])
+
+
+class SimulatedBackend:
+    """Backend socket of one executor."""
+
+    def __init__(self, results):
+        self.sid = str(uuid4())[:8]
+        self.results = results
+        self.executor = None
+
+    def emit(self, event, data):
+        if event == "execute":
+            self.results.started(data["id"])
+            threading.Timer(random.uniform(*EXECUTION_TIME), self.finish, [data["id"]]).start()
+
+    def finish(self, execution_id):
+        # Events can reach the BFF out of order, it reorders them by number
+        events = [("send_text", execution_id, seq, str(seq)) for seq in range(1, TEXTS + 1)]
+        events.append(("finalize", execution_id, TEXTS))
+        random.shuffle(events)
+        for event in events:
+            self.executor.recieve(*event)
+
+
+class SimulatedUser:
+    """User socket, submits its next request once the previous finalized."""
+
+    def __init__(self, results, submit):
+        self.results = results
+        self.submit = submit
+        self.finalized = threading.Event()
+        self.texts = []
+
+    def emit(self, event, data):
+        if event == "text_received":
+            self.texts.append(data["text"])
+        if event == "finalize":
+            if self.texts != [str(seq) for seq in range(1, TEXTS + 1)]:
+                with self.results.lock:
+                    self.results.misordered += 1
+            self.texts = []
+            self.results.done.release()
+            self.finalized.set()
+
+    def run(self):
+        for _ in range(REQUESTS):
+            time.sleep(random.uniform(*THINK_TIME))
+            self.finalized.clear()
+            execution = {"id": str(uuid4()), "request": [], "status": "requested", "progress": -1}
+            self.results.submit(execution["id"])
+            self.submit({"execution": execution, "user_sio": self})
+            self.finalized.wait()
+
+
+class LegacyExecutor(Executor):
+    """The previous executor loop: one thread per executor polling the
+    shared queue, one execution at a time."""
+
+    def __init__(self, sio, taskQueue):
+        super().__init__(sio, None)
+        self.taskQueue = taskQueue
+
+    def run(self):
+        while True:
+            try:
+                task = self.taskQueue.get(timeout=1)
+            except queue.Empty:
+                continue
+            self.assign(task)
+            self.start(task["execution"]["id"])
+            while True:
+                time.sleep(3)
+                if not self.tasks:
+                    break
+
+    def recieve(self, event, *data):
+        if event == "ready":
+            threading.Thread(target=self.run, daemon=True).start()
+        elif event == "finalize":
+            task = self.tasks.pop(data[0])
+            task["user_sio"].emit("finalize", task["execution"])
+        else:
+            super().recieve(event, *data)
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def run(name, connect, submit):
+    random.seed(0)
+    results = Results()
+    for _ in range(EXECUTORS):
+        backend = SimulatedBackend(results)
+        backend.executor = connect(backend)
+        threading.Timer(random.uniform(*WARM_UP_TIME), backend.executor.recieve, ["ready", {"concurrency": CONCURRENCY}]).start()
+
+    start = time.monotonic()
+    users = [SimulatedUser(results, submit) for _ in range(USERS)]
+    for user in users:
+        threading.Thread(target=user.run, daemon=True).start()
+    for _ in range(USERS * REQUESTS):
+        results.done.acquire()
+    elapsed = time.monotonic() - start
+
+    latencies = results.latencies
+    return (
+        f"{name}: {len(latencies)} executions in {elapsed:.2f}s, "
+        f"throughput {len(latencies) / elapsed:.1f}/s, queue-to-start latency "
+        f"mean {sum(latencies) / len(latencies) * 1000:.1f}ms, "
+        f"p50 {_percentile(latencies, 50) * 1000:.1f}ms, "
+        f"p95 {_percentile(latencies, 95) * 1000:.1f}ms, "
+        f"max {max(latencies) * 1000:.1f}ms, {results.misordered} responses out of order"
+    )
+
+
+def main():
+    print(
+        f"{EXECUTORS} executors running {CONCURRENCY} at once, {USERS} users with {REQUESTS} requests each, "
+        f"executions {EXECUTION_TIME[0]}-{EXECUTION_TIME[1]}s"
+    )
+    # The executors log every event
+    dispatcher = Dispatcher()
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = run("dispatcher", lambda backend: Executor(backend, dispatcher), dispatcher.submit)
+    print(summary)
+
+    if "--legacy" in sys.argv:
+        taskQueue = queue.Queue()
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = run(
+                "legacy polling",
+                lambda backend: LegacyExecutor(backend, taskQueue),
+                lambda task: taskQueue.put({**task, "queued": time.monotonic()}),
+            )
+        print(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import asset_store
 import socketio
 from executor_service import request_execution
 from socket_wrapper import SocketWrapper
@@ -10,7 +11,7 @@ STATIC_FILES = {
     "/icon.ico": "./frontend/dist/icon.ico",
     "/manifest.json": "./frontend/dist/manifest.json",
     "/logo.png": "./frontend/dist/logo.png",
-    "/outfiles": ".temp/outfiles",
+    "/outfiles": asset_store.OUTFILES_DIR,
 }
 
 
@@ -29,6 +30,6 @@ def routes(sio):
 
 
 sio = socketio.Server(cors_allowed_origins="*", async_mode="eventlet")
-app = socketio.WSGIApp(sio, static_files=STATIC_FILES)
+app = asset_store.cache_headers(socketio.WSGIApp(sio, static_files=STATIC_FILES))
 
 routes(sio)
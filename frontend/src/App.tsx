@@ -4,9 +4,9 @@ import DemoDiscussions from "./components/DemoDiscussions";
 import InProgressContainer from "./components/InProgressContainer";
 import { MessageContainer } from "./components/MessageContainer";
 import { WrapperContainer } from "./components/WrapperContainer";
-import { STATIC_PATH } from "./constants";
+import { CHART_ASSET_TYPE, STATIC_PATH } from "./constants";
 import { useSocket, useSocketEvent } from "./hooks/useSocket";
-import { Execution, Request, TextReceivedEvent } from "./types";
+import { Asset, ChartSpec, Execution, Request, TextReceivedEvent } from "./types";
 import { scrollToBottom } from "./utils";
 
 function App() {
@@ -19,6 +19,8 @@ function App() {
   const [decision, setDecision] = useState<string[]>([]);
   const [generating, setGenerating] = useState<boolean>(false);
   const [assets, setAssets] = useState<MessageFragment[]>([]);
+  // Inline assets by filename, until their asset tag arrives in the text
+  const inlineAssets = useRef<Record<string, ChartSpec>>({});
 
   useEffect(
     () => scrollToBottom(messagesEnd),
@@ -35,6 +37,11 @@ function App() {
     setExecutionState(execution),
     console.log("execution updated", execution)
   });
+  useSocketEvent("asset_received", (asset: Asset) => {
+    if (asset.type === CHART_ASSET_TYPE && asset.asset) {
+      inlineAssets.current[asset.filename] = JSON.parse(asset.asset);
+    }
+  });
   useSocketEvent("text_received", (message: TextReceivedEvent) => {
     setAssets((assets) => {
       const regex = "^<asset:.*";
@@ -59,6 +66,13 @@ function App() {
             },
           ];
         }
+        if (tokens[1] === CHART_ASSET_TYPE) {
+          const chart = inlineAssets.current[tokens[2]];
+          return [
+            ...assets,
+            chart ? { type: "chart", chart } : { type: "error" },
+          ];
+        }
         if (tokens[1] === "error") {
           return [
             ...assets,
@@ -94,6 +108,7 @@ function App() {
     ]);
     setDecision([]);
     setAssets([]);
+    inlineAssets.current = {};
     setGenerating(false);
     console.log("finalize", executionState)
   });
@@ -1,7 +1,7 @@
-import { Sender } from "./types";
+import { ChartSpec, Sender } from "./types";
 
 export interface MessageBase {
-  type: "text" | "image" | "html" | "error";
+  type: "text" | "image" | "html" | "chart" | "error";
 }
 
 export interface TextFragment extends MessageBase {
@@ -19,11 +19,16 @@ export interface HtmlFragment extends MessageBase {
   src: string;
 }
 
+export interface ChartFragment extends MessageBase {
+  type: "chart";
+  chart: ChartSpec;
+}
+
 export interface ErrorFragment extends MessageBase {
   type: "error";
 }
 
-export type MessageFragment = TextFragment | ImageFragment | HtmlFragment | ErrorFragment;
+export type MessageFragment = TextFragment | ImageFragment | HtmlFragment | ChartFragment | ErrorFragment;
 
 export type Message = {
   fragments: MessageFragment[];
@@ -0,0 +1,101 @@
+import { ChartSpec } from "../types";
+
+interface ForecastChartProps {
+  chart: ChartSpec;
+  width: number;
+}
+
+const MARGIN = { top: 40, right: 16, bottom: 64, left: 56 };
+const TICKS = 5;
+
+const formatDate = (time: number) => {
+  const date = new Date(time);
+  return `${date.getUTCDate()}/${date.getUTCMonth() + 1}/${date.getUTCFullYear()}`;
+};
+
+const ticks = (min: number, max: number) =>
+  Array.from({ length: TICKS }, (_, i) => min + ((max - min) * i) / (TICKS - 1));
+
+// Line chart of a chart+json asset: past and forecast series, each series
+// joined to the previous one like the bokeh plots
+export const ForecastChart = ({ chart, width }: ForecastChartProps) => {
+  const size = Math.max(width, 240);
+  const series = chart.series.map((s) => ({
+    ...s,
+    points: s.x
+      .map((x, i) => ({ time: Date.parse(x), value: s.y[i] }))
+      .filter((p): p is { time: number; value: number } => p.value !== null),
+  }));
+  const points = series.flatMap((s) => s.points);
+  if (points.length === 0) {
+    return null;
+  }
+
+  const times = points.map((p) => p.time);
+  const values = points.map((p) => p.value);
+  const [minTime, maxTime] = [Math.min(...times), Math.max(...times)];
+  const padding = (Math.max(...values) - Math.min(...values)) * 0.05 || 1;
+  const [minValue, maxValue] = [Math.min(...values) - padding, Math.max(...values) + padding];
+
+  const plotWidth = size - MARGIN.left - MARGIN.right;
+  const plotHeight = size - MARGIN.top - MARGIN.bottom;
+  const x = (time: number) =>
+    MARGIN.left + (maxTime === minTime ? plotWidth / 2 : ((time - minTime) / (maxTime - minTime)) * plotWidth);
+  const y = (value: number) =>
+    MARGIN.top + plotHeight - ((value - minValue) / (maxValue - minValue)) * plotHeight;
+
+  return (
+    <svg width="100%" viewBox={`0 0 ${size} ${size}`} className="text-xs">
+      <text x={size / 2} y={MARGIN.top / 2} textAnchor="middle" className="text-base" fill="currentColor">
+        {chart.title}
+      </text>
+
+      {ticks(minValue, maxValue).map((value) => (
+        <g key={`y${value}`}>
+          <line x1={MARGIN.left} x2={size - MARGIN.right} y1={y(value)} y2={y(value)} stroke="#e5e5e5" />
+          <text x={MARGIN.left - 4} y={y(value)} textAnchor="end" dominantBaseline="middle" fill="currentColor">
+            {value.toFixed(1)}
+          </text>
+        </g>
+      ))}
+      {ticks(minTime, maxTime).map((time) => (
+        <text
+          key={`x${time}`}
+          transform={`translate(${x(time)}, ${MARGIN.top + plotHeight + 8}) rotate(45)`}
+          fill="currentColor"
+        >
+          {formatDate(time)}
+        </text>
+      ))}
+      <text x={MARGIN.left + plotWidth / 2} y={size - 4} textAnchor="middle" fill="currentColor">
+        {chart.xLabel}
+      </text>
+      <text
+        transform={`translate(12, ${MARGIN.top + plotHeight / 2}) rotate(-90)`}
+        textAnchor="middle"
+        fill="currentColor"
+      >
+        {chart.yLabel}
+      </text>
+
+      {series.map((s, idx) => {
+        const previous = idx > 0 ? series[idx - 1].points.slice(-1) : [];
+        const line = [...previous, ...s.points].map((p) => `${x(p.time)},${y(p.value)}`).join(" ");
+        return (
+          <g key={s.name}>
+            <polyline points={line} fill="none" stroke={s.color} strokeWidth={3} />
+            {s.points.map((p) => (
+              <circle key={p.time} cx={x(p.time)} cy={y(p.value)} r={4} fill={s.color}>
+                <title>{`${formatDate(p.time)}: ${p.value.toFixed(2)}`}</title>
+              </circle>
+            ))}
+            <rect x={MARGIN.left + 8} y={MARGIN.top + plotHeight - 20 - 16 * idx} width={10} height={10} fill={s.color} />
+            <text x={MARGIN.left + 24} y={MARGIN.top + plotHeight - 11 - 16 * idx} fill="currentColor">
+              {s.name}
+            </text>
+          </g>
+        );
+      })}
+    </svg>
+  );
+};
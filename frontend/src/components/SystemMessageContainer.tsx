@@ -2,6 +2,7 @@ import { useState, useRef, useLayoutEffect } from "react";
 import { Message } from "../Messages";
 import { Overlay } from "./Overlay";
 import { Modal } from "./Modal";
+import { ForecastChart } from "./ForecastChart";
 
 interface MessageContainerProps {
   message: Message;
@@ -79,6 +80,12 @@ export const SystemMessageContainer = ({
                     />
                   </div>
                 );
+              case "chart":
+                return (
+                  <div key={fragmentIdx} className="w-full px-4 py-12 mx-auto">
+                    <ForecastChart chart={fragment.chart} width={width * 0.9} />
+                  </div>
+                );
               case "error":
                 return (
                   <div key={fragmentIdx} className="w-full px-4 py-12 mx-auto">
@@ -5,3 +5,6 @@ export const RECOMMENDED_DEMO_MESSAGES = [
 ];
 
 export const STATIC_PATH = "/outfiles/";
+
+// Asset type of the data-only forecast plots, sent inline by the BFF
+export const CHART_ASSET_TYPE = "chart+json";
@@ -21,5 +21,23 @@ export type TextReceivedEvent = {
 export type Asset = {
   id: string,
   filename: string,
-  type: string
+  type: string,
+  // Content of inline asset types, e.g. chart+json
+  asset?: string
 }
+
+// Data-only forecast plot of a chart+json asset
+export type ChartSeries = {
+  name: string;
+  color: string;
+  // Dates as YYYY-MM-DD
+  x: string[];
+  y: (number | null)[];
+};
+
+export type ChartSpec = {
+  title: string;
+  xLabel: string;
+  yLabel: string;
+  series: ChartSeries[];
+};